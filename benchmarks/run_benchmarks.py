@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'dashboard'))
+
+from aggregate_cube import by_dimension, trend  # noqa: E402
+from excel_ingest import read_sheets  # noqa: E402
+from downsampling import downsample_trend  # noqa: E402
+from export import export_selection  # noqa: E402
+from filter_engine import FilterIndex  # noqa: E402
+from margin_sketch import select_sketch, sketch_percentiles  # noqa: E402
+from parallel_processing import process_transactions  # noqa: E402
+from processed_store import write_table  # noqa: E402
+from schema import compact_frame  # noqa: E402
+from synthetic_data import XLSX_MAX_ROWS, generate, write_workbook  # noqa: E402
+from transforms import build_budget_analysis, prepare_budget, process_invoices  # noqa: E402
+
+# =============================================================================
+# BENCHMARKS: pipeline steps and dashboard aggregations on synthetic data
+# =============================================================================
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# Steps faster than this are never reported as regressions (timer noise)
+MIN_REGRESSION_SECONDS = 0.01
+
+
+def measure(fn, repeat):
+    # Best-of-N wall time, then one traced run for the peak allocation
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {'seconds': round(best, 6), 'peak_mb': round(peak / 2**20, 3)}
+
+
+def run_size(n_rows, args, work_dir):
+    sheets = generate(n_rows, args.departments, args.categories, args.years, seed=args.seed)
+    results = {}
+
+    def record(step, fn):
+        value, results[step] = measure(fn, args.repeat)
+        return value
+
+    # Pipeline steps
+    if not args.skip_excel and n_rows <= XLSX_MAX_ROWS:
+        workbook = os.path.join(work_dir, f'raw_{n_rows}.xlsx')
+        write_workbook(sheets, workbook)
+        record('pipeline.load', lambda: read_sheets(workbook, list(sheets)))
+    # Rows tagged with their entity, as the pipeline does for a single workbook
+    for df in sheets.values():
+        df.insert(0, 'Entity', 'synthetic')
+    transactions, summary, cube, sketch = record('pipeline.transactions', lambda: process_transactions(sheets['Transactions']))
+    budget = prepare_budget(sheets['Budget'])
+    budget_analysis = record('pipeline.budget_merge', lambda: build_budget_analysis(budget, summary))
+    invoices = record('pipeline.invoices', lambda: process_invoices(sheets['Invoices']))
+    store_dir = os.path.join(work_dir, 'processed')
+    os.makedirs(store_dir, exist_ok=True)
+    # Partitions are keyed on Month_Key, which the compact schema adds
+    stored_transactions = compact_frame(transactions)
+    record('pipeline.save', lambda: [
+        write_table(stored_transactions, 'transactions', store_dir),
+        write_table(budget_analysis, 'budget_analysis', store_dir),
+        write_table(invoices, 'invoices', store_dir),
+        write_table(cube, 'cube', store_dir),
+    ])
+
+    # Dashboard aggregations: one department over the middle half of the history
+    dates = transactions['Date']
+    start = dates.min() + (dates.max() - dates.min()) / 4
+    end = dates.max() - (dates.max() - dates.min()) / 4
+    department = transactions['Department'].iloc[0]
+    transactions_index = record('dashboard.index_build', lambda: FilterIndex(transactions))
+    cube_index = FilterIndex(cube)
+    selection = record('dashboard.filtering',
+                       lambda: transactions_index.select(start, end, Department=department))
+    filtered_cube = cube_index.take(cube_index.select(start, end, Department=department))
+    record('dashboard.monthly_trend', lambda: trend(filtered_cube, 'M'))
+    daily = trend(filtered_cube, 'D')
+    record('dashboard.daily_trend_lttb', lambda: downsample_trend(daily, ['Revenue', 'Cost', 'Profit']))
+    record('dashboard.dept_groupby', lambda: by_dimension(filtered_cube, 'Department'))
+    record('dashboard.category_groupby', lambda: by_dimension(filtered_cube, 'Category'))
+    record('dashboard.margin_percentiles',
+           lambda: sketch_percentiles(select_sketch(sketch, start, end, department=department)))
+
+    export_dir = os.path.join(work_dir, 'exports')
+
+    def export_csv():
+        shutil.rmtree(export_dir, ignore_errors=True)
+        return export_selection(transactions_index, selection, 'CSV', export_dir, 'bench')
+    record('dashboard.export_csv', export_csv)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Returns [(size, step, baseline seconds, current seconds)] slower than allowed
+    regressions = []
+    for size, steps in results.items():
+        for step, current in steps.items():
+            previous = baseline.get(size, {}).get(step)
+            if previous is None:
+                continue
+            limit = previous['seconds'] * (1 + tolerance)
+            if current['seconds'] > limit and current['seconds'] - previous['seconds'] > MIN_REGRESSION_SECONDS:
+                regressions.append((size, step, previous['seconds'], current['seconds']))
+    return regressions
+
+
+def print_report(results, baseline):
+    print(f"{'rows':>10}  {'step':<28} {'seconds':>10} {'peak MB':>10} {'vs baseline':>12}")
+    for size, steps in results.items():
+        for step, current in steps.items():
+            previous = baseline.get(size, {}).get(step)
+            ratio = f"{current['seconds'] / previous['seconds']:.2f}x" if previous and previous['seconds'] else '-'
+            print(f"{int(size):>10,}  {step:<28} {current['seconds']:>10.4f} {current['peak_mb']:>10.1f} {ratio:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline and dashboard aggregations")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help="transaction counts to generate (10k - 10M)")
+    parser.add_argument('--departments', type=int, default=4)
+    parser.add_argument('--categories', type=int, default=5)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per step (best is kept)")
+    parser.add_argument('--skip-excel', action='store_true', help="skip writing/reading the workbook")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument('--output', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='fd_bench_')
+    try:
+        results = {}
+        for n_rows in args.sizes:
+            print(f"Benchmarking {n_rows:,} transactions...")
+            results[str(n_rows)] = run_size(n_rows, args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print()
+    print_report(results, baseline)
+
+    document = {
+        'config': {k: getattr(args, k) for k in ('departments', 'categories', 'years', 'seed', 'repeat')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"\nSaved baseline: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for size, step, previous, current in regressions:
+        print(f"REGRESSION {int(size):,} rows {step}: {previous:.4f}s -> {current:.4f}s")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
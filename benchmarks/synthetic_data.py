@@ -0,0 +1,94 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# SYNTHETIC DATA: Transactions / Budget / Invoices with the raw_data.xlsx schema
+# =============================================================================
+
+DEPARTMENTS = ['Trading', 'Advisory', 'Sales', 'Research']
+CATEGORIES = ['Commission', 'Other', 'Fees', 'Trading', 'Consulting']
+CLIENT_TYPES = ['Institutional', 'Private', 'Corporate']
+
+# Excel sheets hold at most this many data rows
+XLSX_MAX_ROWS = 1_048_575
+
+
+def _members(base, count, prefix):
+    # Real names first, then numbered extras (e.g. 'Department 07')
+    return (base + [f'{prefix} {i:02d}' for i in range(len(base) + 1, count + 1)])[:count]
+
+
+def generate(n_transactions, n_departments=4, n_categories=5, n_years=1,
+             n_invoices=None, start_year=2024, seed=0):
+    rng = np.random.default_rng(seed)
+    departments = np.array(_members(DEPARTMENTS, n_departments, 'Department'))
+    categories = np.array(_members(CATEGORIES, n_categories, 'Category'))
+
+    # Transactions: workbook rows are appended in date order
+    first_day = pd.Timestamp(f'{start_year}-01-01')
+    n_days = (pd.Timestamp(f'{start_year + n_years}-01-01') - first_day).days
+    day_offsets = np.sort(rng.integers(0, n_days, n_transactions))
+    revenue = rng.integers(10_000, 150_000, n_transactions)
+    transactions = pd.DataFrame({
+        'Date': first_day + pd.to_timedelta(day_offsets, unit='D'),
+        'Department': departments[rng.integers(0, n_departments, n_transactions)],
+        'Category': categories[rng.integers(0, n_categories, n_transactions)],
+        'Revenue': revenue,
+        'Cost': np.round(revenue * rng.uniform(0.30, 0.40, n_transactions), 2),
+        'Client_Type': np.array(CLIENT_TYPES)[rng.integers(0, len(CLIENT_TYPES), n_transactions)],
+    })
+
+    # Budget: one row per department and month
+    months = pd.date_range(first_day, periods=12 * n_years, freq='MS')
+    budget_revenue = rng.integers(5, 16, n_departments) * 100_000
+    budget = pd.DataFrame({
+        'Department': np.tile(departments, len(months)),
+        'Month': np.repeat(months, n_departments),
+        'Budget_Revenue': np.tile(budget_revenue, len(months)),
+        'Budget_Cost': np.tile(budget_revenue * 3 // 10, len(months)),
+    })
+
+    # Invoices: roughly one per five transactions, ~80% paid
+    n_invoices = n_invoices if n_invoices is not None else max(n_transactions // 5, 1)
+    invoice_dates = first_day + pd.to_timedelta(rng.integers(0, n_days, n_invoices), unit='D')
+    paid = rng.random(n_invoices) < 0.8
+    payment_dates = pd.Series(invoice_dates + pd.to_timedelta(rng.integers(5, 60, n_invoices), unit='D'))
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    invoices = pd.DataFrame({
+        'Invoice_ID': [f'INV-{start_year}-{i:03d}' for i in range(1, n_invoices + 1)],
+        'Date': invoice_dates,
+        'Client': pd.Series(letters[rng.integers(0, 26, n_invoices)]).str.cat(
+            letters[rng.integers(0, 26, n_invoices)]).radd('Company ') + ' GmbH',
+        'Amount': rng.integers(15_000, 100_000, n_invoices),
+        'Status': np.where(paid, 'Paid', 'Pending'),
+        'Payment_Date': payment_dates.where(paid),
+    })
+
+    return {'Transactions': transactions, 'Budget': budget, 'Invoices': invoices}
+
+
+def write_workbook(sheets, path):
+    if len(sheets['Transactions']) > XLSX_MAX_ROWS:
+        raise ValueError(f"Excel sheets hold at most {XLSX_MAX_ROWS:,} rows")
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic raw_data.xlsx")
+    parser.add_argument('output', help="workbook path, e.g. /tmp/raw_data.xlsx")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--departments', type=int, default=4)
+    parser.add_argument('--categories', type=int, default=5)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sheets = generate(args.rows, args.departments, args.categories, args.years, seed=args.seed)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    write_workbook(sheets, args.output)
+    print(f"Saved: {args.output} ({args.rows:,} transactions)")
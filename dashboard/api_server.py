@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed_data')
+
+# Shared processed-store helpers live next to the pipeline script
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+from aggregate_cube import TREND_GRAINS  # noqa: E402
+from invoice_ledger import overall_totals  # noqa: E402
+from kpi_deltas import COMPARISONS, kpi_deltas  # noqa: E402
+from margin_sketch import MARGIN_BIN_WIDTH, margin_distribution, select_sketch, sketch_percentiles  # noqa: E402
+from processed_store import dataset_modified, dataset_version, published_dir, table_entities  # noqa: E402
+from query_backend import BACKEND_ENV, BACKENDS, MemoryBackend  # noqa: E402
+from shared_dataset import FRAME_TABLES, SHARED_TABLES, DatasetStore  # noqa: E402
+from sql_backend import SqliteBackend  # noqa: E402
+from sql_store import sql_path  # noqa: E402
+
+# =============================================================================
+# API SERVER: the dashboard's aggregates as JSON, for PowerBI / Excel clients
+# Same backends, dataset store and filters as the Streamlit app. Responses are
+# kept in memory per (dataset version, endpoint, filters); ETag and
+# Last-Modified follow the dataset version, so a polling client that already
+# has the current answer gets a 304 without anything being recomputed
+# =============================================================================
+
+DEFAULT_PORT = 8502
+
+# Responses kept in memory, least recently used dropped
+RESPONSE_CACHE_ENTRIES = 256
+
+# Query parameters shared by every aggregate endpoint (the dashboard sidebar)
+FILTER_PARAMS = ('start', 'end', 'entity', 'department', 'category')
+
+
+def plain(value):
+    # pandas / numpy values -> JSON types (NaN and NaT become null)
+    if isinstance(value, pd.DataFrame):
+        return [plain(row) for row in value.to_dict('records')]
+    if isinstance(value, pd.Series):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {str(key): plain(item) for key, item in value.items()}
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class AggregateApi:
+    # Endpoint name -> JSON-ready payload for a set of query parameters
+    def __init__(self, processed_dir, backend_name):
+        if backend_name not in BACKENDS:
+            raise ValueError(f"Unknown {BACKEND_ENV} '{backend_name}' (expected one of: {', '.join(BACKENDS)})")
+        self.processed_dir = processed_dir
+        self.backend_name = backend_name
+        self.store = DatasetStore(SHARED_TABLES if backend_name == 'memory' else list(FRAME_TABLES))
+        self.sqlite = None
+        self.sqlite_lock = threading.Lock()
+        self.cache = ResponseCache()
+        self.endpoints = {
+            'version': self.version,
+            'kpis': self.kpis,
+            'trend': self.trend,
+            'departments': lambda ctx: self.by_dimension(ctx, 'Department'),
+            'categories': lambda ctx: self.by_dimension(ctx, 'Category'),
+            'margins': self.margins,
+            'budget': self.budget,
+            'invoices': self.invoices,
+        }
+
+    def stamp(self):
+        # (directory, version, last modified) of the release being served
+        data_dir = published_dir(self.processed_dir)
+        return data_dir, dataset_version(data_dir), dataset_modified(data_dir)
+
+    def context(self, data_dir, version, params):
+        entity = params.get('entity')
+        dataset = self.store.get(data_dir, entity)
+        if self.backend_name == 'sqlite':
+            db_path = sql_path(data_dir)
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(db_path)
+            db_version = f'{version}:{os.stat(db_path).st_mtime_ns}'
+            with self.sqlite_lock:
+                # One connection per database version, as in the dashboard
+                if self.sqlite is None or self.sqlite.version != db_version:
+                    self.sqlite = SqliteBackend(db_path, db_version)
+                backend = self.sqlite.for_entity(entity)
+        else:
+            backend = MemoryBackend(dataset)
+
+        first_date, last_date = backend.date_bounds()
+        if first_date is None:
+            raise ApiError(404, "No transactions for this selection")
+        try:
+            start = pd.Timestamp(params['start']) if 'start' in params else first_date
+            end = pd.Timestamp(params['end']) if 'end' in params else last_date
+        except ValueError:
+            raise ApiError(400, "start / end must be dates (YYYY-MM-DD)")
+        members = {'Department': params.get('department'), 'Category': params.get('category')}
+        return {'data_dir': data_dir, 'dataset': dataset, 'backend': backend, 'params': params,
+                'start': start, 'end': end, 'members': members,
+                'queries': backend.filter(start, end, members)}
+
+    def version(self, ctx):
+        return {'entities': table_entities(ctx['data_dir']),
+                'date_range': [ctx['start'].date().isoformat(), ctx['end'].date().isoformat()],
+                'grains': list(TREND_GRAINS), 'comparisons': list(COMPARISONS)}
+
+    def kpis(self, ctx):
+        comparison = ctx['params'].get('comparison', 'Previous period')
+        if comparison not in COMPARISONS:
+            raise ApiError(400, f"comparison must be one of: {', '.join(COMPARISONS)}")
+        deltas = kpi_deltas(ctx['backend'].prefix_sums, ctx['start'], ctx['end'],
+                            ctx['members']['Department'], ctx['members']['Category'], comparison)
+        return {'totals': ctx['queries'].totals(), 'deltas': deltas, 'comparison': comparison}
+
+    def trend(self, ctx):
+        grain = ctx['params'].get('grain', 'Month')
+        if grain not in TREND_GRAINS:
+            raise ApiError(400, f"grain must be one of: {', '.join(TREND_GRAINS)}")
+        return ctx['queries'].trend(TREND_GRAINS[grain])
+
+    def by_dimension(self, ctx, dim):
+        return ctx['queries'].by_dimension(dim)
+
+    def margins(self, ctx):
+        # Margin percentiles from the pipeline's sketch (whole months of the range)
+        rows = select_sketch(ctx['dataset'].margin_sketch, ctx['start'], ctx['end'],
+                             ctx['members']['Department'], ctx['members']['Category'])
+        return {'overall': sketch_percentiles(rows), 'departments': margin_distribution(rows, 'Department'),
+                'error_pp': MARGIN_BIN_WIDTH / 2}
+
+    def budget(self, ctx):
+        # Budget merge rows in the date range, summed per department
+        budget = ctx['dataset'].budget
+        rows = budget[(budget['Month'] >= ctx['start'].to_period('M').to_timestamp()) & (budget['Month'] <= ctx['end'])]
+        if ctx['members']['Department'] is not None:
+            rows = rows[rows['Department'] == ctx['members']['Department']]
+        grouped = rows.groupby('Department', observed=True).agg(
+            Budget_Revenue=('Budget_Revenue', 'sum'),
+            Actual_Revenue=('Actual_Revenue', 'sum'),
+            Budget_Cost=('Budget_Cost', 'sum'),
+            Actual_Cost=('Actual_Cost', 'sum'),
+            # The dashboard chart's figure: mean of the monthly achievements
+            Avg_Monthly_Achievement=('Revenue_Achievement_%', 'mean'),
+        ).reset_index()
+        grouped['Department'] = grouped['Department'].astype(str)
+        grouped['Avg_Monthly_Achievement'] = grouped['Avg_Monthly_Achievement'].round(2)
+        base = grouped['Budget_Revenue'].where(grouped['Budget_Revenue'] != 0)
+        grouped['Revenue_Achievement_%'] = (grouped['Actual_Revenue'] / base * 100).round(2)
+        return grouped
+
+    def invoices(self, ctx):
+        # Running totals and aging precomputed by the pipeline (not date-filtered)
+        return overall_totals(ctx['dataset'].invoice_totals)
+
+    def cache_key(self, endpoint, params):
+        # -> (key, data_dir, version, modified). Only stats the files: a 304 needs nothing more
+        if endpoint not in self.endpoints:
+            raise ApiError(404, f"Unknown endpoint: {endpoint}")
+        data_dir, version, modified = self.stamp()
+        entity = params.get('entity')
+        if entity is not None and entity not in table_entities(data_dir):
+            raise ApiError(404, f"Unknown entity: {entity}")
+        return (version, endpoint, tuple(sorted(params.items()))), data_dir, version, modified
+
+    def body(self, key, data_dir, version, endpoint, params):
+        # Built once per key; later requests for the same version are served from memory
+        body = self.cache.get(key)
+        if body is None:
+            payload = self.endpoints[endpoint](self.context(data_dir, version, params))
+            body = json.dumps({'version': version, 'data': plain(payload)}).encode()
+            self.cache.put(key, body)
+        return body
+
+
+def etag(key):
+    # Dataset version plus the query: changes exactly when the answer may change
+    version, endpoint, params = key
+    return f'"{version}-{hashlib.sha1(repr((endpoint, params)).encode()).hexdigest()[:12]}"'
+
+
+def not_modified(headers, tag, modified):
+    if headers.get('If-None-Match') is not None:
+        return tag in [t.strip() for t in headers['If-None-Match'].split(',')] or headers['If-None-Match'].strip() == '*'
+    if headers.get('If-Modified-Since') is not None:
+        try:
+            return parsedate_to_datetime(headers['If-Modified-Since']).timestamp() >= int(modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'FinancialDashboardAPI/1.0'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] != 'api':
+                return self.send_json(404, {'error': f"Unknown path: {url.path}"})
+            endpoint = parts[1]
+            # Last value wins for repeated parameters; 'All ...' sidebar values mean no filter
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()
+                      if values[-1] and not values[-1].startswith('All ')}
+            unknown = set(params) - set(FILTER_PARAMS) - {'comparison', 'grain'}
+            if unknown:
+                return self.send_json(400, {'error': f"Unknown parameters: {', '.join(sorted(unknown))}"})
+            try:
+                key, data_dir, version, modified = api.cache_key(endpoint, params)
+                tag = etag(key)
+                headers = {'ETag': tag, 'Last-Modified': formatdate(modified, usegmt=True),
+                           'Cache-Control': 'no-cache'}
+                if not_modified(self.headers, tag, modified):
+                    return self.send(304, b'', headers)
+                body = api.body(key, data_dir, version, endpoint, params)
+            except ApiError as e:
+                return self.send_json(e.status, {'error': str(e)})
+            except FileNotFoundError:
+                return self.send_json(503, {'error': "Processed data not found; run data_processing.py first"})
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            self.send(200, body, {**headers, 'Content-Type': 'application/json; charset=utf-8'})
+
+        def send_json(self, status, payload):
+            self.send(status, json.dumps(payload).encode(), {'Content-Type': 'application/json; charset=utf-8'})
+
+        def send(self, status, body, headers):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status != 304:
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard aggregates as a JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--processed-dir', default=PROCESSED_DIR)
+    parser.add_argument('--backend', default=os.environ.get(BACKEND_ENV, 'memory'), choices=BACKENDS)
+    args = parser.parse_args()
+
+    api = AggregateApi(args.processed_dir, args.backend)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(api))
+    print(f"Serving http://{args.host}:{args.port}/api/<{'|'.join(api.endpoints)}> ({args.backend} backend)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
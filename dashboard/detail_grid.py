@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# DETAIL GRID: server-side sort + pagination over the filter index
+# Only the rows of the visible page are materialized; pages stay numeric and
+# the dashboard formats them at render time (GRID_FORMATS)
+# =============================================================================
+
+GRID_COLUMNS = ['Date', 'Department', 'Category', 'Revenue', 'Cost', 'Profit', 'Margin_%', 'Client_Type']
+
+# Column -> display format for st.column_config (dates: moment.js, numbers: printf / preset)
+GRID_FORMATS = {
+    'Date': 'YYYY-MM-DD',
+    'Revenue': 'euro',
+    'Cost': 'euro',
+    'Profit': 'euro',
+    'Margin_%': '%.2f%%',
+}
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Below count * SUBSET_SORT_FACTOR < rows, sorting the selection beats scanning a full order
+SUBSET_SORT_FACTOR = 16
+
+
+class SortOrders:
+    def __init__(self, index):
+        self.index = index
+        self.orders = {}
+        self.keys = {}
+
+    def key(self, column):
+        # Numeric sort key; text columns rank by alphabetical member order
+        if column not in self.keys:
+            values = self.index.df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                rank = np.argsort(np.argsort(values.cat.categories.astype(str)))
+                self.keys[column] = rank[values.cat.codes.values]
+            else:
+                self.keys[column] = values.values
+        return self.keys[column]
+
+    def order(self, column):
+        # Full-table stable order, computed once per column and reused
+        if column not in self.orders:
+            if column == 'Date':
+                self.orders[column] = np.arange(len(self.index.df))
+            else:
+                self.orders[column] = np.argsort(self.key(column), kind='stable')
+        return self.orders[column]
+
+
+def sorted_rows(index, selection, sort_orders, column, ascending=True):
+    n = len(index.df)
+    count = index.count(selection)
+    if isinstance(selection, slice) and count == n:
+        rows = sort_orders.order(column)
+    elif count * SUBSET_SORT_FACTOR < n:
+        # Small selections: sort just the selected positions
+        positions = np.arange(selection.start, selection.stop) if isinstance(selection, slice) else selection
+        rows = positions[np.argsort(sort_orders.key(column)[positions], kind='stable')]
+    else:
+        # Large selections: walk the presorted order, keeping selected rows
+        mask = np.zeros(n, dtype=bool)
+        mask[selection] = True
+        order = sort_orders.order(column)
+        rows = order[mask[order]]
+    return rows if ascending else rows[::-1]
+
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+def grid_page(index, selection, sort_orders, column, ascending, page, page_size):
+    rows = sorted_rows(index, selection, sort_orders, column, ascending)
+    page_rows = rows[(page - 1) * page_size:page * page_size]
+    return index.take(page_rows, GRID_COLUMNS)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# DOWNSAMPLING: Largest-Triangle-Three-Buckets on the server
+# A trend is cut to a point budget tied to the chart width before it is sent
+# to the browser, so long daily ranges keep their spikes and dips while the
+# payload and render time stay bounded
+# =============================================================================
+
+# Plot area of a full-width chart in the wide layout, and points drawn per pixel
+CHART_WIDTH_PX = 1400
+
+POINTS_PER_PIXEL = 1
+
+
+def point_budget(width_px=CHART_WIDTH_PX, points_per_pixel=POINTS_PER_PIXEL):
+    return max(int(width_px * points_per_pixel), 3)
+
+
+def lttb(x, y, threshold):
+    # -> positions of the `threshold` points that best keep the shape of y(x).
+    # First and last points are kept; each bucket in between keeps the point
+    # forming the largest triangle with the previous pick and the next bucket's mean
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Bucket means from cumulative sums; the last bucket looks ahead to the last point
+    cx = np.concatenate([[0.0], np.cumsum(x)])
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    widths = np.diff(edges)
+    mean_x = np.append((cx[edges[1:]] - cx[edges[:-1]]) / widths, x[-1])
+    mean_y = np.append((cy[edges[1:]] - cy[edges[:-1]]) / widths, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(threshold - 2):
+        lo, hi = edges[k], edges[k + 1]
+        # Twice the triangle areas (a, candidate, next mean) for the whole bucket at once
+        area = np.abs((x[a] - mean_x[k + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[k + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[k + 1] = a
+    return selected
+
+
+def downsample_trend(trend, columns, budget=None):
+    # Union of every measure's LTTB points (shared x, so unified hover still lines up);
+    # each measure gets an equal share of the budget
+    budget = point_budget() if budget is None else budget
+    if len(trend) <= budget:
+        return trend
+    x = (trend['Date'] - trend['Date'].iloc[0]) / pd.Timedelta(days=1)
+    share = max(budget // len(columns), 3)
+    keep = np.unique(np.concatenate([lttb(x, trend[col], share) for col in columns]))
+    return trend.iloc[keep].reset_index(drop=True)
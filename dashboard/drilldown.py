@@ -0,0 +1,45 @@
+import pandas as pd
+
+# =============================================================================
+# DRILL-DOWN: Department -> Category -> Client_Type -> Month -> transactions
+# A drill path is a tuple of (level, member) pairs. Each step narrows the
+# sidebar selection and asks the backend for the next level's aggregates
+# only (cube cells), so no level scans raw transactions; the last level is
+# one page of the filter index / SQL selection
+# =============================================================================
+
+DRILL_LEVELS = ['Department', 'Category', 'Client_Type', 'Month']
+
+# Drill results memoized per (version, filters, path), least recently used dropped
+DRILL_CACHE_ENTRIES = 128
+
+DRILL_PAGE_SIZE = 25
+
+
+def drill_filters(path, start, end, members):
+    # Sidebar selection narrowed by the path -> (start, end, members) for the backend
+    members = dict(members)
+    for level, member in path:
+        if level != 'Month':
+            members[level] = member
+            continue
+        # A month is the part of that month inside the selected range
+        month = pd.Period(member, freq='M')
+        start = month.start_time if start is None else max(start, month.start_time)
+        end = month.end_time.normalize() if end is None else min(end, month.end_time.normalize())
+    return start, end, members
+
+
+def next_level(path, members):
+    # First level that neither the path nor a sidebar filter has fixed; None = transactions
+    fixed = {level for level, _ in path} | {dim for dim, member in members.items() if member is not None}
+    return next((level for level in DRILL_LEVELS if level not in fixed), None)
+
+
+def drill_level(queries, level):
+    # One row per member of the next level: Revenue / Cost / Profit (+ margin for dimensions)
+    if level != 'Month':
+        return queries.by_dimension(level)
+    months = queries.trend('M')
+    months.insert(0, 'Month', months['Date'].dt.strftime('%Y-%m'))
+    return months
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# =============================================================================
+# DATASET EXPORT: written on request, chunk by chunk, cached per filter state
+# =============================================================================
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel (XLSX)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Rows materialized at a time while writing
+CHUNK_ROWS = 100_000
+
+# Exports kept on disk before the oldest are removed
+MAX_CACHED_EXPORTS = 20
+
+# Excel sheet limit, minus the header row
+XLSX_MAX_ROWS = 1_048_575
+
+
+def export_key(dataset_version, start, end, members, fmt):
+    state = json.dumps([dataset_version, str(start), str(end), members, fmt], sort_keys=True)
+    return hashlib.sha1(state.encode()).hexdigest()[:16]
+
+
+def _chunks(index, selection):
+    # Slices and position arrays are cut the same way, one chunk in memory at a time
+    total = index.count(selection)
+    for offset in range(0, max(total, 1), CHUNK_ROWS):
+        if isinstance(selection, slice):
+            part = slice(selection.start + offset, min(selection.stop, selection.start + offset + CHUNK_ROWS))
+        else:
+            part = selection[offset:offset + CHUNK_ROWS]
+        yield index.take(part)
+
+
+def _write_csv(chunks, f):
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def _write_parquet(chunks, path):
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+            # One row group per chunk
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(chunks, path):
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of holding cells
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Transactions')
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            sheet.append(list(chunk.columns))
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def _prune(export_dir):
+    files = sorted(
+        (os.path.join(export_dir, f) for f in os.listdir(export_dir) if not f.endswith('.tmp')),
+        key=os.path.getmtime
+    )
+    for path in files[:-MAX_CACHED_EXPORTS]:
+        os.remove(path)
+
+
+def export_selection(index, selection, fmt, export_dir, key):
+    return export_chunks(_chunks(index, selection), index.count(selection), fmt, export_dir, key)
+
+
+def export_chunks(chunks, total, fmt, export_dir, key):
+    # chunks: lazy iterator of frames (the first one, possibly empty, sets the header).
+    # Returns the export file path; an identical earlier export is reused as is
+    extension, _ = EXPORT_FORMATS[fmt]
+    path = os.path.join(export_dir, f'{key}.{extension}')
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    if fmt == 'Excel (XLSX)' and total > XLSX_MAX_ROWS:
+        raise ValueError(f"Excel sheets hold at most {XLSX_MAX_ROWS:,} rows; narrow the filters or pick CSV/Parquet")
+
+    os.makedirs(export_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    if fmt == 'CSV':
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            _write_csv(chunks, f)
+    elif fmt == 'CSV (gzip)':
+        with gzip.open(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+            _write_csv(chunks, f)
+    elif fmt == 'Parquet':
+        _write_parquet(chunks, tmp_path)
+    else:
+        _write_xlsx(chunks, tmp_path)
+    os.replace(tmp_path, path)
+    _prune(export_dir)
+    return path
+
+
+def read_export(path):
+    # Download payload, read when the download is requested
+    with open(path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# FILTER ENGINE: date-sorted rows + per-member row positions
+# Date ranges are binary-search slices, member filters are sorted position
+# arrays; combining them is an intersection, never a copy of the frame
+# =============================================================================
+
+EMPTY_POSITIONS = np.array([], dtype=np.int64)
+
+
+class FilterIndex:
+    def __init__(self, df, dimensions=('Department', 'Category', 'Client_Type'), date_column='Date'):
+        # Keep rows sorted by date once, so any date range is a contiguous block
+        if not df[date_column].is_monotonic_increasing:
+            df = df.sort_values(date_column, kind='stable')
+        # Positions index rows; an already 0..n-1 index is kept as is (no copy)
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            df = df.reset_index(drop=True)
+        self.df = df
+        self.dates = self.df[date_column].values.astype('datetime64[D]')
+
+        # member -> ascending row positions, built from the categorical codes
+        self.positions = {}
+        for dim in dimensions:
+            column = self.df[dim].astype('category')
+            codes = column.cat.codes.values
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(column.cat.categories) + 1))
+            self.positions[dim] = {
+                member: order[bounds[i]:bounds[i + 1]]
+                for i, member in enumerate(column.cat.categories)
+            }
+
+    def members(self, dim):
+        return sorted(self.positions[dim])
+
+    def date_bounds(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), 'left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), 'right'))
+        return lo, max(lo, hi)
+
+    def select(self, start=None, end=None, **members):
+        # Returns a slice (date filter only) or sorted row positions
+        lo, hi = self.date_bounds(start, end)
+        selection = None
+        for dim, member in members.items():
+            if member is None:
+                continue
+            positions = self.positions[dim].get(member, EMPTY_POSITIONS)
+            # Positions are ascending: clip to the date block by binary search
+            positions = positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+            if selection is None:
+                selection = positions
+            else:
+                selection = np.intersect1d(selection, positions, assume_unique=True)
+        return slice(lo, hi) if selection is None else selection
+
+    def count(self, selection):
+        if isinstance(selection, slice):
+            return selection.stop - selection.start
+        return len(selection)
+
+    def head(self, selection, n):
+        if isinstance(selection, slice):
+            return slice(selection.start, min(selection.stop, selection.start + n))
+        return selection[:n]
+
+    def take(self, selection, columns=None):
+        df = self.df if columns is None else self.df[columns]
+        # A slice is a view; positions only materialize the selected rows
+        return df.iloc[selection]
+
+
+def entity_filter(entity):
+    return None if entity == 'All Entities' else entity
+
+
+def member_filters(department, category):
+    return {
+        'Department': None if department == 'All Departments' else department,
+        'Category': None if category == 'All Categories' else category,
+    }
+
+
+def date_filter(date_range):
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        return pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+    return None, None
@@ -3,6 +3,36 @@ import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime
 import os
+import sys
+import time
+from functools import partial
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed_data')
+EXPORT_DIR = os.path.join(PROCESSED_DIR, 'exports')
+
+# Shared processed-store helpers live next to the pipeline script
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+from processed_store import published_dir, table_entities
+from schema import frame_memory_mb
+from invoice_ledger import AGING_BUCKETS, overall_totals
+from margin_sketch import MARGIN_BIN_WIDTH, margin_distribution, select_sketch, sketch_percentiles
+from period_metrics import select_period_metrics
+from scenario_engine import CASH_HORIZON_DAYS, DEFAULT_ASSUMPTIONS, run_scenarios, summarize_scenarios
+from sql_store import sql_path
+from aggregate_cube import TREND_GRAINS, TREND_MEASURES
+from detail_grid import GRID_COLUMNS, GRID_FORMATS, PAGE_SIZES, page_count
+from downsampling import downsample_trend, point_budget
+from drilldown import DRILL_CACHE_ENTRIES, DRILL_LEVELS, DRILL_PAGE_SIZE, drill_filters, drill_level, next_level
+from export import EXPORT_FORMATS, export_key, read_export
+from filter_engine import date_filter, entity_filter, member_filters
+from kpi_deltas import COMPARISONS, kpi_deltas
+from query_backend import BACKEND_ENV, BACKENDS, MemoryBackend
+from shared_dataset import FRAME_TABLES, SHARED_TABLES, DatasetStore
+from sql_backend import SqliteBackend
+
+# 'memory' holds the dataset in RAM; 'sqlite' pushes queries down to dashboard.sqlite
+DASHBOARD_BACKEND = os.environ.get(BACKEND_ENV, 'memory')
 
 # =============================================================================
 # PAGE CONFIGURATION
@@ -81,18 +111,18 @@ st.markdown(f"""
 # DATA LOADING
 # =============================================================================
 
-@st.cache_data(show_spinner=False)
-def load_data():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    processed_dir = os.path.join(base_dir, 'data', 'processed_data')
-    transactions = pd.read_csv(os.path.join(processed_dir, 'transactions_processed.csv'))
-    budget = pd.read_csv(os.path.join(processed_dir, 'budget_analysis.csv'))
-    invoices = pd.read_csv(os.path.join(processed_dir, 'invoices_summary.csv'))
-    transactions['Date'] = pd.to_datetime(transactions['Date'])
-    transactions['Month'] = pd.to_datetime(transactions['Month'])
-    budget['Month'] = pd.to_datetime(budget['Month'])
-    invoices['Date'] = pd.to_datetime(invoices['Date'])
-    return transactions, budget, invoices
+@st.cache_resource(show_spinner=False)
+def dataset_store():
+    # One read-only dataset per process, shared by every session (no per-session
+    # copies). A new version (pipeline run or published release) swaps it on the
+    # next rerun, reloading only the tables whose files changed. With the SQL
+    # backend, transactions and cube stay on disk: only the small tables are held
+    return DatasetStore(SHARED_TABLES if DASHBOARD_BACKEND == 'memory' else list(FRAME_TABLES))
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def sqlite_backend(path, version):
+    # One read-only connection per database version
+    return SqliteBackend(path, version)
 
 # =============================================================================
 # HELPERS
@@ -114,6 +144,41 @@ def format_percentage(value):
     except:
         return str(value)
 
+# Sections whose data was computed (not served from cache) in this run
+recomputed_sections = []
+# Sections that asked a cached builder for their data in this run (hit unless also recomputed)
+cache_lookups = []
+
+def track_recompute(section):
+    recomputed_sections.append(section)
+
+def track_cache_lookup(section):
+    cache_lookups.append(section)
+
+def section_status(section):
+    # Sections that did not run on this rerun (e.g. Drill-Down without a path) are not cache hits
+    if section in recomputed_sections:
+        return 'recomputed'
+    return 'cache hit' if section in cache_lookups else 'not rendered'
+
+# Wall time per part of the script run, for the debug panel
+section_timings = {}
+_section_started = time.perf_counter()
+
+def end_section(name):
+    global _section_started
+    now = time.perf_counter()
+    section_timings[name] = section_timings.get(name, 0.0) + (now - _section_started)
+    _section_started = now
+
+# Grid pages stay numeric; the browser formats the visible cells
+GRID_COLUMN_CONFIG = {col: (st.column_config.DateColumn if col == 'Date' else st.column_config.NumberColumn)(format=fmt)
+                      for col, fmt in GRID_FORMATS.items()}
+
+def format_optional(value, formatter):
+    # Windows without enough history (e.g. YoY in the first year) are undefined, not zero
+    return "n/a" if pd.isna(value) else formatter(value)
+
 def get_trend_indicator(value, threshold=0):
     if value > threshold:
         return "↗", "positive"
@@ -126,47 +191,97 @@ def get_trend_indicator(value, threshold=0):
 # LOAD DATA
 # =============================================================================
 
+if DASHBOARD_BACKEND not in BACKENDS:
+    st.error(f"Unknown {BACKEND_ENV} '{DASHBOARD_BACKEND}' (expected one of: {', '.join(BACKENDS)})")
+    st.stop()
+
+data_dir = published_dir(PROCESSED_DIR)
+with st.sidebar:
+    st.markdown("### Dashboard Controls")
+    st.markdown("---")
+    # Chosen before loading: only the selected entity's partitions are read
+    selected_entity = st.selectbox("Entity", ['All Entities'] + table_entities(data_dir))
+    st.markdown("---")
+entity = entity_filter(selected_entity)
+
 try:
     with st.spinner('Loading financial data...'):
-        transactions_df, budget_df, invoices_df = load_data()
+        dataset = dataset_store().get(data_dir, entity)
+        dataset_version = dataset.version
+        table_versions = dataset.table_versions
+        budget_df, invoice_totals_df = dataset.budget, dataset.invoice_totals
+        period_metrics_df, receivables_df = dataset.period_metrics, dataset.receivables
+        margin_sketch_df = dataset.margin_sketch
+        if DASHBOARD_BACKEND == 'sqlite':
+            db_path = sql_path(data_dir)
+            if not os.path.exists(db_path):
+                st.error("⚠SQLite store not found! Please run data_processing.py --sql first.")
+                st.stop()
+            backend = sqlite_backend(db_path, f'{dataset_version}:{os.stat(db_path).st_mtime_ns}').for_entity(entity)
+        else:
+            backend = MemoryBackend(dataset)
 except FileNotFoundError:
     st.error("⚠Processed data files not found! Please run data_processing.py first.")
     st.stop()
 except Exception as e:
     st.error(f"Error loading data: {e}")
     st.stop()
+end_section('Load data')
 
 # =============================================================================
 # SIDEBAR
 # =============================================================================
 
 with st.sidebar:
-    st.markdown("### Dashboard Controls")
-    st.markdown("---")
-    min_date = transactions_df['Date'].min().date()
-    max_date = transactions_df['Date'].max().date()
+    first_date, last_date = backend.date_bounds()
+    if first_date is None:
+        st.warning("No transactions for this entity yet.")
+        st.stop()
+    min_date, max_date = first_date.date(), last_date.date()
     date_range = st.date_input("Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date)
     st.markdown("---")
-    departments = ['All Departments'] + sorted(transactions_df['Department'].unique().tolist())
+    departments = ['All Departments'] + backend.members('Department')
     selected_department = st.selectbox("Department", departments)
     st.markdown("---")
-    categories = ['All Categories'] + sorted(transactions_df['Category'].unique().tolist())
+    categories = ['All Categories'] + backend.members('Category')
     selected_category = st.selectbox("Category", categories)
     st.markdown("---")
-    st.metric("Total Transactions", f"{len(transactions_df):,}")
-    st.metric("Total Value", format_currency(transactions_df['Revenue'].sum()))
+    comparison = st.radio("Compare KPIs with", list(COMPARISONS))
+    st.markdown("---")
+    overall = backend.overall()
+    st.metric("Total Transactions", f"{overall['transactions']:,}")
+    st.metric("Total Value", format_currency(overall['revenue']))
+    st.markdown("---")
+    show_diagnostics = st.checkbox("Show debug panel", value=False)
+end_section('Sidebar')
 
 # =============================================================================
 # FILTERS APPLY
 # =============================================================================
 
-filtered_df = transactions_df.copy()
-if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
-    filtered_df = filtered_df[(filtered_df['Date'].dt.date >= date_range[0]) & (filtered_df['Date'].dt.date <= date_range[1])]
-if selected_department != 'All Departments':
-    filtered_df = filtered_df[filtered_df['Department'] == selected_department]
-if selected_category != 'All Categories':
-    filtered_df = filtered_df[filtered_df['Category'] == selected_category]
+filter_start, filter_end = date_filter(date_range)
+filter_members = member_filters(selected_department, selected_category)
+
+# Filtered view: KPI / chart aggregations, grid pages and exports all go through it
+queries = backend.filter(filter_start, filter_end, filter_members)
+
+# Drill-down path from chart clicks, kept per session; a sidebar change starts over
+drill_signature = (entity, filter_start, filter_end, tuple(filter_members.items()))
+if st.session_state.get('drill', (None, ()))[0] != drill_signature:
+    st.session_state['drill'] = (drill_signature, ())
+
+def drill_into(chart_key, level, members, path):
+    # on_select callback: the clicked bar / slice becomes the next step of the path
+    points = st.session_state[chart_key].selection.points
+    if points:
+        point = points[0]
+        member = members[point.get('point_index', point.get('point_number'))]
+        st.session_state['drill'] = (st.session_state['drill'][0], path + ((level, member),))
+
+def drill_chart(fig, key, level, members, path=()):
+    st.plotly_chart(fig, use_container_width=True, key=key, selection_mode='points',
+                    on_select=partial(drill_into, key, level, [str(m) for m in members], path))
+end_section('Filters')
 
 # =============================================================================
 # HEADER
@@ -181,15 +296,29 @@ st.markdown(f"<p class='subtitle'>Comprehensive financial performance overview 
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Key Performance Indicators</h2></div>", unsafe_allow_html=True)
 
-total_revenue = filtered_df['Revenue'].sum()
-total_cost = filtered_df['Cost'].sum()
-total_profit = filtered_df['Profit'].sum()
-avg_margin = filtered_df['Margin_%'].mean()
-
-revenue_change = 12.5
-profit_change = 8.3
-cost_change = 5.2
-margin_change = 2.1
+track_recompute('Key Performance Indicators')
+totals = queries.totals()
+total_revenue = totals['revenue']
+total_cost = totals['cost']
+total_profit = totals['profit']
+avg_margin = totals['avg_margin']
+# Undefined (NaN) for an empty selection; the SQL backend returns a plain 0 revenue there
+cost_share = total_cost / total_revenue * 100 if total_revenue else float('nan')
+
+# Period-over-period deltas from prefix sums (O(1) per Department x Category)
+delta_start = filter_start if filter_start is not None else pd.Timestamp(min_date)
+delta_end = filter_end if filter_end is not None else pd.Timestamp(max_date)
+deltas = kpi_deltas(backend.prefix_sums, delta_start, delta_end, filter_members['Department'],
+                    filter_members['Category'], comparison)
+delta_label = f"vs {COMPARISONS[comparison]}"
+
+def delta_html(change, unit='%', higher_is_better=True):
+    if change is None:
+        return f"<div class='metric-delta neutral'>No data {delta_label}</div>"
+    arrow, status = get_trend_indicator(round(change, 1))
+    if not higher_is_better and status != 'neutral':
+        status = 'negative' if status == 'positive' else 'positive'
+    return f"<div class='metric-delta {status}'><span style='font-size:1.2rem;'>{arrow}</span> {abs(change):.1f}{unit} {delta_label}</div>"
 
 col1, col2, col3, col4 = st.columns(4)
 
@@ -212,20 +341,39 @@ def render_metric(col, letter, letter_bg, label, value, delta_html):
 
 render_metric(col1, "R", f"linear-gradient(135deg, {COLORS['accent_blue']}, {COLORS['accent_blue_light']})",
               "Total Revenue", format_currency(total_revenue),
-              f"<div class='metric-delta positive'><span style='font-size:1.2rem;'>↗</span> {revenue_change:.1f}% vs prev period</div>")
+              delta_html(deltas['revenue']))
 
 render_metric(col2, "P", f"linear-gradient(135deg, {COLORS['success']}, {COLORS['success_dark']})",
               "Total Profit", format_currency(total_profit),
-              f"<div class='metric-delta positive'><span style='font-size:1.2rem;'>↗</span> {profit_change:.1f}% vs prev period</div>")
+              delta_html(deltas['profit']))
 
 render_metric(col3, "C", f"linear-gradient(135deg, {COLORS['danger']}, {COLORS['danger_dark']})",
               "Total Cost", format_currency(total_cost),
-              f"<div class='metric-delta neutral'>{format_percentage(total_cost/total_revenue*100)} of revenue</div>")
+              delta_html(deltas['cost'], higher_is_better=False) + f"<div class='metric-delta neutral'>{format_optional(cost_share, format_percentage)} of revenue</div>")
 
 margin_status = "positive" if avg_margin >= 70 else "negative"
 render_metric(col4, "M", f"linear-gradient(135deg, {COLORS['warning']}, {COLORS['warning_light']})",
-              "Average Margin", format_percentage(avg_margin),
-              f"<div class='metric-delta {margin_status}'>Target: 70% <span style='font-size:1.2rem;'>↗</span></div>")
+              "Average Margin", format_optional(avg_margin, format_percentage),
+              delta_html(deltas['margin'], unit='pp') + f"<div class='metric-delta {margin_status}'>Target: 70%</div>")
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_margin_view(sketch_version, entity, department, category, start, end, _sketch_df):
+    # Percentiles from the pipeline's margin histograms: a sum of the selected bins, no row scan
+    track_recompute('Margin Distribution')
+    rows = select_sketch(_sketch_df, start, end, department, category)
+    return sketch_percentiles(rows), margin_distribution(rows, 'Department')
+
+margin_view, dept_margin_distribution = build_margin_view(
+    table_versions['margin_sketch'], entity, filter_members['Department'], filter_members['Category'],
+    filter_start, filter_end, margin_sketch_df)
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Median Margin", format_optional(margin_view['P50'], format_percentage))
+col2.metric("P10 Margin", format_optional(margin_view['P10'], format_percentage))
+col3.metric("P90 Margin", format_optional(margin_view['P90'], format_percentage))
+col4.metric("Revenue-Weighted Margin", format_optional(totals['weighted_margin'], format_percentage))
+st.caption(f"Percentiles within ±{MARGIN_BIN_WIDTH / 2:g} pp, over the whole months of the date range • "
+           "revenue-weighted margin = profit / revenue")
+end_section('Key Performance Indicators')
 
 # =============================================================================
 # Trends chart
@@ -233,22 +381,21 @@ render_metric(col4, "M", f"linear-gradient(135deg, {COLORS['warning']}, {COLORS[
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Revenue & Profit Trends</h2></div>", unsafe_allow_html=True)
 
-monthly_data = filtered_df.groupby(filtered_df['Date'].dt.to_period('M')).agg({'Revenue':'sum','Cost':'sum','Profit':'sum'}).reset_index()
-monthly_data['Date'] = monthly_data['Date'].astype(str)
+granularity = st.radio("Granularity", list(TREND_GRAINS), index=list(TREND_GRAINS).index('Month'), horizontal=True)
+
+track_recompute('Revenue & Profit Trends')
+# Full-resolution series from the day-grain cube, then cut to the chart's point budget (LTTB)
+trend_data = queries.trend(TREND_GRAINS[granularity])
+plotted = downsample_trend(trend_data, TREND_MEASURES, point_budget())
+# Markers only while they stay readable
+trend_mode = 'lines+markers' if len(plotted) <= 120 else 'lines'
 
 fig_trends = go.Figure()
-fig_trends.add_trace(go.Scatter(x=monthly_data['Date'], y=monthly_data['Revenue'], name='Revenue',
-                                line=dict(color=COLORS['accent_blue'], width=3), mode='lines+markers',
-                                marker=dict(size=6, line=dict(width=2, color=COLORS['bg_primary'])),
-                                hovertemplate='<b>Revenue</b><br>%{y:,.0f}<extra></extra>'))
-fig_trends.add_trace(go.Scatter(x=monthly_data['Date'], y=monthly_data['Profit'], name='Profit',
-                                line=dict(color=COLORS['success'], width=3), mode='lines+markers',
-                                marker=dict(size=6, line=dict(width=2, color=COLORS['bg_primary'])),
-                                hovertemplate='<b>Profit</b><br>%{y:,.0f}<extra></extra>'))
-fig_trends.add_trace(go.Scatter(x=monthly_data['Date'], y=monthly_data['Cost'], name='Cost',
-                                line=dict(color=COLORS['danger'], width=3), mode='lines+markers',
-                                marker=dict(size=6, line=dict(width=2, color=COLORS['bg_primary'])),
-                                hovertemplate='<b>Cost</b><br>%{y:,.0f}<extra></extra>'))
+for measure, color in [('Revenue', COLORS['accent_blue']), ('Profit', COLORS['success']), ('Cost', COLORS['danger'])]:
+    fig_trends.add_trace(go.Scatter(x=plotted['Date'], y=plotted[measure], name=measure,
+                                    line=dict(color=color, width=3), mode=trend_mode,
+                                    marker=dict(size=6, line=dict(width=2, color=COLORS['bg_primary'])),
+                                    hovertemplate=f'<b>{measure}</b><br>%{{y:,.0f}}<extra></extra>'))
 
 fig_trends.update_layout(height=450, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
                          font=dict(family='Inter', size=12, color=COLORS['text_primary']),
@@ -257,16 +404,21 @@ fig_trends.update_layout(height=450, paper_bgcolor=COLORS['chart_bg'], plot_bgco
                          hovermode='x unified', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
                          margin=dict(l=60, r=40, t=60, b=60))
 st.plotly_chart(fig_trends, use_container_width=True)
+if len(plotted) < len(trend_data):
+    st.caption(f"Showing {len(plotted):,} of {len(trend_data):,} {granularity.lower()} points (LTTB downsampled; spikes and dips kept)")
+end_section('Revenue & Profit Trends')
 
 # =============================================================================
 # Departments charts
 # =============================================================================
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Department Performance</h2></div>", unsafe_allow_html=True)
+track_recompute('Department Performance')
+dept_summary = queries.by_dimension('Department')
 col1, col2 = st.columns(2)
 
 with col1:
-    dept_revenue = filtered_df.groupby('Department')['Revenue'].sum().reset_index().sort_values('Revenue', ascending=False)
+    dept_revenue = dept_summary.sort_values('Revenue', ascending=False)
     fig_dept_revenue = go.Figure(data=[go.Bar(x=dept_revenue['Department'], y=dept_revenue['Revenue'],
                                               marker=dict(color=COLORS['accent_blue'], line=dict(color=COLORS['accent_blue_dark'], width=1)),
                                               text=dept_revenue['Revenue'].apply(lambda x: format_currency(x)),
@@ -275,31 +427,45 @@ with col1:
     fig_dept_revenue.update_layout(title=dict(text="Revenue by Department", font=dict(size=16, color=COLORS['text_primary'])),
                                    height=380, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
                                    xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']), yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']), margin=dict(l=60, r=20, t=60, b=60))
-    st.plotly_chart(fig_dept_revenue, use_container_width=True)
+    drill_chart(fig_dept_revenue, 'drill_dept_revenue', 'Department', dept_revenue['Department'])
 
 with col2:
-    dept_margin = filtered_df.groupby('Department')['Margin_%'].mean().reset_index().sort_values('Margin_%', ascending=False)
+    dept_margin = dept_summary.sort_values('Margin_%', ascending=False)
     colors_margin = [COLORS['success'] if m >= 70 else COLORS['warning'] if m >= 60 else COLORS['danger'] for m in dept_margin['Margin_%']]
     fig_dept_margin = go.Figure(data=[go.Bar(x=dept_margin['Department'], y=dept_margin['Margin_%'],
                                              marker=dict(color=colors_margin, line=dict(color=COLORS['bg_primary'], width=1.5)),
                                              text=dept_margin['Margin_%'].apply(lambda x: f"{x:.1f}%"),
                                              textposition='outside',
+                                             name='Average',
                                              hovertemplate='<b>%{x}</b><br>Margin: %{y:.2f}%<extra></extra>')])
+    # Median with the P10-P90 range of the row margins, from the margin sketch
+    spread = dept_margin[['Department']].astype(str).merge(dept_margin_distribution.astype({'Department': str}),
+                                                         on='Department', how='left')
+    fig_dept_margin.add_trace(go.Scatter(x=spread['Department'], y=spread['P50'], mode='markers', name='Median (P10-P90)',
+                                         marker=dict(color=COLORS['text_primary'], size=10, symbol='diamond'),
+                                         error_y=dict(type='data', symmetric=False, array=spread['P90'] - spread['P50'],
+                                                      arrayminus=spread['P50'] - spread['P10'], color=COLORS['text_muted']),
+                                         customdata=spread[['P10', 'P90']],
+                                         hovertemplate='<b>%{x}</b><br>Median: %{y:.2f}%<br>P10-P90: %{customdata[0]:.2f}% - %{customdata[1]:.2f}%<extra></extra>'))
     fig_dept_margin.add_hline(y=70, line_dash="dash", line_color=COLORS['text_muted'], line_width=2)
-    fig_dept_margin.update_layout(title=dict(text="Average Margin by Department", font=dict(size=16, color=COLORS['text_primary'])),
+    fig_dept_margin.update_layout(title=dict(text="Margin by Department", font=dict(size=16, color=COLORS['text_primary'])),
                                   height=380, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
+                                  legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
                                   margin=dict(l=60, r=20, t=60, b=60))
-    st.plotly_chart(fig_dept_margin, use_container_width=True)
+    drill_chart(fig_dept_margin, 'drill_dept_margin', 'Department', dept_margin['Department'])
+end_section('Department Performance')
 
 # =============================================================================
 # Category breakdown
 # =============================================================================
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Category Breakdown</h2></div>", unsafe_allow_html=True)
+track_recompute('Category Breakdown')
+category_summary = queries.by_dimension('Category')
 col1, col2 = st.columns(2)
 
 with col1:
-    category_revenue = filtered_df.groupby('Category')['Revenue'].sum().reset_index().sort_values('Revenue', ascending=False)
+    category_revenue = category_summary.sort_values('Revenue', ascending=False)
     colors_cat = [COLORS['accent_blue'], COLORS['success'], COLORS['warning'], COLORS['danger'], COLORS['accent_blue_light'], COLORS['success_light']]
     fig_cat_donut = go.Figure(data=[go.Pie(labels=category_revenue['Category'], values=category_revenue['Revenue'], hole=0.5,
                                            marker=dict(colors=colors_cat[:len(category_revenue)], line=dict(color=COLORS['bg_primary'], width=2)),
@@ -307,15 +473,96 @@ with col1:
                                            hovertemplate='<b>%{label}</b><br>Revenue: %{value:,.0f}<br>Share: %{percent}<extra></extra>')])
     fig_cat_donut.add_annotation(text=f"<b>{format_currency(category_revenue['Revenue'].sum())}</b><br><span style='font-size:12px'>Total</span>", x=0.5, y=0.5, showarrow=False, font=dict(size=18, family='JetBrains Mono', color=COLORS['text_primary']))
     fig_cat_donut.update_layout(height=380, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'], margin=dict(l=20, r=120, t=60, b=20))
-    st.plotly_chart(fig_cat_donut, use_container_width=True)
+    drill_chart(fig_cat_donut, 'drill_cat_donut', 'Category', category_revenue['Category'])
 
 with col2:
-    category_profit = filtered_df.groupby('Category')['Profit'].sum().reset_index().sort_values('Profit', ascending=True)
+    category_profit = category_summary.sort_values('Profit', ascending=True)
     max_profit = max(category_profit['Profit'].max(), 1)
     colors_profit = [f'rgba({int(16 + (239-16)*(1-p/max_profit))}, {int(185 + (68-185)*(1-p/max_profit))}, {int(129 + (68-129)*(1-p/max_profit))}, 0.8)' for p in category_profit['Profit']]
     fig_cat_profit = go.Figure(data=[go.Bar(y=category_profit['Category'], x=category_profit['Profit'], orientation='h', marker=dict(color=colors_profit, line=dict(color=COLORS['bg_primary'], width=1.5)), text=category_profit['Profit'].apply(lambda x: format_currency(x)), textposition='outside', hovertemplate='<b>%{y}</b><br>Profit: %{x:,.0f}<extra></extra>')])
     fig_cat_profit.update_layout(height=380, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'], margin=dict(l=120, r=80, t=60, b=40))
-    st.plotly_chart(fig_cat_profit, use_container_width=True)
+    drill_chart(fig_cat_profit, 'drill_cat_profit', 'Category', category_profit['Category'])
+st.caption("Click a department or category to drill down")
+end_section('Category Breakdown')
+
+# =============================================================================
+# Drill-down
+# =============================================================================
+
+@st.cache_data(show_spinner=False, max_entries=DRILL_CACHE_ENTRIES)
+def build_drill_level(version, entity, start, end, members, path, _backend):
+    # One step of the path: the next level's aggregates for the narrowed selection
+    track_recompute('Drill-Down')
+    drill_start, drill_end, drill_members = drill_filters(path, start, end, dict(members))
+    return drill_level(_backend.filter(drill_start, drill_end, drill_members), next_level(path, dict(members)))
+
+@st.cache_data(show_spinner=False, max_entries=DRILL_CACHE_ENTRIES)
+def build_drill_page(version, entity, start, end, members, path, page, _backend):
+    # End of the path: one page of the matching transactions (index positions / SQL, no table scan)
+    track_recompute('Drill-Down')
+    drill_start, drill_end, drill_members = drill_filters(path, start, end, dict(members))
+    drilled = _backend.filter(drill_start, drill_end, drill_members)
+    return drilled.count(), drilled.page('Date', True, page, DRILL_PAGE_SIZE)
+
+@st.cache_data(show_spinner=False, max_entries=DRILL_CACHE_ENTRIES)
+def build_drill_margins(sketch_version, entity, start, end, members, path, _sketch_df):
+    # Margin percentiles of the narrowed selection: Client_Type is a sketch key, so a drilled
+    # client type selects its own cells (months are whole months, as in the margin view)
+    track_recompute('Drill-Down')
+    drill_start, drill_end, drill_members = drill_filters(path, start, end, dict(members))
+    return sketch_percentiles(select_sketch(_sketch_df, drill_start, drill_end, drill_members.get('Department'),
+                                            drill_members.get('Category'), drill_members.get('Client_Type')))
+
+def set_drill_path(path):
+    st.session_state['drill'] = (st.session_state['drill'][0], path)
+
+drill_path = st.session_state['drill'][1]
+if drill_path:
+    track_cache_lookup('Drill-Down')
+    st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Drill-Down</h2></div>", unsafe_allow_html=True)
+    # Breadcrumbs: each step goes back to that point of the path
+    crumbs = st.columns(len(drill_path) + 1)
+    crumbs[0].button("All", on_click=set_drill_path, args=((),), use_container_width=True)
+    for i, (level, member) in enumerate(drill_path):
+        crumbs[i + 1].button(f"{level.replace('_', ' ')}: {member}", key=f"drill_crumb_{i}",
+                             on_click=set_drill_path, args=(drill_path[:i + 1],), use_container_width=True)
+
+    drill_members = tuple(filter_members.items())
+    drill_margins = build_drill_margins(table_versions['margin_sketch'], entity, filter_start, filter_end,
+                                        drill_members, drill_path, margin_sketch_df)
+    st.caption(f"Margin of this selection: median {format_optional(drill_margins['P50'], format_percentage)}"
+               f" • P10 {format_optional(drill_margins['P10'], format_percentage)}"
+               f" • P90 {format_optional(drill_margins['P90'], format_percentage)}"
+               f" ({drill_margins['count']:,} transactions, ±{MARGIN_BIN_WIDTH / 2:g} pp)")
+    level = next_level(drill_path, filter_members)
+    if level is not None:
+        level_df = build_drill_level(backend.version, entity, filter_start, filter_end, drill_members, drill_path,
+                                     backend)
+        if level_df.empty:
+            st.info("No transactions for this selection.")
+        else:
+            fig_drill = go.Figure(data=[go.Bar(x=level_df[level].astype(str), y=level_df['Revenue'],
+                                               marker=dict(color=COLORS['accent_blue'], line=dict(color=COLORS['accent_blue_dark'], width=1)),
+                                               text=level_df['Revenue'].apply(format_currency), textposition='outside',
+                                               customdata=level_df[['Profit']],
+                                               hovertemplate='<b>%{x}</b><br>Revenue: %{y:,.0f}<br>Profit: %{customdata[0]:,.0f}<extra></extra>')])
+            fig_drill.update_layout(title=dict(text=f"Revenue by {level.replace('_', ' ')}", font=dict(size=16, color=COLORS['text_primary'])),
+                                    height=380, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
+                                    xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']),
+                                    yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']), margin=dict(l=60, r=20, t=60, b=60))
+            drill_chart(fig_drill, 'drill_' + '/'.join(member for _, member in drill_path), level, level_df[level],
+                        drill_path)
+            st.caption(f"Click a bar to drill into its {'transactions' if level == DRILL_LEVELS[-1] else 'next level'}")
+    else:
+        drill_count, _ = build_drill_page(backend.version, entity, filter_start, filter_end, drill_members, drill_path,
+                                          1, backend)
+        drill_page = st.number_input("Page", min_value=1, max_value=page_count(drill_count, DRILL_PAGE_SIZE), value=1,
+                                     step=1, key='drill_page_' + '/'.join(member for _, member in drill_path))
+        _, drill_rows = build_drill_page(backend.version, entity, filter_start, filter_end, drill_members, drill_path,
+                                         int(drill_page), backend)
+        st.caption(f"{drill_count:,} matching transactions")
+        st.dataframe(drill_rows, use_container_width=True, hide_index=True, column_config=GRID_COLUMN_CONFIG)
+end_section('Drill-Down')
 
 # =============================================================================
 # Budget performance
@@ -323,119 +570,327 @@ with col2:
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Budget Performance Analysis</h2></div>", unsafe_allow_html=True)
 
-dept_achievement = budget_df.groupby('Department')['Revenue_Achievement_%'].mean().reset_index().sort_values('Revenue_Achievement_%', ascending=False)
-colors_achievement = [COLORS['success'] if a >= 100 else COLORS['warning'] if a >= 90 else COLORS['danger'] for a in dept_achievement['Revenue_Achievement_%']]
-
-# Compute x-axis max (achievement %)
-x_max_val = max(dept_achievement['Revenue_Achievement_%'].max() * 1.05, 130)
-x_axis_max = int(round(x_max_val + 5))
-
-fig_budget = go.Figure()
-
-fig_budget.add_trace(go.Bar(
-    y=dept_achievement['Department'],
-    x=dept_achievement['Revenue_Achievement_%'],
-    orientation='h',
-    marker=dict(color=colors_achievement, line=dict(color=COLORS['bg_primary'], width=1.5)),
-    text=dept_achievement['Revenue_Achievement_%'].apply(lambda x: f'{x:.1f}%'),
-    textposition='outside',
-    textfont=dict(size=12, family='JetBrains Mono', color=COLORS['text_primary']),
-    hovertemplate='<b>%{y}</b><br>%{x:.2f}%<extra></extra>'
-))
-
-# Zone shading across the X axis (vertical bands)
-fig_budget.add_shape(type="rect", xref="x", x0=100, x1=x_axis_max, yref="paper", y0=0, y1=1,
-                     fillcolor="rgba(16,185,129,0.06)", line_width=0, layer="below")
-fig_budget.add_shape(type="rect", xref="x", x0=90, x1=100, yref="paper", y0=0, y1=1,
-                     fillcolor="rgba(245,158,11,0.06)", line_width=0, layer="below")
-fig_budget.add_shape(type="rect", xref="x", x0=0, x1=90, yref="paper", y0=0, y1=1,
-                     fillcolor="rgba(239,68,68,0.03)", line_width=0, layer="below")
-
-# Guideline lines
-fig_budget.add_hline(y=0, line_dash="solid", line_color="rgba(0,0,0,0)", line_width=0)  # noop to keep layout consistent
-fig_budget.add_vline(x=100, line_dash="solid", line_color="rgba(200,200,200,0.6)", line_width=2)
-fig_budget.add_vline(x=90,  line_dash="dot",   line_color=COLORS['warning'], line_width=1.5)
-
-# Compact annotations on right (inside plot area)
-fig_budget.add_annotation(x=0.995, y=1.02, xref="paper", yref="paper",
-                          text="Target: 100%", showarrow=False,
-                          xanchor="right", yanchor="bottom",
-                          font=dict(size=11, color="rgba(200,200,200,0.95)"),
-                          bgcolor="rgba(0,0,0,0.45)", borderpad=6)
-
-fig_budget.add_annotation(x=0.995, y=0.98, xref="paper", yref="paper",
-                          text="Warning: 90%", showarrow=False,
-                          xanchor="right", yanchor="bottom",
-                          font=dict(size=11, color=COLORS['warning']),
-                          bgcolor="rgba(0,0,0,0.45)", borderpad=6)
-
-# Layout and margins
-fig_budget.update_layout(
-    title=dict(text="Revenue Achievement by Department (%)", font=dict(size=18, weight=700, color=COLORS['text_primary'])),
-    height=420,
-    paper_bgcolor=COLORS['chart_bg'],
-    plot_bgcolor=COLORS['chart_bg'],
-    font=dict(family='Inter', color=COLORS['text_primary']),
-    xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary'], title="Achievement (%)", range=[0, max(x_axis_max, 110)]),
-    yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']),
-    showlegend=False,
-    margin=dict(l=60, r=160, t=60, b=60),
-    hoverlabel=dict(bgcolor=COLORS['bg_secondary'], font_size=12)
-)
-
-# Optional: annotate outlier (Research) so the high value is highlighted
-if 'Research' in dept_achievement['Department'].values:
-    research_val = float(dept_achievement.loc[dept_achievement['Department'] == 'Research', 'Revenue_Achievement_%'].values[0])
-    fig_budget.add_annotation(
-        x=research_val,
-        y='Research',
-        xref="x",
-        yref="y",
-        text=f"Research {research_val:.1f}%",
-        showarrow=True,
-        arrowhead=3,
-        ax=-40,
-        ay=0,
-        font=dict(size=11, color=COLORS['text_primary'], family='JetBrains Mono'),
-        bgcolor=COLORS['accent_blue'],
-        bordercolor=COLORS['accent_blue'],
-        opacity=0.95
+@st.cache_data(show_spinner=False)
+def build_budget_figure(budget_version, entity, _budget_df):
+    # Independent of the sidebar filters: rebuilt only when the budget table changes
+    track_recompute('Budget Performance')
+    dept_achievement = _budget_df.groupby('Department', observed=True)['Revenue_Achievement_%'].mean().reset_index().sort_values('Revenue_Achievement_%', ascending=False)
+    colors_achievement = [COLORS['success'] if a >= 100 else COLORS['warning'] if a >= 90 else COLORS['danger'] for a in dept_achievement['Revenue_Achievement_%']]
+
+    # Compute x-axis max (achievement %)
+    x_max_val = max(dept_achievement['Revenue_Achievement_%'].max() * 1.05, 130)
+    x_axis_max = int(round(x_max_val + 5))
+
+    fig_budget = go.Figure()
+
+    fig_budget.add_trace(go.Bar(
+        y=dept_achievement['Department'],
+        x=dept_achievement['Revenue_Achievement_%'],
+        orientation='h',
+        marker=dict(color=colors_achievement, line=dict(color=COLORS['bg_primary'], width=1.5)),
+        text=dept_achievement['Revenue_Achievement_%'].apply(lambda x: f'{x:.1f}%'),
+        textposition='outside',
+        textfont=dict(size=12, family='JetBrains Mono', color=COLORS['text_primary']),
+        hovertemplate='<b>%{y}</b><br>%{x:.2f}%<extra></extra>'
+    ))
+
+    # Zone shading across the X axis (vertical bands)
+    fig_budget.add_shape(type="rect", xref="x", x0=100, x1=x_axis_max, yref="paper", y0=0, y1=1,
+                         fillcolor="rgba(16,185,129,0.06)", line_width=0, layer="below")
+    fig_budget.add_shape(type="rect", xref="x", x0=90, x1=100, yref="paper", y0=0, y1=1,
+                         fillcolor="rgba(245,158,11,0.06)", line_width=0, layer="below")
+    fig_budget.add_shape(type="rect", xref="x", x0=0, x1=90, yref="paper", y0=0, y1=1,
+                         fillcolor="rgba(239,68,68,0.03)", line_width=0, layer="below")
+
+    # Guideline lines
+    fig_budget.add_hline(y=0, line_dash="solid", line_color="rgba(0,0,0,0)", line_width=0)  # noop to keep layout consistent
+    fig_budget.add_vline(x=100, line_dash="solid", line_color="rgba(200,200,200,0.6)", line_width=2)
+    fig_budget.add_vline(x=90,  line_dash="dot",   line_color=COLORS['warning'], line_width=1.5)
+
+    # Compact annotations on right (inside plot area)
+    fig_budget.add_annotation(x=0.995, y=1.02, xref="paper", yref="paper",
+                              text="Target: 100%", showarrow=False,
+                              xanchor="right", yanchor="bottom",
+                              font=dict(size=11, color="rgba(200,200,200,0.95)"),
+                              bgcolor="rgba(0,0,0,0.45)", borderpad=6)
+
+    fig_budget.add_annotation(x=0.995, y=0.98, xref="paper", yref="paper",
+                              text="Warning: 90%", showarrow=False,
+                              xanchor="right", yanchor="bottom",
+                              font=dict(size=11, color=COLORS['warning']),
+                              bgcolor="rgba(0,0,0,0.45)", borderpad=6)
+
+    # Layout and margins
+    fig_budget.update_layout(
+        title=dict(text="Revenue Achievement by Department (%)", font=dict(size=18, weight=700, color=COLORS['text_primary'])),
+        height=420,
+        paper_bgcolor=COLORS['chart_bg'],
+        plot_bgcolor=COLORS['chart_bg'],
+        font=dict(family='Inter', color=COLORS['text_primary']),
+        xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary'], title="Achievement (%)", range=[0, max(x_axis_max, 110)]),
+        yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']),
+        showlegend=False,
+        margin=dict(l=60, r=160, t=60, b=60),
+        hoverlabel=dict(bgcolor=COLORS['bg_secondary'], font_size=12)
     )
 
+    # Optional: annotate outlier (Research) so the high value is highlighted
+    if 'Research' in dept_achievement['Department'].values:
+        research_val = float(dept_achievement.loc[dept_achievement['Department'] == 'Research', 'Revenue_Achievement_%'].values[0])
+        fig_budget.add_annotation(
+            x=research_val,
+            y='Research',
+            xref="x",
+            yref="y",
+            text=f"Research {research_val:.1f}%",
+            showarrow=True,
+            arrowhead=3,
+            ax=-40,
+            ay=0,
+            font=dict(size=11, color=COLORS['text_primary'], family='JetBrains Mono'),
+            bgcolor=COLORS['accent_blue'],
+            bordercolor=COLORS['accent_blue'],
+            opacity=0.95
+        )
+    return fig_budget
+
+track_cache_lookup('Budget Performance')
+fig_budget = build_budget_figure(table_versions['budget_analysis'], entity, budget_df)
 st.plotly_chart(fig_budget, use_container_width=True)
+end_section('Budget Performance')
+
+# =============================================================================
+# Rolling & run-rate forecast
+# =============================================================================
+
+st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Rolling & Run-Rate Forecast</h2></div>", unsafe_allow_html=True)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def build_period_view(metrics_version, entity, department, start, end, _metrics_df):
+    # Reads the pipeline's precomputed windows; only the selected departments are summed here
+    track_recompute('Rolling & Run-Rate')
+    return select_period_metrics(_metrics_df, start, end, department)
+
+track_cache_lookup('Rolling & Run-Rate')
+period_view = build_period_view(table_versions['period_metrics'], entity, filter_members['Department'],
+                                filter_start, filter_end, period_metrics_df)
+if period_view.empty:
+    st.info("No period metrics for the selected range.")
+else:
+    latest = period_view.iloc[-1]
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Rolling 3M Revenue", format_optional(latest['Revenue_3M'], format_currency))
+    col2.metric("Rolling 12M Revenue", format_optional(latest['Revenue_12M'], format_currency))
+    col3.metric("Revenue YoY", format_optional(latest['Revenue_YoY_%'], format_percentage))
+    col4.metric("YTD vs Budget", format_optional(latest['Revenue_YTD_Achievement_%'], format_percentage),
+                delta=format_currency(abs(latest['YTD_Revenue'] - latest['YTD_Budget_Revenue'])) +
+                (" over" if latest['YTD_Revenue'] >= latest['YTD_Budget_Revenue'] else " under"),
+                delta_color='normal' if latest['YTD_Revenue'] >= latest['YTD_Budget_Revenue'] else 'inverse')
+    col5.metric("Full-Year Run-Rate", format_optional(latest['Run_Rate_Revenue'], format_currency),
+                delta=f"{format_optional(latest['Revenue_Run_Rate_vs_Budget_%'], format_percentage)} of FY budget",
+                delta_color='off')
+    st.caption(f"As of {latest['Month'].strftime('%B %Y')} • run-rate = year-to-date pace × 12 months")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fig_rolling = go.Figure()
+        for column, name, color, dash in [('Revenue_3M', 'Revenue (3M)', COLORS['accent_blue'], 'solid'),
+                                          ('Profit_3M', 'Profit (3M)', COLORS['success'], 'solid'),
+                                          ('Revenue_12M', 'Revenue (12M)', COLORS['accent_blue_light'], 'dot'),
+                                          ('Profit_12M', 'Profit (12M)', COLORS['success_light'], 'dot')]:
+            fig_rolling.add_trace(go.Scatter(x=period_view['Month'], y=period_view[column], name=name,
+                                             line=dict(color=color, width=3, dash=dash), mode='lines+markers',
+                                             hovertemplate=f'<b>{name}</b><br>%{{y:,.0f}}<extra></extra>'))
+        fig_rolling.update_layout(title=dict(text="Rolling Revenue & Profit", font=dict(size=18, weight=700, color=COLORS['text_primary'])),
+                                  height=420, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
+                                  font=dict(family='Inter', color=COLORS['text_primary']),
+                                  xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']),
+                                  yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary'], tickformat=',.0f'),
+                                  hovermode='x unified', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                                  margin=dict(l=60, r=40, t=80, b=60))
+        st.plotly_chart(fig_rolling, use_container_width=True)
+    with col2:
+        fig_ytd = go.Figure()
+        fig_ytd.add_trace(go.Bar(x=period_view['Month'], y=period_view['YTD_Revenue'], name='YTD Revenue',
+                                 marker=dict(color=COLORS['accent_blue']),
+                                 hovertemplate='<b>YTD Revenue</b><br>%{y:,.0f}<extra></extra>'))
+        fig_ytd.add_trace(go.Scatter(x=period_view['Month'], y=period_view['YTD_Budget_Revenue'], name='YTD Budget',
+                                     line=dict(color=COLORS['warning'], width=3), mode='lines+markers',
+                                     hovertemplate='<b>YTD Budget</b><br>%{y:,.0f}<extra></extra>'))
+        fig_ytd.add_trace(go.Scatter(x=period_view['Month'], y=period_view['Run_Rate_Revenue'], name='Run-Rate (FY)',
+                                     line=dict(color=COLORS['success'], width=2, dash='dash'), mode='lines',
+                                     hovertemplate='<b>Run-Rate (FY)</b><br>%{y:,.0f}<extra></extra>'))
+        fig_ytd.update_layout(title=dict(text="Year-to-Date Revenue vs Budget", font=dict(size=18, weight=700, color=COLORS['text_primary'])),
+                              height=420, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
+                              font=dict(family='Inter', color=COLORS['text_primary']),
+                              xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary']),
+                              yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary'], tickformat=',.0f'),
+                              hovermode='x unified', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                              margin=dict(l=60, r=40, t=80, b=60))
+        st.plotly_chart(fig_ytd, use_container_width=True)
+end_section('Rolling & Run-Rate')
+
+# =============================================================================
+# Scenario analysis
+# =============================================================================
+
+st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Scenario Analysis</h2></div>", unsafe_allow_html=True)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_scenarios(budget_version, receivables_version, entity, department, start, end, assumptions, count,
+                    _budget_df, _receivables_df, as_of):
+    # All scenarios are evaluated as one batch of array operations
+    track_recompute('Scenario Analysis')
+    rows = _budget_df
+    if department is not None:
+        rows = rows[rows['Department'] == department]
+    if start is not None:
+        rows = rows[(rows['Month'] >= start.to_period('M').to_timestamp()) & (rows['Month'] <= end)]
+    departments, results = run_scenarios(rows, _receivables_df, as_of, dict(assumptions), count)
+    return departments, results['total_achievement'], summarize_scenarios(departments, results)
+
+col1, col2, col3, col4 = st.columns(4)
+revenue_shock = col1.slider("Revenue shock (%)", -30, 30, int(DEFAULT_ASSUMPTIONS['revenue_shock'] * 100))
+revenue_vol = col1.slider("Revenue volatility (%)", 0, 40, int(DEFAULT_ASSUMPTIONS['revenue_vol'] * 100))
+cost_inflation = col2.slider("Cost inflation (%)", -10, 20, int(DEFAULT_ASSUMPTIONS['cost_inflation'] * 100))
+cost_vol = col2.slider("Cost volatility (%)", 0, 20, int(DEFAULT_ASSUMPTIONS['cost_vol'] * 100))
+delay_days = col3.slider("Payment delay (days)", -30, 90, int(DEFAULT_ASSUMPTIONS['delay_days']))
+delay_vol = col3.slider("Delay volatility (days)", 0, 60, int(DEFAULT_ASSUMPTIONS['delay_vol']))
+correlation = col4.slider("Department correlation", 0.0, 1.0, DEFAULT_ASSUMPTIONS['correlation'], step=0.05)
+scenario_count = col4.select_slider("Scenarios", options=[1_000, 5_000, 10_000, 50_000], value=10_000)
+assumptions = (('revenue_shock', revenue_shock / 100), ('revenue_vol', revenue_vol / 100), ('correlation', correlation),
+               ('cost_inflation', cost_inflation / 100), ('cost_vol', cost_vol / 100),
+               ('delay_days', float(delay_days)), ('delay_vol', float(delay_vol)))
+
+as_of = invoice_totals_df['as_of'].max()
+track_cache_lookup('Scenario Analysis')
+scenario_departments, total_achievement, scenario_summary = build_scenarios(
+    table_versions['budget_analysis'], table_versions['receivables'], entity, filter_members['Department'],
+    filter_start, filter_end, assumptions, scenario_count, budget_df, receivables_df, as_of)
+if not scenario_departments:
+    st.info("No budget rows for the selected range.")
+else:
+    summary = scenario_summary.set_index('Metric')
+    col1, col2, col3 = st.columns(3)
+    for col, metric, label, formatter in [
+        (col1, 'Achievement_% (Total)', "Revenue Achievement (P50)", format_percentage),
+        (col2, 'Profit', "Profit (P50)", format_currency),
+        (col3, 'Collected', f"Collected in {CASH_HORIZON_DAYS} days (P50)", format_currency),
+    ]:
+        col.metric(label, format_optional(summary.loc[metric, 'P50'], formatter),
+                   delta=f"P5 {format_optional(summary.loc[metric, 'P5'], formatter)} • "
+                         f"P95 {format_optional(summary.loc[metric, 'P95'], formatter)}", delta_color='off')
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fig_scenarios = go.Figure(go.Histogram(x=total_achievement, nbinsx=60, marker=dict(color=COLORS['accent_blue']),
+                                               hovertemplate='%{x:.1f}%: %{y} scenarios<extra></extra>'))
+        fig_scenarios.add_vline(x=100, line_dash="solid", line_color="rgba(200,200,200,0.6)", line_width=2)
+        fig_scenarios.update_layout(title=dict(text="Total Revenue Achievement across Scenarios (%)", font=dict(size=18, weight=700, color=COLORS['text_primary'])),
+                                    height=420, paper_bgcolor=COLORS['chart_bg'], plot_bgcolor=COLORS['chart_bg'],
+                                    font=dict(family='Inter', color=COLORS['text_primary']),
+                                    xaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary'], title="Achievement (%)"),
+                                    yaxis=dict(gridcolor=COLORS['grid'], color=COLORS['text_primary'], title="Scenarios"),
+                                    showlegend=False, margin=dict(l=60, r=40, t=60, b=60))
+        st.plotly_chart(fig_scenarios, use_container_width=True)
+    with col2:
+        st.dataframe(scenario_summary.round(2), hide_index=True, use_container_width=True, height=420)
+    st.caption(f"{len(total_achievement):,} scenarios • collections cover every pending invoice of the selected entity "
+               f"(invoices carry no department), expected as of {as_of.strftime('%B %d, %Y')}")
+end_section('Scenario Analysis')
 
 # =============================================================================
 # Invoice & Transactions
 # =============================================================================
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Invoice & Payment Analysis</h2></div>", unsafe_allow_html=True)
-paid_invoices = invoices_df[invoices_df['Status']=='Paid']
-pending_invoices = invoices_df[invoices_df['Status']=='Pending']
+
+# Independent of the sidebar filters: running totals and aging precomputed by the pipeline
+track_recompute('Invoice & Payment')
+invoice_stats = overall_totals(invoice_totals_df)
+total_invoices, paid_invoices = int(invoice_stats['total_count']), int(invoice_stats['paid_count'])
 
 col1, col2, col3, col4 = st.columns(4)
-render_metric(col1, "#", f"linear-gradient(135deg, {COLORS['accent_blue']}, {COLORS['accent_blue_dark']})", "Total Invoices", f"{len(invoices_df)}", f"<div class='metric-delta positive'>{len(paid_invoices)} paid ({len(paid_invoices)/len(invoices_df)*100:.1f}%)</div>")
-render_metric(col2, "€", f"linear-gradient(135deg, {COLORS['success']}, {COLORS['success_dark']})", "Total Amount", format_currency(invoices_df['Amount'].sum()), f"<div class='metric-delta positive'>{format_currency(paid_invoices['Amount'].sum())} received</div>")
-avg_payment_days = paid_invoices['Days_to_Payment'].mean() if len(paid_invoices)>0 else 0
+render_metric(col1, "#", f"linear-gradient(135deg, {COLORS['accent_blue']}, {COLORS['accent_blue_dark']})", "Total Invoices", f"{total_invoices}", f"<div class='metric-delta positive'>{paid_invoices} paid ({paid_invoices/total_invoices*100 if total_invoices else 0:.1f}%)</div>")
+render_metric(col2, "€", f"linear-gradient(135deg, {COLORS['success']}, {COLORS['success_dark']})", "Total Amount", format_currency(invoice_stats['total_amount']), f"<div class='metric-delta positive'>{format_currency(invoice_stats['paid_amount'])} received</div>")
+avg_payment_days = invoice_stats['avg_payment_days']
 payment_trend = "positive" if avg_payment_days <= 30 else "negative"
 render_metric(col3, "T", f"linear-gradient(135deg, {COLORS['warning']}, {COLORS['warning_light']})", "Avg Payment Time", f"{avg_payment_days:.0f} days", f"<div class='metric-delta {payment_trend}'>Target: ≤30 days</div>")
-outstanding = pending_invoices['Amount'].sum()
-render_metric(col4, "!", f"linear-gradient(135deg, {COLORS['danger']}, {COLORS['danger_dark']})", "Outstanding", format_currency(outstanding), f"<div class='metric-delta neutral'>{len(pending_invoices)} pending</div>")
+outstanding = invoice_stats['outstanding']
+render_metric(col4, "!", f"linear-gradient(135deg, {COLORS['danger']}, {COLORS['danger_dark']})", "Outstanding", format_currency(outstanding), f"<div class='metric-delta neutral'>{int(invoice_stats['pending_count'])} pending</div>")
+
+# Accounts-receivable aging of the pending invoices
+aging_cols = st.columns(len(AGING_BUCKETS))
+for col, (label, _, _) in zip(aging_cols, AGING_BUCKETS):
+    col.metric(f"Outstanding {label} days", format_currency(invoice_stats[f'aging_{label}_amount']),
+               f"{int(invoice_stats[f'aging_{label}_count'])} invoices", delta_color="off")
+st.caption(f"Aging as of {invoice_stats['as_of'].strftime('%d %b %Y')} (days since invoice date)")
 
 st.markdown("<br>", unsafe_allow_html=True)
+end_section('Invoice & Payment')
 
 st.markdown("<div class='section-header'><div class='section-dot'></div><h2>Transaction Details</h2></div>", unsafe_allow_html=True)
-display_df = filtered_df[['Date','Department','Category','Revenue','Cost','Profit','Margin_%','Client_Type']].head(50).copy()
-display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d')
-display_df['Revenue'] = display_df['Revenue'].apply(lambda x: f"€{x:,.2f}")
-display_df['Cost'] = display_df['Cost'].apply(lambda x: f"€{x:,.2f}")
-display_df['Profit'] = display_df['Profit'].apply(lambda x: f"€{x:,.2f}")
-display_df['Margin_%'] = display_df['Margin_%'].apply(lambda x: f"{x:.2f}%")
-st.dataframe(display_df, use_container_width=True, height=450, hide_index=True)
-
-csv = filtered_df.to_csv(index=False).encode('utf-8')
+track_recompute('Transaction Details')
+total_rows = queries.count()
+grid_col1, grid_col2, grid_col3, grid_col4 = st.columns([2,1,1,1])
+sort_column = grid_col1.selectbox("Sort by", GRID_COLUMNS)
+sort_ascending = grid_col2.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+page_size = grid_col3.selectbox("Rows per page", PAGE_SIZES, index=1)
+total_pages = page_count(total_rows, page_size)
+page = grid_col4.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
+display_df = queries.page(sort_column, sort_ascending, int(page), page_size)
+st.caption(f"Showing rows {min((int(page)-1)*page_size+1, total_rows):,}–{min(int(page)*page_size, total_rows):,} of {total_rows:,}")
+st.dataframe(display_df, use_container_width=True, height=450, hide_index=True, column_config=GRID_COLUMN_CONFIG)
+end_section('Transaction Details')
+
+# Export is only generated on request, then reused for the same filter state
 col1, col2, col3 = st.columns([1,1,1])
 with col2:
-    st.download_button(label="Download Full Dataset (CSV)", data=csv, file_name=f'financial_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv', mime='text/csv', use_container_width=True)
+    export_format = st.selectbox("Export format", list(EXPORT_FORMATS))
+    current_export_key = export_key(backend.version, filter_start, filter_end,
+                                    {**filter_members, 'Entity': entity}, export_format)
+    if st.button("Prepare Full Dataset Export", use_container_width=True):
+        try:
+            with st.spinner('Writing export...'):
+                st.session_state['export'] = (current_export_key, queries.export(
+                    export_format, EXPORT_DIR, current_export_key))
+        except ValueError as e:
+            st.error(str(e))
+    prepared_key, prepared_path = st.session_state.get('export', (None, None))
+    if prepared_key == current_export_key and os.path.exists(prepared_path):
+        extension, mime = EXPORT_FORMATS[export_format]
+        # Streamlit serves downloads from memory: a callable defers reading the file to the
+        # click instead of every rerun, but the click still holds one full copy of the export
+        st.download_button(label=f"Download Full Dataset ({export_format})",
+                           data=partial(read_export, prepared_path),
+                           file_name=f'financial_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}',
+                           mime=mime, use_container_width=True)
+end_section('Export')
+
+if show_diagnostics:
+    with st.expander("Debug panel", expanded=True):
+        st.caption(f"Backend: {DASHBOARD_BACKEND} • Entity: {selected_entity} • Dataset version: {dataset_version} • Reloaded with this version: {', '.join(dataset.reloaded) or 'nothing'}"
+                   f" • Script run: {sum(section_timings.values())*1000:,.0f} ms")
+        all_sections = ['Key Performance Indicators', 'Revenue & Profit Trends', 'Department Performance',
+                        'Category Breakdown', 'Budget Performance', 'Rolling & Run-Rate', 'Scenario Analysis',
+                        'Invoice & Payment', 'Transaction Details', 'Drill-Down']
+        st.dataframe(pd.DataFrame({
+            'Step': list(section_timings),
+            'Time (ms)': [round(seconds * 1000, 1) for seconds in section_timings.values()],
+            'This run': [section_status(step) if step in all_sections else '' for step in section_timings],
+        }), hide_index=True, use_container_width=True)
+        # Cached frames are shared by every session of this process
+        cached_frames = {name: df for name, df in [
+            ('transactions', dataset.transactions.df if dataset.transactions else None),
+            ('cube', dataset.cube.df if dataset.cube else None),
+            ('budget_analysis', budget_df), ('invoice_totals', invoice_totals_df),
+            ('period_metrics', period_metrics_df), ('receivables', receivables_df),
+            ('margin_sketch', margin_sketch_df)] if df is not None}
+        st.dataframe(pd.DataFrame({
+            'Cached frame': list(cached_frames),
+            'Rows': [len(df) for df in cached_frames.values()],
+            'Memory (MB)': [frame_memory_mb(df) for df in cached_frames.values()],
+        }), hide_index=True, use_container_width=True)
 
 st.markdown("<hr>", unsafe_allow_html=True)
 st.markdown(f"<div class='footer'><p class='footer-title'>Financial Analytics Dashboard </p><p class='footer-subtitle'>Created by Olha Keleman | November 2025</p></div>", unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# KPI DELTAS: cumulative daily sums per Department x Category
+# Any date range total is prefix[end + 1] - prefix[start], so comparing with
+# another period costs a handful of array lookups, not a filter + groupby
+# =============================================================================
+
+PREFIX_MEASURES = ['Revenue', 'Cost', 'Profit', 'Margin_Sum', 'Margin_Count']
+
+COMPARISONS = {
+    'Previous period': 'prev period',
+    'Same period last year': 'last year',
+}
+
+
+class PrefixSums:
+    def __init__(self, cube):
+        days = cube['Date'].values.astype('datetime64[D]')
+        # History is taken to start on the first of its first month (None: empty cube, no history)
+        self.first_day = days.min().astype('datetime64[M]').astype('datetime64[D]') if len(days) else None
+        offsets = (days - self.first_day).astype(int) if len(days) else np.zeros(0, dtype=int)
+        n_days = int(offsets.max()) + 1 if len(days) else 0
+
+        department = cube['Department'].astype('category')
+        category = cube['Category'].astype('category')
+        self.departments = {m: i for i, m in enumerate(department.cat.categories)}
+        self.categories = {m: i for i, m in enumerate(category.cat.categories)}
+
+        # Dense Department x Category x Day x Measure grid, then cumulate over days
+        daily = np.zeros((len(self.departments), len(self.categories), n_days, len(PREFIX_MEASURES)))
+        np.add.at(
+            daily,
+            (department.cat.codes.values, category.cat.codes.values, offsets),
+            cube[PREFIX_MEASURES].to_numpy(dtype=float)
+        )
+        self.prefix = np.zeros((daily.shape[0], daily.shape[1], n_days + 1, daily.shape[3]))
+        np.cumsum(daily, axis=2, out=self.prefix[:, :, 1:])
+
+    @property
+    def n_days(self):
+        return self.prefix.shape[2] - 1
+
+    def _day(self, ts):
+        return int((np.datetime64(ts, 'D') - self.first_day).astype(int))
+
+    def covers(self, start, end):
+        if self.first_day is None:
+            return False
+        return self._day(start) >= 0 and self._day(end) < self.n_days
+
+    def range_sums(self, start, end, department=None, category=None):
+        if self.first_day is None:
+            return dict.fromkeys(PREFIX_MEASURES, 0.0)
+        i0 = min(max(self._day(start), 0), self.n_days)
+        i1 = min(max(self._day(end) + 1, 0), self.n_days)
+        dept = slice(None) if department is None else self.departments.get(department)
+        cat = slice(None) if category is None else self.categories.get(category)
+        if dept is None or cat is None:
+            return dict.fromkeys(PREFIX_MEASURES, 0.0)
+        block = self.prefix[dept, cat, i1] - self.prefix[dept, cat, i0]
+        return dict(zip(PREFIX_MEASURES, block.reshape(-1, len(PREFIX_MEASURES)).sum(axis=0)))
+
+
+def comparison_window(start, end, comparison):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if comparison == 'Same period last year':
+        return start - pd.DateOffset(years=1), end - pd.DateOffset(years=1)
+    # Previous period of equal length, ending the day before the current one
+    length = end - start + pd.Timedelta(days=1)
+    return start - length, start - pd.Timedelta(days=1)
+
+
+def _pct_change(current, previous):
+    if previous == 0:
+        return None
+    return (current - previous) / abs(previous) * 100
+
+
+def _avg_margin(sums):
+    return sums['Margin_Sum'] / sums['Margin_Count'] if sums['Margin_Count'] else None
+
+
+def kpi_deltas(prefix_sums, start, end, department=None, category=None, comparison='Previous period'):
+    # % change for Revenue / Profit / Cost, percentage-point change for margin;
+    # None when the comparison window is not fully covered by the data
+    prev_start, prev_end = comparison_window(start, end, comparison)
+    if not prefix_sums.covers(prev_start, prev_end):
+        return dict.fromkeys(['revenue', 'profit', 'cost', 'margin'])
+
+    current = prefix_sums.range_sums(start, end, department, category)
+    previous = prefix_sums.range_sums(prev_start, prev_end, department, category)
+    current_margin, previous_margin = _avg_margin(current), _avg_margin(previous)
+    return {
+        'revenue': _pct_change(current['Revenue'], previous['Revenue']),
+        'profit': _pct_change(current['Profit'], previous['Profit']),
+        'cost': _pct_change(current['Cost'], previous['Cost']),
+        'margin': None if current_margin is None or previous_margin is None
+        else current_margin - previous_margin,
+    }
@@ -0,0 +1,65 @@
+from aggregate_cube import by_dimension, cube_totals, trend
+from detail_grid import grid_page
+from export import export_selection
+
+# =============================================================================
+# QUERY BACKENDS: what the dashboard asks, answered from memory or from SQL
+# Both backends expose the same methods; the dashboard picks one with the
+# DASHBOARD_BACKEND environment variable ('memory' by default, or 'sqlite')
+# =============================================================================
+
+BACKEND_ENV = 'DASHBOARD_BACKEND'
+
+BACKENDS = ('memory', 'sqlite')
+
+
+class MemoryBackend:
+    # Answers from the shared in-memory dataset (filter indexes + cube frame)
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.version = dataset.table_versions['transactions']
+        # Period comparisons: PrefixSums has covers() / range_sums()
+        self.prefix_sums = dataset.prefix_sums
+
+    def members(self, dim):
+        return self.dataset.cube.members(dim)
+
+    def date_bounds(self):
+        # (None, None) when the cube has no rows (e.g. an entity without transactions)
+        dates = self.dataset.cube.df['Date']
+        if dates.empty:
+            return None, None
+        return dates.min(), dates.max()
+
+    def overall(self):
+        return cube_totals(self.dataset.cube.df)
+
+    def filter(self, start, end, members):
+        return MemoryQueries(self.dataset, start, end, members)
+
+
+class MemoryQueries:
+    def __init__(self, dataset, start, end, members):
+        # Cube cells drive the KPIs and charts; raw rows only feed the detail grid and export
+        self.index = dataset.transactions
+        self.sort_orders = dataset.sort_orders
+        self.cube = dataset.cube.take(dataset.cube.select(start, end, **members))
+        self.selection = dataset.transactions.select(start, end, **members)
+
+    def totals(self):
+        return cube_totals(self.cube)
+
+    def trend(self, grain):
+        return trend(self.cube, grain)
+
+    def by_dimension(self, dim):
+        return by_dimension(self.cube, dim)
+
+    def count(self):
+        return self.index.count(self.selection)
+
+    def page(self, column, ascending, page, page_size):
+        return grid_page(self.index, self.selection, self.sort_orders, column, ascending, page, page_size)
+
+    def export(self, fmt, export_dir, key):
+        return export_selection(self.index, self.selection, fmt, export_dir, key)
@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from detail_grid import SortOrders
+from filter_engine import FilterIndex
+from kpi_deltas import PrefixSums
+from processed_store import dataset_version, read_table, table_version
+
+# =============================================================================
+# SHARED DATASET: one read-only copy of the processed store per process
+# Every session gets the same frames and indexes; the backing arrays are
+# marked read-only, so an in-place write raises instead of leaking into
+# other sessions. Filtering goes through the indexes and never copies.
+# A new version reuses every table whose files did not change. An entity
+# selection loads only that entity's transaction partitions
+# =============================================================================
+
+# Publishing a new version while we read -> read again (then give up and serve it)
+LOAD_ATTEMPTS = 3
+
+# Entity selections (None = all entities) kept loaded per process, least recently used dropped
+MAX_DATASETS = 4
+
+
+def freeze_frame(df):
+    # Rewrap each column's array as read-only, without copying the data
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy(copy=False)
+            codes.flags.writeable = False
+            array = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        elif values.dtype == object:
+            # Left writable: pandas' Cython helpers reject read-only object buffers
+            array = values.to_numpy(copy=False)
+        else:
+            array = values.to_numpy(copy=False)
+            array.flags.writeable = False
+        columns.append(pd.Series(array, name=col, index=df.index, copy=False))
+    if not columns:
+        return df
+    # concat along columns keeps one block per column (no consolidation copy)
+    return pd.concat(columns, axis=1, copy=False)
+
+
+def freeze_index(index):
+    index.df = freeze_frame(index.df)
+    index.dates.flags.writeable = False
+    for members in index.positions.values():
+        for positions in members.values():
+            positions.flags.writeable = False
+    return index
+
+
+# Small tables held as plain frozen frames: table name -> SharedDataset attribute
+FRAME_TABLES = {
+    'budget_analysis': 'budget',
+    # Invoices: the pipeline's one-row running totals, not the ledger itself
+    'invoice_totals': 'invoice_totals',
+    # Rolling / YoY / YTD / run-rate sums per Department x Month, precomputed by the pipeline
+    'period_metrics': 'period_metrics',
+    # Pending invoices by expected payment date, for the what-if scenarios
+    'receivables': 'receivables',
+    # Margin_% histograms per Department x Category x Month, for percentiles
+    'margin_sketch': 'margin_sketch',
+}
+
+SHARED_TABLES = list(FRAME_TABLES) + ['transactions', 'cube']
+
+
+class SharedDataset:
+    # tables: which of SHARED_TABLES to hold (the SQL backend only needs the small ones);
+    # entity: only that entity's rows (None = all)
+    def __init__(self, processed_dir, version, previous=None, tables=SHARED_TABLES, entity=None):
+        self.version = version
+        self.entity = entity
+        entities = None if entity is None else [entity]
+        self.table_versions = {name: table_version(name, processed_dir, entities) for name in SHARED_TABLES}
+        self.reloaded = [name for name in tables
+                         if previous is None or previous.table_versions[name] != self.table_versions[name]]
+
+        for name, attribute in FRAME_TABLES.items():
+            if name not in tables:
+                frame = None
+            elif name in self.reloaded:
+                frame = freeze_frame(read_table(name, processed_dir, entities=entities))
+            else:
+                frame = getattr(previous, attribute)
+            setattr(self, attribute, frame)
+
+        # The cube answers KPIs and charts; raw transactions feed the detail grid
+        if 'transactions' not in tables:
+            self.transactions, self.sort_orders = None, None
+        elif 'transactions' in self.reloaded:
+            # Partition pruning: other entities' files are never opened
+            self.transactions = freeze_index(FilterIndex(read_table('transactions', processed_dir, entities=entities)))
+            # Per-column sort orders, filled lazily and shared like the rest
+            self.sort_orders = SortOrders(self.transactions)
+        else:
+            self.transactions, self.sort_orders = previous.transactions, previous.sort_orders
+        if 'cube' not in tables:
+            self.cube, self.prefix_sums = None, None
+        elif 'cube' in self.reloaded:
+            self.cube = freeze_index(FilterIndex(read_table('cube', processed_dir, entities=entities)))
+            self.prefix_sums = PrefixSums(self.cube.df)
+        else:
+            self.cube, self.prefix_sums = previous.cube, previous.prefix_sums
+
+
+def load_shared_dataset(processed_dir, previous=None, tables=SHARED_TABLES, entity=None):
+    for _ in range(LOAD_ATTEMPTS):
+        version = dataset_version(processed_dir)
+        dataset = SharedDataset(processed_dir, version, previous, tables, entity)
+        if dataset_version(processed_dir) == version:
+            break
+    return dataset
+
+
+class DatasetStore:
+    # Process-wide holder of the live dataset per entity selection, swapped when the version changes
+    def __init__(self, tables=SHARED_TABLES):
+        self.tables = tables
+        self.datasets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, processed_dir, entity=None):
+        version = dataset_version(processed_dir)
+        dataset = self.datasets.get(entity)
+        if dataset is not None and dataset.version == version:
+            return dataset
+        # One session loads; the others wait and then share its result
+        with self.lock:
+            dataset = self.datasets.get(entity)
+            if dataset is None or dataset.version != version:
+                dataset = load_shared_dataset(processed_dir, dataset, self.tables, entity)
+                self.datasets[entity] = dataset
+            self.datasets.move_to_end(entity)
+            while len(self.datasets) > MAX_DATASETS:
+                self.datasets.popitem(last=False)
+            return dataset
@@ -0,0 +1,193 @@
+import copy
+import threading
+
+import pandas as pd
+
+from aggregate_cube import CUBE_MEASURES, TREND_MEASURES, fill_periods, weighted_margin
+from detail_grid import GRID_COLUMNS
+from export import CHUNK_ROWS, export_chunks
+from kpi_deltas import PREFIX_MEASURES
+from sql_store import connect_read_only, quote
+
+# =============================================================================
+# SQL BACKEND: dashboard queries pushed down to the SQLite store
+# Only aggregated results and the visible grid page leave the database, so
+# the transaction history does not have to fit in memory. All values are
+# bound parameters; column names come from fixed lists and are quoted
+# =============================================================================
+
+MEMBER_DIMENSIONS = ('Entity', 'Department', 'Category', 'Client_Type')
+
+# Period start per trend grain, as ISO date text (weeks start on Monday, like pandas 'W')
+PERIOD_STARTS = {
+    'D': 'Date',
+    'W': "date(Date, '-' || ((CAST(strftime('%w', Date) AS INTEGER) + 6) % 7) || ' days')",
+    'M': "substr(Date, 1, 7) || '-01'",
+    'Q': "printf('%s-%02d-01', substr(Date, 1, 4), (CAST(substr(Date, 6, 2) AS INTEGER) - 1) / 3 * 3 + 1)",
+}
+
+
+def _sql_date(ts):
+    return pd.Timestamp(ts).strftime('%Y-%m-%d')
+
+
+def _where(start=None, end=None, members=None):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('Date >= ?')
+        params.append(_sql_date(start))
+    if end is not None:
+        clauses.append('Date <= ?')
+        params.append(_sql_date(end))
+    for dim, member in (members or {}).items():
+        if member is None:
+            continue
+        if dim not in MEMBER_DIMENSIONS:
+            raise ValueError(f"Unknown filter dimension: {dim}")
+        clauses.append(f'{quote(dim)} = ?')
+        params.append(member)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+class SqliteBackend:
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        # One read-only connection per process, serialized (sqlite3 objects are not thread-safe)
+        self.conn = connect_read_only(path)
+        self.lock = threading.Lock()
+        self.prefix_sums = self
+        # Every query is scoped to this entity (None = all); see for_entity()
+        self.entity = None
+        # (entity, dim) -> members and entity -> date bounds, shared by the scoped views
+        self._members = {}
+        self._bounds = {}
+
+    def for_entity(self, entity):
+        # Same connection and caches, every query restricted to one entity
+        scoped = copy.copy(self)
+        scoped.entity = entity
+        return scoped
+
+    def where(self, start=None, end=None, members=None):
+        return _where(start, end, {**(members or {}), 'Entity': self.entity})
+
+    def fetchone(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def frame(self, sql, params=()):
+        with self.lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def members(self, dim):
+        if (self.entity, dim) not in self._members:
+            where, params = self.where()
+            rows = self.frame(f'SELECT DISTINCT {quote(dim)} FROM cube{where} ORDER BY 1', params)
+            self._members[(self.entity, dim)] = rows.iloc[:, 0].tolist()
+        return self._members[(self.entity, dim)]
+
+    def date_bounds(self):
+        if self.entity not in self._bounds:
+            where, params = self.where()
+            first, last = self.fetchone(f'SELECT MIN(Date), MAX(Date) FROM cube{where}', params)
+            # (None, None) when the cube has no rows, as in MemoryBackend
+            self._bounds[self.entity] = (None, None) if first is None else (pd.Timestamp(first), pd.Timestamp(last))
+        return self._bounds[self.entity]
+
+    def overall(self):
+        return self.filter(None, None, {}).totals()
+
+    def filter(self, start, end, members):
+        return SqliteQueries(self, start, end, members)
+
+    # Period comparisons, same contract as kpi_deltas.PrefixSums
+    def covers(self, start, end):
+        # History starts on the first of its first month, as in PrefixSums
+        first_date, last_date = self.date_bounds()
+        if first_date is None:
+            return False
+        return pd.Timestamp(start) >= first_date.to_period('M').to_timestamp() \
+            and pd.Timestamp(end) <= last_date
+
+    def range_sums(self, start, end, department=None, category=None):
+        where, params = self.where(start, end, {'Department': department, 'Category': category})
+        sums = ', '.join(f'COALESCE(SUM({quote(m)}), 0)' for m in PREFIX_MEASURES)
+        return dict(zip(PREFIX_MEASURES, self.fetchone(f'SELECT {sums} FROM cube{where}', params)))
+
+
+class SqliteQueries:
+    def __init__(self, backend, start, end, members):
+        self.backend = backend
+        self.where, self.params = backend.where(start, end, members)
+
+    def totals(self):
+        sums = ', '.join(f'COALESCE(SUM({quote(m)}), 0)' for m in CUBE_MEASURES)
+        row = dict(zip(CUBE_MEASURES, self.backend.fetchone(f'SELECT {sums} FROM cube{self.where}', self.params)))
+        return {
+            'revenue': row['Revenue'],
+            'cost': row['Cost'],
+            'profit': row['Profit'],
+            'transactions': int(row['Transactions']),
+            'avg_margin': row['Margin_Sum'] / row['Margin_Count'] if row['Margin_Count'] else float('nan'),
+            'weighted_margin': weighted_margin(row['Profit'], row['Revenue']),
+        }
+
+    def trend(self, grain):
+        if grain not in PERIOD_STARTS:
+            raise ValueError(f"Unknown trend grain: {grain}")
+        sums = ', '.join(f'SUM({quote(m)}) AS {quote(m)}' for m in TREND_MEASURES)
+        grouped = self.backend.frame(
+            f'SELECT {PERIOD_STARTS[grain]} AS Date, {sums} FROM cube{self.where} GROUP BY 1 ORDER BY 1', self.params
+        )
+        grouped['Date'] = pd.to_datetime(grouped['Date'], format='%Y-%m-%d')
+        return fill_periods(grouped, grain)
+
+    def by_dimension(self, dim):
+        if dim not in MEMBER_DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dim}")
+        sums = ', '.join(f'SUM({quote(m)}) AS {quote(m)}' for m in CUBE_MEASURES)
+        grouped = self.backend.frame(
+            f'SELECT {quote(dim)}, {sums} FROM cube{self.where} GROUP BY 1 ORDER BY 1', self.params
+        )
+        grouped['Margin_%'] = grouped['Margin_Sum'] / grouped['Margin_Count'].where(grouped['Margin_Count'] > 0)
+        return grouped
+
+    def count(self):
+        return self.backend.fetchone(f'SELECT COUNT(*) FROM transactions{self.where}', self.params)[0]
+
+    def _order(self, column, ascending):
+        if column not in GRID_COLUMNS:
+            raise ValueError(f"Unknown sort column: {column}")
+        # Store order (Date, Entity, then row_id within a partition) breaks ties;
+        # descending reverses it too, like the memory grid
+        direction = 'ASC' if ascending else 'DESC'
+        return f' ORDER BY {quote(column)} {direction}, Date {direction}, Entity {direction}, row_id {direction}'
+
+    def page(self, column, ascending, page, page_size):
+        columns = ', '.join(map(quote, GRID_COLUMNS))
+        page_df = self.backend.frame(
+            f'SELECT {columns} FROM transactions{self.where}{self._order(column, ascending)} LIMIT ? OFFSET ?',
+            self.params + [page_size, (page - 1) * page_size]
+        )
+        page_df['Date'] = pd.to_datetime(page_df['Date'], format='%Y-%m-%d')
+        return page_df
+
+    def _chunks(self):
+        # Own connection: the export cursor stays open across chunks
+        conn = connect_read_only(self.backend.path)
+        try:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(transactions)') if row[1] != 'row_id']
+            sql = f'SELECT {", ".join(map(quote, columns))} FROM transactions{self.where} ORDER BY Date, Entity, row_id'
+            empty = True
+            for chunk in pd.read_sql_query(sql, conn, params=self.params, chunksize=CHUNK_ROWS):
+                chunk['Date'] = pd.to_datetime(chunk['Date'], format='%Y-%m-%d')
+                empty = False
+                yield chunk
+            if empty:
+                yield pd.DataFrame(columns=columns)
+        finally:
+            conn.close()
+
+    def export(self, fmt, export_dir, key):
+        return export_chunks(self._chunks(), self.count(), fmt, export_dir, key)
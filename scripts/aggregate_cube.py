@@ -0,0 +1,82 @@
+import pandas as pd
+
+# =============================================================================
+# AGGREGATE CUBE: additive Date x Entity x Department x Category x Client_Type sums
+# Every dashboard KPI / chart is a re-aggregation of these cells
+# =============================================================================
+
+CUBE_DIMENSIONS = ['Date', 'Entity', 'Department', 'Category', 'Client_Type']
+
+# Additive measures: any subset of cells can be summed and merged
+CUBE_MEASURES = ['Revenue', 'Cost', 'Profit', 'Transactions', 'Margin_Sum', 'Margin_Count']
+
+
+def build_cube(transactions_df, grain='D'):
+    df = transactions_df
+    # 'D' keeps calendar days (exact date-range filters), 'M' rolls up to months
+    date_key = df['Date'].dt.to_period(grain).dt.to_timestamp().rename('Date')
+
+    cube = df.groupby(
+        [date_key] + [df[dim] for dim in CUBE_DIMENSIONS[1:]],
+        observed=True, sort=True
+    ).agg(
+        Revenue=('Revenue', 'sum'),
+        Cost=('Cost', 'sum'),
+        Profit=('Profit', 'sum'),
+        Transactions=('Revenue', 'size'),
+        Margin_Sum=('Margin_%', 'sum'),       # sum of row margins, for the mean
+        Margin_Count=('Margin_%', 'count'),   # rows with a defined margin
+    ).reset_index()
+    return cube
+
+
+def merge_cubes(*cubes):
+    # Cells are additive, so merging partial cubes is a grouped sum
+    combined = pd.concat([c for c in cubes if not c.empty], ignore_index=True)
+    for col in CUBE_DIMENSIONS[1:]:
+        combined[col] = combined[col].astype(str)
+    return combined.groupby(CUBE_DIMENSIONS, sort=True)[CUBE_MEASURES].sum().reset_index()
+
+
+def weighted_margin(profit, revenue):
+    return profit / revenue * 100 if revenue else float('nan')
+
+
+def cube_totals(cube):
+    margin_count = cube['Margin_Count'].sum()
+    return {
+        'revenue': cube['Revenue'].sum(),
+        'cost': cube['Cost'].sum(),
+        'profit': cube['Profit'].sum(),
+        'transactions': int(cube['Transactions'].sum()),
+        'avg_margin': cube['Margin_Sum'].sum() / margin_count if margin_count else float('nan'),
+        # Profit over revenue: each row's margin weighted by its revenue
+        'weighted_margin': weighted_margin(cube['Profit'].sum(), cube['Revenue'].sum()),
+    }
+
+
+# Trend chart grains (dashboard label -> pandas period code)
+TREND_GRAINS = {'Day': 'D', 'Week': 'W', 'Month': 'M', 'Quarter': 'Q'}
+
+TREND_MEASURES = ['Revenue', 'Cost', 'Profit']
+
+
+def fill_periods(trend, grain):
+    # Periods without transactions between the first and last one are real zeros, not gaps
+    if trend.empty:
+        return trend
+    periods = pd.period_range(trend['Date'].min(), trend['Date'].max(), freq=grain).start_time
+    return trend.set_index('Date').reindex(periods, fill_value=0).rename_axis('Date').reset_index()
+
+
+def trend(cube, grain='M'):
+    # Revenue / Cost / Profit per day, week, month or quarter, dated by the period start
+    period = cube['Date'].dt.to_period(grain).dt.start_time.rename('Date')
+    return fill_periods(cube.groupby(period)[TREND_MEASURES].sum().reset_index(), grain)
+
+
+def by_dimension(cube, dimension):
+    # Revenue / Cost / Profit sums plus the row-weighted mean margin per member
+    grouped = cube.groupby(dimension, observed=True)[CUBE_MEASURES].sum().reset_index()
+    grouped['Margin_%'] = grouped['Margin_Sum'] / grouped['Margin_Count'].where(grouped['Margin_Count'] > 0)
+    return grouped
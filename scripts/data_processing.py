@@ -1,204 +1,649 @@
+import numpy as np
 import pandas as pd
+import argparse
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 
+# Siblings are imported by name: make that work when this module is imported
+# from elsewhere (import scripts.data_processing), not only run as a script
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from aggregate_cube import CUBE_DIMENSIONS, merge_cubes
+from excel_ingest import RAW_CACHE_NAME, discover_workbooks, read_workbooks, workbook_entity
+from instrumentation import RunRecorder
+from invoice_ledger import (
+    AGING_BUCKETS, apply_upserts, build_ledger, diff_ledger, ledger_totals, overall_totals, read_ledger,
+    save_ledger, with_row_hashes
+)
+from incremental import (
+    build_manifest, full_plan, load_manifest, partition_digests, partition_key, partition_labels, plan_run,
+    read_stored, replace_partitions, row_hashes, save_manifest, upsert_budget_analysis
+)
+from margin_sketch import SKETCH_KEYS, merge_sketches
+from parallel_processing import process_transactions, process_transactions_parallel
+from period_metrics import build_period_metrics
+from processed_store import (
+    export_csv, iter_partitions, published_dir, read_table, remove_partitions, table_partitions, table_rows,
+    write_partitions, write_table
+)
+from scenario_engine import SCENARIO_COUNT, build_receivables, run_scenarios, summarize_scenarios
+from schema import RAW_DATE_COLUMNS, compact_frame, memory_report, parse_dates
+from sql_store import SQL_FILE, sql_row_count, write_sql_store
+from transforms import ACTUAL_KEYS, build_budget_analysis, prepare_budget, process_invoices
+
+# =============================================================================
+# DATA PROCESSING: workbooks -> processed store
+# Each step is a function on frames (nothing runs on import), so other scripts
+# and notebooks can call them; run_pipeline() chains them and prints the run
+# log, main() is the command line. With chunk_rows, transactions are enriched
+# and saved in batches of whole Entity x Month partitions: only the small
+# Department x Month sums and cube cells of each batch are kept and merged
+# =============================================================================
+
 # =============================================================================
 # CONFIGURATION: File paths setup
 # =============================================================================
 
 # Get the base directory (project root folder)
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
 
-# Define path to raw Excel file
+# Define path to raw Excel file (--raw also takes a directory or glob of workbooks)
 RAW_DATA_PATH = os.path.join(BASE_DIR, 'data', 'raw_data.xlsx')
 
 # Define directory for processed output files
 PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed_data')
 
-# Create processed_data folder if it doesn't exist
-os.makedirs(PROCESSED_DIR, exist_ok=True)
+# Decoded workbook sheets (one folder per workbook), reused while the file is unchanged;
+# kept inside the processed directory of the run unless a cache_dir is given
+RAW_CACHE_DIR = os.path.join(PROCESSED_DIR, RAW_CACHE_NAME)
+
+# Sheets read from the workbook
+SHEETS = ['Transactions', 'Budget', 'Invoices']
+
+# Command line options
+parser = argparse.ArgumentParser(description="Financial Dashboard - Data Processing")
+parser.add_argument('--raw', default=RAW_DATA_PATH,
+                    help="workbook, directory of workbooks or glob; one workbook per entity "
+                         "(file name <entity>[_<YYYY-MM>].xlsx)")
+parser.add_argument('--export-csv', action='store_true',
+                    help="also export the processed tables as CSV (Excel / PowerBI)")
+parser.add_argument('--incremental', action='store_true',
+                    help="only reprocess Entity x Month partitions that changed since the last run (see manifest.json)")
+parser.add_argument('--no-cache', action='store_true',
+                    help="always parse the workbooks instead of reusing the decoded sheets")
+parser.add_argument('--cache-dir',
+                    help="decoded-sheet cache to use (default: raw_cache inside the output directory)")
+parser.add_argument('--workers', type=int, default=1,
+                    help="processes for workbooks, month partitions and sheets (1 = serial)")
+parser.add_argument('--chunk-rows', type=int, default=0,
+                    help="process and save transactions in batches of about this many rows "
+                         "(whole Entity x Month partitions; 0 = all at once)")
+parser.add_argument('--trace-memory', action='store_true',
+                    help="also record peak Python-allocated memory per step (slower)")
+parser.add_argument('--sql', action='store_true',
+                    help="also write the indexed SQLite store for DASHBOARD_BACKEND=sqlite")
+parser.add_argument('--output-dir',
+                    help="processed directory to update (default: data/processed_data)")
+
 
 # =============================================================================
-# HEADER: Display script information
+# PROCESSING API
 # =============================================================================
 
-print("=" * 60)
-print("Financial Dashboard - Data Processing")
-print("=" * 60)
-print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print()
+def load_raw(raw=RAW_DATA_PATH, cache_dir=RAW_CACHE_DIR, workers=1):
+    # -> (sheets, {workbook file: {entity, period}}, {workbook path: 'cache' / 'excel'}).
+    # Raises FileNotFoundError when no workbook matches
+    workbooks = discover_workbooks(raw)
+    if workers > 1 and len(workbooks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sheets, sources = read_workbooks(workbooks, SHEETS, cache_dir, executor)
+    else:
+        sheets, sources = read_workbooks(workbooks, SHEETS, cache_dir)
+    # Dates are parsed here, once; later steps use the typed columns as-is
+    sheets = {name: parse_dates(df, RAW_DATE_COLUMNS[name]) for name, df in sheets.items()}
+    workbook_info = {}
+    for path in workbooks:
+        entity, period = workbook_entity(path)
+        workbook_info[os.path.basename(path)] = {'entity': entity, 'period': period}
+    return sheets, workbook_info, {path: sources[path] for path in workbooks}
+
+
+def plan_processing(sheets, processed_dir, incremental=False):
+    # Full rebuild or incremental by Entity x Month partition: each partition's raw
+    # rows are fingerprinted and only changed ones are reprocessed
+    transactions_df, invoices_df = sheets['Transactions'], sheets['Invoices']
+    sheet_hashes = {name: row_hashes(sheets[name]) for name in SHEETS}
+    partitions = partition_digests(transactions_df, sheet_hashes['Transactions'])
+
+    if incremental:
+        plan, reason = plan_run(load_manifest(processed_dir), processed_dir, sheet_hashes, partitions)
+    else:
+        plan, reason = full_plan(partitions, "--incremental not set")
+    full = reason is not None
+    if full:
+        transactions_todo = transactions_df
+    else:
+        transactions_todo = transactions_df[partition_labels(transactions_df, 'Date').isin(plan['changed']).to_numpy()]
+
+    # Invoices are upserted by Entity x Invoice_ID: only new or changed rows are processed
+    if not full:
+        ledger = read_ledger(processed_dir)
+        invoice_rows, deleted_invoices = diff_ledger(ledger, invoices_df, sheet_hashes['Invoices'])
+    else:
+        ledger, invoice_rows, deleted_invoices = None, np.arange(len(invoices_df)), None
+
+    return {
+        'full': full,
+        'reason': reason,
+        'plan': plan,
+        'sheet_hashes': sheet_hashes,
+        'partitions': partitions,
+        # Partitions whose stored rows are replaced: changed / new ones, and removed ones
+        'touched': plan['changed'] + plan['removed'],
+        'transactions': transactions_todo,
+        'ledger': ledger,
+        'invoice_rows': invoice_rows,
+        'deleted_invoices': deleted_invoices,
+        'invoice_upserts': invoices_df.iloc[invoice_rows],
+        # Stored transaction rows before this run (tells whether the SQL store is in step)
+        'previous_rows': None if full else table_rows('transactions', processed_dir),
+    }
+
+
+def enrich(transactions_df, executor=None):
+    # -> (enriched rows, Entity x Department x Month sums, cube cells, margin sketch);
+    # with an executor, month partitions run in the process pool
+    if executor is not None:
+        return process_transactions_parallel(transactions_df, executor)
+    return process_transactions(transactions_df)
+
+
+def transaction_batches(transactions_df, chunk_rows):
+    # Whole Entity x Month partitions, month-major, grouped up to about chunk_rows rows
+    # (a larger partition is a batch of its own). Raw row order is kept within a batch
+    month = transactions_df['Date'].dt.year * 100 + transactions_df['Date'].dt.month
+    groups = transactions_df.groupby([month, transactions_df['Entity'].astype(str)], sort=True).indices
+    batch, size = [], 0
+    for key in sorted(groups):
+        if batch and size + len(groups[key]) > chunk_rows:
+            yield transactions_df.iloc[np.sort(np.concatenate(batch))]
+            batch, size = [], 0
+        batch.append(groups[key])
+        size += len(groups[key])
+    if batch:
+        yield transactions_df.iloc[np.sort(np.concatenate(batch))]
+
+
+def stream_transactions(transactions_df, processed_dir, chunk_rows, executor=None):
+    # Each batch is enriched, compacted and written to its own partitions, then dropped.
+    # -> (Entity x Department x Month sums, cube cells, margin sketch,
+    #     {rows, batches, margin_sum, margin_count, written})
+    summaries, cubes, sketches = [], [], []
+    stats = {'rows': 0, 'batches': 0, 'margin_sum': 0.0, 'margin_count': 0, 'written': set()}
+    for batch in transaction_batches(transactions_df, chunk_rows):
+        enriched, summary, cube, sketch = enrich(batch, executor)
+        stats['rows'] += len(enriched)
+        stats['batches'] += 1
+        stats['margin_sum'] += float(enriched['Margin_%'].sum())
+        stats['margin_count'] += int(enriched['Margin_%'].count())
+        stored = compact_frame(enriched)
+        keys = set(zip(stored['Entity'].astype(str), stored['Month_Key'].astype(int)))
+        write_partitions(stored, 'transactions', processed_dir, keys)
+        stats['written'] |= keys
+        summaries.append(summary)
+        cubes.append(cube)
+        sketches.append(sketch)
+    # Batches never share an Entity x Month, so their partials only need concatenating / summing
+    summary = pd.concat(summaries, ignore_index=True).sort_values(ACTUAL_KEYS, kind='stable', ignore_index=True)
+    return summary, merge_cubes(*cubes), merge_sketches(*sketches), stats
+
+
+def drop_unwritten_partitions(processed_dir, run, written):
+    # After streaming: a full run keeps exactly the partitions it wrote, an
+    # incremental one removes the partitions that are gone from the workbooks
+    if run['full']:
+        stale = set(table_partitions('transactions', processed_dir)) - written
+    else:
+        stale = {partition_key(p) for p in run['plan']['removed']}
+    remove_partitions('transactions', processed_dir, stale)
+
+
+def analyze_budget(budget_df, new_summary, processed_dir, run):
+    # -> (prepared budget, actual_summary, budget_analysis, rows recomputed)
+    budget_df = prepare_budget(budget_df)
+    if run['full']:
+        # Actual results by Entity, Department and Month (partials merged in STEP 2)
+        budget_analysis = build_budget_analysis(budget_df, new_summary)
+        return budget_df, new_summary, budget_analysis, len(budget_analysis)
+
+    # Replace the stored Entity x Department x Month sums of the reprocessed partitions
+    actual_summary = replace_partitions(
+        read_stored('actual_summary', processed_dir), new_summary, run['touched'], 'Month', ACTUAL_KEYS
+    )
+    if run['plan']['budget_changed']:
+        # Budget sheet edited: the merge itself is cheap, redo it in full
+        budget_analysis = build_budget_analysis(budget_df, actual_summary)
+        return budget_df, actual_summary, budget_analysis, len(budget_analysis)
+    # Only recompute the entity-months of the reprocessed partitions
+    budget_analysis, recomputed_rows = upsert_budget_analysis(
+        read_stored('budget_analysis', processed_dir), budget_df, actual_summary, run['touched']
+    )
+    return budget_df, actual_summary, budget_analysis, recomputed_rows
+
+
+def update_cube(new_cube, processed_dir, run):
+    if run['full']:
+        return new_cube
+    # The reprocessed partitions' cells replace their stored ones
+    return replace_partitions(read_table('cube', processed_dir), new_cube, run['touched'], 'Date', CUBE_DIMENSIONS)
+
+
+def update_margin_sketch(new_sketch, processed_dir, run):
+    if run['full']:
+        return new_sketch
+    # Same as the cube: the reprocessed partitions' bins replace their stored ones
+    return replace_partitions(read_table('margin_sketch', processed_dir), new_sketch, run['touched'], 'Month',
+                              SKETCH_KEYS + ['Bin'])
+
+
+def update_invoices(new_invoices, processed_dir, run):
+    # -> (ledger, invoice_totals, change rows to append; None for a full write)
+    # Raw row hashes tell the next run which invoices are unchanged
+    new_invoices = with_row_hashes(new_invoices, run['sheet_hashes']['Invoices'][run['invoice_rows']])
+    # Upsert into the ledger and update the running totals (aging is as of today)
+    if not run['full']:
+        ledger, running_totals, invoice_changes = apply_upserts(
+            run['ledger'], read_table('invoice_totals', processed_dir), new_invoices, run['deleted_invoices']
+        )
+    else:
+        ledger, running_totals = build_ledger(new_invoices)
+        invoice_changes = None
+    return ledger, ledger_totals(running_totals, ledger, pd.Timestamp.now().normalize()), invoice_changes
+
+
+def save_sql(processed_dir, run, cube, new_transactions=None):
+    # Same partitions as the parquet store, unless it is missing or out of step
+    # (earlier runs without --sql): then it is rebuilt from the store. Without
+    # new_transactions (streamed runs) the saved partitions are read back one at a time.
+    # -> True when only the reprocessed partitions were replaced
+    partitions = None if run['full'] else [partition_key(p) for p in run['touched']]
+    if partitions is not None and sql_row_count(processed_dir) != run['previous_rows']:
+        partitions, new_transactions = None, None
+    if new_transactions is None:
+        if partitions is None and not table_partitions('transactions', processed_dir):
+            # No partition at all: an empty table with the stored schema
+            new_transactions = read_stored('transactions', processed_dir)
+        else:
+            new_transactions = iter_partitions('transactions', processed_dir, partitions)
+    write_sql_store(processed_dir, new_transactions, cube, partitions=partitions)
+    return partitions is not None
+
+
+def run_pipeline(raw=RAW_DATA_PATH, processed_dir=PROCESSED_DIR, incremental=False, workers=1, chunk_rows=0,
+                 sql=False, csv=False, use_cache=True, trace_memory=False, cache_dir=None):
+    # The whole run, printing its log; returns the run report path.
+    # cache_dir: decoded-sheet cache (default: raw_cache inside processed_dir)
+
+    # Create processed_data folder if it doesn't exist
+    os.makedirs(processed_dir, exist_ok=True)
+    if published_dir(processed_dir) != processed_dir:
+        print("Note: the dashboard reads the refresh daemon's current release, not this directory")
+        print("      (run scripts/refresh_daemon.py --once to publish a new release)")
+
+    # Per-step duration, rows and memory, saved as run_report.json
+    recorder = RunRecorder(trace_memory=trace_memory)
+
+    # =========================================================================
+    # HEADER: Display script information
+    # =========================================================================
+
+    print("=" * 60)
+    print("Financial Dashboard - Data Processing")
+    print("=" * 60)
+    print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
 
-# =============================================================================
-# STEP 1: LOAD DATA FROM EXCEL
-# =============================================================================
-print("Loading raw data from Excel...")
+    # =========================================================================
+    # STEP 1: LOAD DATA FROM EXCEL
+    # =========================================================================
+    print("Loading raw data from Excel...")
+    step = recorder.start('load')
 
-try:
-    # Read each sheet from the Excel workbook
-    transactions_df = pd.read_excel(RAW_DATA_PATH, sheet_name='Transactions')
-    budget_df = pd.read_excel(RAW_DATA_PATH, sheet_name='Budget')
-    invoices_df = pd.read_excel(RAW_DATA_PATH, sheet_name='Invoices')
+    # Read all sheets in a single pass per workbook (or from the cache); rows are
+    # tagged with the workbook's entity. With workers, workbooks load in parallel
+    cache_dir = cache_dir or os.path.join(processed_dir, RAW_CACHE_NAME)
+    sheets, workbook_info, sources = load_raw(raw, cache_dir if use_cache else None, workers)
+    transactions_df, budget_df, invoices_df = sheets['Transactions'], sheets['Budget'], sheets['Invoices']
 
     # Display confirmation with record counts
+    for path, path_source in sources.items():
+        info = workbook_info[os.path.basename(path)]
+        print(f"Workbook: {os.path.basename(path)} -> entity {info['entity']}"
+              f"{', period ' + info['period'] if info['period'] else ''} ({path_source})")
+    source = ', '.join(sorted(set(sources.values())))
     print(f"Loaded Transactions: {len(transactions_df)} records")
     print(f"Loaded Budget: {len(budget_df)} records")
     print(f"Loaded Invoices: {len(invoices_df)} records")
     print()
+    recorder.finish(step, rows_out=len(transactions_df) + len(budget_df) + len(invoices_df))
+
+    # =========================================================================
+    # RUN PLAN: full rebuild or incremental by Entity x Month partition
+    # =========================================================================
+
+    step = recorder.start('plan')
+    run = plan_processing(sheets, processed_dir, incremental)
+    transactions_todo = run['transactions']
+    # Streaming needs rows to batch; an empty run takes the in-memory path
+    streaming = chunk_rows > 0 and len(transactions_todo) > 0
+
+    if run['full']:
+        print(f"Mode: full rebuild ({run['reason']})")
+    else:
+        plan = run['plan']
+        print("Mode: incremental (Entity x Month partitions)")
+        print(f"Transaction partitions: {len(plan['changed'])} changed ({len(transactions_todo)} rows), "
+              f"{len(plan['removed'])} removed, {len(run['partitions']) - len(plan['changed'])} unchanged")
+        print(f"Invoice changes: {len(run['invoice_rows'])} upserted, {len(run['deleted_invoices'])} deleted")
+    if streaming:
+        print(f"Streaming: transactions in batches of about {chunk_rows} rows")
+    print()
+    recorder.finish(step)
+
+    # =========================================================================
+    # STEP 2: PROCESS TRANSACTIONS
+    # Calculate profit and profit margin for each transaction
+    # =========================================================================
+
+    print("Processing Transactions...")
+    step = recorder.start('transactions', rows_in=len(transactions_todo))
+
+    # Calculate Profit, Margin, Month and Year; incremental runs only see changed partitions.
+    # With workers > 1, month partitions and the invoice sheet run in a process pool.
+    # Streaming saves every batch as it goes (STEP 5 then only tidies the partitions)
+    new_invoices = new_transactions = None
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as executor:
+        invoices_future = executor.submit(process_invoices, run['invoice_upserts']) if executor else None
+        if streaming:
+            new_summary, new_cube, new_sketch, stream_stats = stream_transactions(
+                transactions_todo, processed_dir, chunk_rows, executor
+            )
+            transaction_rows = stream_stats['rows']
+            average_margin = stream_stats['margin_sum'] / stream_stats['margin_count'] \
+                if stream_stats['margin_count'] else float('nan')
+        else:
+            new_transactions, new_summary, new_cube, new_sketch = enrich(transactions_todo, executor)
+            transaction_rows = len(new_transactions)
+            average_margin = new_transactions['Margin_%'].mean()
+        if invoices_future is not None:
+            new_invoices = invoices_future.result()
+    recorder.finish(step, rows_out=transaction_rows)
+
+    # Display summary statistics
+    print(f"Calculated Profit and Margin for {transaction_rows} transactions")
+    if transaction_rows > 0:
+        print(f"Average Margin: {average_margin:.2f}%")
+    print()
 
-except FileNotFoundError:
-    # Handle case when Excel file doesn't exist
-    print("Error: raw_data.xlsx not found!")
-    print(f"Expected location: {RAW_DATA_PATH}")
-    exit(1)
-
-except Exception as e:
-    # Handle any other errors during file reading
-    print(f"❌ Error loading data: {e}")
-    exit(1)
-
-# =============================================================================
-# STEP 2: PROCESS TRANSACTIONS
-# Calculate profit and profit margin for each transaction
-# =============================================================================
-
-print("Processing Transactions...")
-
-# Calculate Profit: Revenue minus Cost
-transactions_df['Profit'] = transactions_df['Revenue'] - transactions_df['Cost']
+    # =========================================================================
+    # STEP 3: BUDGET ANALYSIS
+    # Compare actual performance vs budget targets
+    # =========================================================================
 
-# Calculate Margin as percentage: (Profit / Revenue) * 100
-transactions_df['Margin_%'] = (
-        transactions_df['Profit'] / transactions_df['Revenue'] * 100
-).round(2)
+    print("Processing Budget Analysis...")
+    step = recorder.start('budget', rows_in=len(budget_df))
 
-# Extract Month in format "2024-01" for grouping
-transactions_df['Month'] = pd.to_datetime(transactions_df['Date']).dt.to_period('M')
+    budget_df, actual_summary, budget_analysis, recomputed_rows = analyze_budget(
+        budget_df, new_summary, processed_dir, run
+    )
 
-# Extract Year (e.g., 2024)
-transactions_df['Year'] = pd.to_datetime(transactions_df['Date']).dt.year
+    # Display summary
+    print(f"Budget analysis completed for {len(budget_analysis)} department-months "
+          f"({recomputed_rows} recomputed)")
+    print(f"Average Revenue Achievement: {budget_analysis['Revenue_Achievement_%'].mean():.2f}%")
+    print()
+    recorder.finish(step, rows_out=len(budget_analysis))
 
-# Sort all transactions by date (earliest first)
-transactions_df = transactions_df.sort_values('Date')
+    # =========================================================================
+    # STEP 3A: PERIOD METRICS
+    # Rolling 3/12-month, YoY, YTD vs budget and run-rate per Department x Month
+    # =========================================================================
 
-# Display summary statistics
-print(f"Calculated Profit and Margin for {len(transactions_df)} transactions")
-print(f"Average Margin: {transactions_df['Margin_%'].mean():.2f}%")
-print()
+    print("Building period metrics...")
+    step = recorder.start('period_metrics', rows_in=len(actual_summary))
 
-# =============================================================================
-# STEP 3: BUDGET ANALYSIS
-# Compare actual performance vs budget targets
-# =============================================================================
+    # Windows span partitions, and the input is one row per department-month: always rebuilt
+    period_metrics = build_period_metrics(actual_summary, budget_df)
 
-print("Processing Budget Analysis...")
-
-# Aggregate actual results by Department and Month
-actual_summary = transactions_df.groupby(['Department', 'Month']).agg({
-    'Revenue': 'sum',      # Total revenue per department per month
-    'Cost': 'sum',         # Total cost per department per month
-    'Profit': 'sum'        # Total profit per department per month
-}).reset_index()
-
-# Rename columns to distinguish from budget values
-actual_summary.columns = [
-    'Department', 'Month',
-    'Actual_Revenue', 'Actual_Cost', 'Actual_Profit'
-]
-
-# Convert Budget Month column to Period format for matching
-budget_df['Month'] = pd.to_datetime(budget_df['Month']).dt.to_period('M')
-
-# Merge budget targets with actual results
-# 'left' join keeps all budget records even if no actual data exists
-budget_analysis = budget_df.merge(
-    actual_summary,
-    on=['Department', 'Month'],
-    how='left'
-)
-
-# Replace missing values with 0 (months with no transactions)
-budget_analysis[['Actual_Revenue', 'Actual_Cost', 'Actual_Profit']] = \
-    budget_analysis[['Actual_Revenue', 'Actual_Cost', 'Actual_Profit']].fillna(0)
-
-# Calculate variance: Actual - Budget (positive = over budget)
-budget_analysis['Revenue_Variance'] = (
-        budget_analysis['Actual_Revenue'] - budget_analysis['Budget_Revenue']
-)
+    print(f"Period metrics: {len(period_metrics)} department-months")
+    print()
+    recorder.finish(step, rows_out=len(period_metrics))
 
-budget_analysis['Cost_Variance'] = (
-        budget_analysis['Actual_Cost'] - budget_analysis['Budget_Cost']
-)
+    # =========================================================================
+    # STEP 3B: AGGREGATE CUBE
+    # Day x Entity x Department x Category x Client_Type sums the dashboard queries
+    # =========================================================================
 
-# Calculate achievement percentage: (Actual / Budget) * 100
-budget_analysis['Revenue_Achievement_%'] = (
-        budget_analysis['Actual_Revenue'] / budget_analysis['Budget_Revenue'] * 100
-).round(2)
+    print("Building aggregate cube...")
+    step = recorder.start('cube', rows_in=len(new_cube))
 
-# Display summary
-print(f"Budget analysis completed for {len(budget_analysis)} department-months")
-print(f"Average Revenue Achievement: {budget_analysis['Revenue_Achievement_%'].mean():.2f}%")
-print()
+    cube = update_cube(new_cube, processed_dir, run)
 
-# =============================================================================
-# STEP 4: INVOICE PROCESSING
-# Analyze invoice payment status and timing
-# =============================================================================
+    print(f"Aggregate cube: {len(cube)} cells for {int(cube['Transactions'].sum())} transactions")
+    print()
+    recorder.finish(step, rows_out=len(cube))
 
-print("Processing Invoices...")
+    # =========================================================================
+    # STEP 3C: MARGIN SKETCH
+    # Margin_% histograms per Entity x Department x Category x Month (percentiles)
+    # =========================================================================
 
-# Convert date columns to proper datetime format
-invoices_df['Date'] = pd.to_datetime(invoices_df['Date'])
-invoices_df['Payment_Date'] = pd.to_datetime(
-    invoices_df['Payment_Date'],
-    errors='coerce'  # Convert invalid dates to NaT (Not a Time)
-)
+    print("Building margin sketch...")
+    step = recorder.start('margin_sketch', rows_in=len(new_sketch))
 
-# Calculate number of days between invoice and payment
-invoices_df['Days_to_Payment'] = (
-        invoices_df['Payment_Date'] - invoices_df['Date']
-).dt.days
+    margin_sketch = update_margin_sketch(new_sketch, processed_dir, run)
 
-# Split invoices by status for separate analysis
-paid_invoices = invoices_df[invoices_df['Status'] == 'Paid']
-pending_invoices = invoices_df[invoices_df['Status'] == 'Pending']
+    print(f"Margin sketch: {len(margin_sketch)} bins for {int(margin_sketch['Count'].sum())} margins")
+    print()
+    recorder.finish(step, rows_out=len(margin_sketch))
+
+    # =========================================================================
+    # STEP 4: INVOICE PROCESSING
+    # Analyze invoice payment status and timing
+    # =========================================================================
+
+    print("Processing Invoices...")
+    step = recorder.start('invoices', rows_in=len(run['invoice_upserts']))
+
+    # Calculate days between invoice and payment for new / changed invoices only
+    # (already done in the process pool, alongside STEP 2, with workers)
+    if new_invoices is None:
+        new_invoices = process_invoices(run['invoice_upserts'])
+    ledger, invoice_totals, invoice_changes = update_invoices(new_invoices, processed_dir, run)
+    totals = overall_totals(invoice_totals)
+
+    # Display invoice statistics
+    print(f"Invoices in ledger: {int(totals['total_count'])}")
+    print(f"Paid: {int(totals['paid_count'])} (Total: €{totals['paid_amount']:,.0f})")
+    print(f"Pending: {int(totals['pending_count'])} (Total: €{totals['outstanding']:,.0f})")
+    if totals['days_count'] > 0:
+        print(f"Average payment time: {totals['avg_payment_days']:.1f} days")
+    print("Aging (pending): " + ", ".join(
+        f"{label} days: {int(totals[f'aging_{label}_count'])}" for label, _, _ in AGING_BUCKETS))
+    print()
+    recorder.finish(step, rows_out=len(new_invoices))
 
-# Display invoice statistics
-print(f"Invoices processed:")
-print(f"Paid: {len(paid_invoices)} (Total: €{paid_invoices['Amount'].sum():,.0f})")
-print(f"Pending: {len(pending_invoices)} (Total: €{pending_invoices['Amount'].sum():,.0f})")
-print(f"Average payment time: {paid_invoices['Days_to_Payment'].mean():.1f} days")
-print()
+    # =========================================================================
+    # STEP 4B: SCENARIOS
+    # Monte Carlo runs of the default planning assumptions (all scenarios batched)
+    # =========================================================================
 
-# =============================================================================
-# STEP 5: SAVE PROCESSED DATA TO CSV FILES
-# =============================================================================
+    print("Running budget scenarios...")
+    step = recorder.start('scenarios', rows_in=len(budget_analysis))
 
-print("Saving processed data...")
+    # Expected collections of pending invoices, also read by the dashboard's what-if section
+    receivables = build_receivables(ledger, invoice_totals, totals['as_of'])
+    departments, scenario_results = run_scenarios(budget_analysis, receivables, totals['as_of'])
+    scenario_summary = summarize_scenarios(departments, scenario_results)
 
-# Save processed transactions
-transactions_output = os.path.join(PROCESSED_DIR, 'transactions_processed.csv')
-transactions_df.to_csv(transactions_output, index=False)
-print(f"Saved: transactions_processed.csv ({len(transactions_df)} rows)")
+    total_row = scenario_summary.set_index('Metric').loc['Achievement_% (Total)']
+    print(f"Scenarios: {SCENARIO_COUNT}, total achievement P5 / P50 / P95: "
+          f"{total_row['P5']:.1f}% / {total_row['P50']:.1f}% / {total_row['P95']:.1f}%")
+    print()
+    recorder.finish(step, rows_out=SCENARIO_COUNT)
+
+    # =========================================================================
+    # STEP 5: SAVE PROCESSED DATA
+    # Parquet is the primary store (typed dates, dictionary-encoded text columns)
+    # =========================================================================
+
+    print("Saving processed data...")
+    step = recorder.start('save')
+
+    # Compact schema: categoricals, float32 where exact, integer month keys
+    # (streamed transactions were compacted batch by batch)
+    processed = {'invoices': ledger, 'cube': cube, 'margin_sketch': margin_sketch}
+    if not streaming:
+        processed = {'transactions': new_transactions, **processed}
+    compacted = {name: compact_frame(df, downcast_floats=name != 'cube') for name, df in processed.items()}
+    frame_memory = memory_report(processed, compacted)
+    ledger, cube, margin_sketch = compacted['invoices'], compacted['cube'], compacted['margin_sketch']
+    if invoice_changes is not None:
+        invoice_changes = compact_frame(invoice_changes)
+
+    # Save processed transactions: every partition, or only the reprocessed ones
+    # (late or corrected workbooks rewrite just their own Entity x Month files)
+    if streaming:
+        drop_unwritten_partitions(processed_dir, run, stream_stats['written'])
+        print(f"{'Saved' if run['full'] else 'Rewrote'}: transactions ({transaction_rows} rows in {stream_stats['batches']} batches, "
+              f"{len(stream_stats['written'])} partitions)")
+    elif run['full']:
+        new_transactions = compacted['transactions']
+        write_table(new_transactions, 'transactions', processed_dir)
+        print(f"Saved: transactions ({len(new_transactions)} rows, {len(run['partitions'])} partitions)")
+    else:
+        new_transactions = compacted['transactions']
+        write_partitions(new_transactions, 'transactions', processed_dir,
+                         [partition_key(p) for p in run['touched']])
+        print(f"Rewrote: transactions ({len(run['touched'])} partitions, {len(new_transactions)} rows)")
+
+    # Save actual summary (base for the next incremental run) and budget analysis
+    write_table(actual_summary, 'actual_summary', processed_dir)
+    write_table(budget_analysis, 'budget_analysis', processed_dir)
+    print(f"Saved: budget_analysis.parquet ({len(budget_analysis)} rows)")
+    write_table(period_metrics, 'period_metrics', processed_dir)
+    print(f"Saved: period_metrics.parquet ({len(period_metrics)} rows)")
+
+    # Save aggregate cube
+    write_table(cube, 'cube', processed_dir)
+    print(f"Saved: cube.parquet ({len(cube)} cells)")
+    write_table(margin_sketch, 'margin_sketch', processed_dir)
+    print(f"Saved: margin_sketch.parquet ({len(margin_sketch)} bins)")
+
+    # Optional SQLite store: indexed transactions + cube for the SQL dashboard backend
+    if sql:
+        updated = save_sql(processed_dir, run, cube, new_transactions)
+        print(f"{'Updated' if updated else 'Saved'}: {SQL_FILE}")
+
+    # Save invoice ledger (upsert part, or a full write) and its running totals
+    ledger_write = save_ledger(processed_dir, ledger, invoice_changes)
+    write_table(invoice_totals, 'invoice_totals', processed_dir)
+    if ledger_write == 'appended':
+        print(f"Upserted: invoices ({len(invoice_changes)} changed rows)")
+    else:
+        print(f"{ledger_write.capitalize()}: invoices ({len(ledger)} rows)")
+    print("Saved: invoice_totals.parquet")
+
+    # Receivables and the distribution of the default scenarios
+    write_table(receivables, 'receivables', processed_dir)
+    write_table(scenario_summary, 'scenario_summary', processed_dir)
+    print("Saved: receivables.parquet, scenario_summary.parquet")
+
+    # Record what has been processed for the next incremental run
+    save_manifest(processed_dir, build_manifest(
+        'full' if run['full'] else 'incremental', workbook_info, run['sheet_hashes'], run['partitions']
+    ))
+    print(f"Saved: manifest.json")
+
+    # Optional CSV export for the Excel / PowerBI side (streamed runs write it partition by partition)
+    if csv:
+        export_csv(iter_partitions('transactions', processed_dir) if streaming
+                   else read_stored('transactions', processed_dir), 'transactions', processed_dir)
+        export_csv(budget_analysis, 'budget_analysis', processed_dir)
+        export_csv(read_ledger(processed_dir).drop(columns='Row_Hash'), 'invoices', processed_dir)
+        export_csv(period_metrics, 'period_metrics', processed_dir)
+        print("Exported: transactions_processed.csv, budget_analysis.csv, invoices_summary.csv, period_metrics.csv")
+    recorder.finish(step, rows_out=len(budget_analysis) + len(cube) + len(margin_sketch) + transaction_rows + len(new_invoices))
+
+    # =========================================================================
+    # RUN REPORT: per-step timings and memory
+    # =========================================================================
 
-# Save budget analysis
-budget_output = os.path.join(PROCESSED_DIR, 'budget_analysis.csv')
-budget_analysis.to_csv(budget_output, index=False)
-print(f"Saved: budget_analysis.csv ({len(budget_analysis)} rows)")
+    print()
+    print("Memory per frame (before -> after compact schema):")
+    for name, (before_mb, after_mb) in frame_memory.items():
+        print(f"  {name:<14} {before_mb:>10.2f} MB -> {after_mb:>10.2f} MB")
+    print()
+    print("Step timings:")
+    for line in recorder.summary_lines():
+        print(f"  {line}")
+    report_path = recorder.write_report(
+        processed_dir,
+        mode='full' if run['full'] else 'incremental',
+        workers=workers,
+        chunk_rows=chunk_rows if streaming else None,
+        batches=stream_stats['batches'] if streaming else None,
+        source=source,
+        frame_memory_mb={name: {'before': before_mb, 'after': after_mb}
+                         for name, (before_mb, after_mb) in frame_memory.items()},
+    )
+    print(f"Saved: {os.path.basename(report_path)}")
+    return report_path
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    try:
+        discover_workbooks(args.raw)
+    except FileNotFoundError:
+        # Handle case when no Excel file matches
+        print("Error: no workbook found!")
+        print(f"Expected location: {args.raw}")
+        return 1
+
+    run_pipeline(
+        raw=args.raw,
+        processed_dir=args.output_dir or PROCESSED_DIR,
+        incremental=args.incremental,
+        workers=args.workers,
+        chunk_rows=args.chunk_rows,
+        sql=args.sql,
+        csv=args.export_csv,
+        use_cache=not args.no_cache,
+        trace_memory=args.trace_memory,
+        cache_dir=args.cache_dir,
+    )
+
+    # =========================================================================
+    # COMPLETION MESSAGE
+    # =========================================================================
 
-# Save invoice summary
-invoices_output = os.path.join(PROCESSED_DIR, 'invoices_summary.csv')
-invoices_df.to_csv(invoices_output, index=False)
-print(f"Saved: invoices_summary.csv ({len(invoices_df)} rows)")
+    print()
+    print("=" * 60)
+    print("DATA PROCESSING COMPLETED SUCCESSFULLY!")
+    print("=" * 60)
+    print(f"End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+    print("Next step: Create dashboard with Streamlit")
+    print("Command: streamlit run dashboard/financial_dashboard.py")
+    return 0
 
-# =============================================================================
-# COMPLETION MESSAGE
-# =============================================================================
 
-print()
-print("=" * 60)
-print("DATA PROCESSING COMPLETED SUCCESSFULLY!")
-print("=" * 60)
-print(f"End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print()
-print("Next step: Create dashboard with Streamlit")
-print("Command: streamlit run dashboard/financial_dashboard.py")
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
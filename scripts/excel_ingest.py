@@ -0,0 +1,180 @@
+import glob
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from itertools import repeat
+
+import pandas as pd
+import pyarrow.feather as feather
+
+# =============================================================================
+# EXCEL INGESTION: one pass over each workbook, cached as Arrow per sheet
+# Several workbooks (one per entity, optionally per period) are read side by
+# side and their rows tagged with the entity named by the file
+# =============================================================================
+
+CACHE_META_FILE = 'workbook.json'
+
+# Cache directory name inside a processed directory (one folder per workbook)
+RAW_CACHE_NAME = 'raw_cache'
+
+# Workbook file names: <entity>[_<YYYY-MM>].xlsx, e.g. acme_2024-11.xlsx
+WORKBOOK_NAME = re.compile(r'^(?P<entity>.+?)(?:[_-](?P<period>\d{4}-\d{2}))?$')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _calamine_available():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _finalize_frame(df):
+    # Blank cells count as missing (as in pd.read_excel), then drop blank rows
+    df = df.replace({'': None}).dropna(how='all').reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if len(values) > 0 and values.map(lambda v: isinstance(v, datetime)).all():
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def _read_openpyxl(path, sheets):
+    from openpyxl import load_workbook
+
+    # Read-only mode streams rows instead of building the full cell tree
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        frames = {}
+        for sheet in sheets:
+            rows = workbook[sheet].iter_rows(values_only=True)
+            header = next(rows, ())
+            frames[sheet] = _finalize_frame(pd.DataFrame.from_records(rows, columns=header))
+        return frames
+    finally:
+        workbook.close()
+
+
+def read_sheets(path, sheets):
+    # Open the workbook once and decode every requested sheet from it
+    if _calamine_available():
+        frames = pd.read_excel(path, sheet_name=list(sheets), engine='calamine')
+        return {sheet: _finalize_frame(frames[sheet]) for sheet in sheets}, 'calamine'
+    return _read_openpyxl(path, sheets), 'openpyxl (read-only)'
+
+
+def _load_cache_meta(cache_dir):
+    path = os.path.join(cache_dir, CACHE_META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _cache_file(cache_dir, sheet):
+    return os.path.join(cache_dir, f'{sheet}.arrow')
+
+
+def _cache_hit(meta, stat, path, sheets, cache_dir):
+    if meta is None or any(s not in meta['sheets'] for s in sheets):
+        return False, None
+    if not all(os.path.exists(_cache_file(cache_dir, s)) for s in sheets):
+        return False, None
+    if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        return True, meta['sha256']
+    # Size or mtime moved (copied / touched file): the content hash decides
+    sha256 = file_sha256(path)
+    return sha256 == meta['sha256'], sha256
+
+
+def read_workbook(path, sheets, cache_dir=None):
+    # Returns ({sheet: DataFrame}, source description)
+    if cache_dir is None:
+        return read_sheets(path, sheets)
+
+    stat = os.stat(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = _load_cache_meta(cache_dir)
+    hit, sha256 = _cache_hit(meta, stat, path, sheets, cache_dir)
+    if hit:
+        frames = {
+            sheet: feather.read_table(_cache_file(cache_dir, sheet), memory_map=True).to_pandas()
+            for sheet in sheets
+        }
+        if meta['mtime_ns'] != stat.st_mtime_ns:
+            meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            _save_cache_meta(cache_dir, meta)
+        return frames, 'cache'
+
+    frames, engine = read_sheets(path, sheets)
+    for sheet, df in frames.items():
+        tmp_path = _cache_file(cache_dir, sheet) + '.tmp'
+        # Uncompressed Arrow IPC so the next run can memory-map it
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, _cache_file(cache_dir, sheet))
+    _save_cache_meta(cache_dir, {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256 or file_sha256(path),
+        'sheets': list(sheets),
+    })
+    return frames, engine
+
+
+def _save_cache_meta(cache_dir, meta):
+    path = os.path.join(cache_dir, CACHE_META_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def discover_workbooks(source):
+    # A workbook, a directory of workbooks or a glob pattern -> sorted paths
+    pattern = os.path.join(source, '*.xlsx') if os.path.isdir(source) else source
+    # Excel's lock files (~$name.xlsx) are not workbooks
+    paths = sorted(p for p in glob.glob(pattern) if not os.path.basename(p).startswith('~$'))
+    if not paths:
+        raise FileNotFoundError(source)
+    return paths
+
+
+def workbook_entity(path):
+    # -> (entity, reporting period or None), from the file name
+    match = WORKBOOK_NAME.match(os.path.splitext(os.path.basename(path))[0])
+    return match['entity'], match['period']
+
+
+def read_tagged_workbook(path, sheets, cache_dir=None):
+    # One workbook, every sheet tagged with its source entity; each file has its own cache
+    entity, _ = workbook_entity(path)
+    if cache_dir is not None:
+        cache_dir = os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0])
+    frames, source = read_workbook(path, sheets, cache_dir)
+    for df in frames.values():
+        df.insert(0, 'Entity', entity)
+    return frames, source
+
+
+def read_workbooks(paths, sheets, cache_dir=None, executor=None):
+    # -> ({sheet: DataFrame of all workbooks}, {path: source}); executor reads files in parallel
+    mapper = map if executor is None else executor.map
+    results = list(mapper(read_tagged_workbook, paths, repeat(sheets), repeat(cache_dir)))
+    frames = {
+        sheet: pd.concat([result[0][sheet] for result in results], ignore_index=True)
+        for sheet in sheets
+    }
+    return frames, {path: result[1] for path, result in zip(paths, results)}
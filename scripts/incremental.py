@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from margin_sketch import SKETCH_KEYS
+from processed_store import read_table, table_columns, table_exists
+from schema import month_key
+from transforms import ACTUAL_KEYS, build_budget_analysis
+
+# =============================================================================
+# INCREMENTAL RUNS: manifest, partition digests and upsert helpers
+# Transactions are tracked per Entity x Month partition: a partition whose raw
+# rows hash differently (new, late or edited rows) is reprocessed as a whole
+# and replaces its stored rows, cube cells and actuals; the others are kept
+# =============================================================================
+
+MANIFEST_FILE = 'manifest.json'
+
+# Stored tables an incremental run builds on
+REQUIRED_TABLES = ['transactions', 'actual_summary', 'budget_analysis', 'invoices', 'cube', 'margin_sketch',
+                   'invoice_totals']
+
+
+def row_hashes(df):
+    # One 64-bit hash per raw row
+    return pd.util.hash_pandas_object(df, index=False).values
+
+
+def digest(hashes):
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+def partition_labels(df, month_column):
+    # "<Entity>/<YYYYMM>" per row, the manifest's partition names
+    return df['Entity'].astype(str) + '/' + month_key(df[month_column]).astype(str)
+
+
+def partition_key(label):
+    entity, month = label.rsplit('/', 1)
+    return entity, int(month)
+
+
+def partition_digests(transactions_df, hashes):
+    # {partition label: digest of its raw row hashes, in sheet order}
+    groups = pd.RangeIndex(len(transactions_df)).groupby(partition_labels(transactions_df, 'Date'))
+    return {label: digest(hashes[positions]) for label, positions in sorted(groups.items())}
+
+
+def load_manifest(processed_dir):
+    path = os.path.join(processed_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(processed_dir, manifest):
+    path = os.path.join(processed_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_manifest(mode, workbooks, sheet_hashes, partitions):
+    return {
+        'mode': mode,
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'workbooks': workbooks,
+        'sheets': {
+            sheet: {'rows': int(len(hashes)), 'hash': digest(hashes)}
+            for sheet, hashes in sheet_hashes.items()
+        },
+        'partitions': partitions,
+    }
+
+
+def full_plan(partitions, reason):
+    return {'changed': sorted(partitions), 'removed': [], 'budget_changed': True}, reason
+
+
+def plan_run(manifest, processed_dir, sheet_hashes, partitions):
+    # -> ({changed / removed partition labels, budget_changed}, reason for a full rebuild or None)
+    if manifest is None:
+        return full_plan(partitions, "no manifest found")
+    missing = [name for name in REQUIRED_TABLES if not table_exists(name, processed_dir)]
+    if missing:
+        return full_plan(partitions, f"missing tables: {', '.join(missing)}")
+    if 'partitions' not in manifest:
+        return full_plan(partitions, "store predates Entity x Month partitions")
+    if not set(SKETCH_KEYS) <= set(table_columns('margin_sketch', processed_dir)):
+        return full_plan(partitions, "margin sketch predates Client_Type cells")
+
+    stored = manifest['partitions']
+    budget = manifest['sheets'].get('Budget', {})
+    return {
+        'changed': sorted(label for label, value in partitions.items() if stored.get(label) != value),
+        'removed': sorted(set(stored) - set(partitions)),
+        'budget_changed': budget.get('hash') != digest(sheet_hashes['Budget']),
+    }, None
+
+
+def read_stored(name, processed_dir):
+    df = read_table(name, processed_dir)
+    # Month comes back as a date; the transforms join on monthly periods
+    if 'Month' in df.columns:
+        df['Month'] = df['Month'].dt.to_period('M')
+    return df
+
+
+def replace_partitions(stored, new, labels, month_column, sort_columns):
+    # Rows of reprocessed partitions are replaced as a whole (sums never mix old and new rows)
+    kept = stored[~partition_labels(stored, month_column).isin(labels).to_numpy()]
+    combined = pd.concat([df for df in (kept, new) if not df.empty], ignore_index=True)
+    if combined.empty:
+        return stored.iloc[:0]
+    for col in sort_columns:
+        # Stored dictionaries read back as categoricals in store order, not alphabetical
+        if isinstance(combined[col].dtype, pd.CategoricalDtype):
+            combined[col] = combined[col].astype(str)
+    return combined.sort_values(sort_columns, kind='stable', ignore_index=True)
+
+
+def upsert_budget_analysis(stored_analysis, budget_df, actual_summary, labels):
+    # Left merge keeps budget row order, so stored row i matches budget row i
+    mask = partition_labels(budget_df, 'Month').isin(labels).to_numpy()
+    if not mask.any():
+        return stored_analysis, 0
+
+    recomputed = build_budget_analysis(budget_df[mask], actual_summary)
+    budget_analysis = stored_analysis.copy()
+    for col in recomputed.columns:
+        if col not in ACTUAL_KEYS:
+            budget_analysis.loc[mask, col] = recomputed[col].values
+    return budget_analysis, int(mask.sum())
@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =============================================================================
+# INSTRUMENTATION: per-step duration, row counts and memory for a run report
+# =============================================================================
+
+RUN_REPORT_FILE = 'run_report.json'
+
+
+def peak_rss_mb(who='self'):
+    # High-water resident set size of this process (or its finished children), over its
+    # whole lifetime: the run report states it once, steps only record how much they raised it
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return round(usage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+class RunRecorder:
+    def __init__(self, trace_memory=False):
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.trace_memory = trace_memory
+        self.steps = []
+        if trace_memory:
+            tracemalloc.start()
+
+    def start(self, name, rows_in=None):
+        step = {'step': name, 'rows_in': rows_in, 'rows_out': None, '_started': time.perf_counter(),
+                '_peak_rss': peak_rss_mb()}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.steps.append(step)
+        return step
+
+    def finish(self, step, rows_out=None):
+        step['seconds'] = round(time.perf_counter() - step.pop('_started'), 4)
+        step['rows_out'] = rows_out
+        # 0 for a step that stayed under an earlier step's peak (not its own footprint)
+        peak_before, peak_after = step.pop('_peak_rss'), peak_rss_mb()
+        step['peak_rss_growth_mb'] = None if peak_after is None else round(peak_after - peak_before, 1)
+        if self.trace_memory:
+            step['peak_allocated_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        return step
+
+    def summary_lines(self):
+        for step in self.steps:
+            rows = f"{step['rows_in'] if step['rows_in'] is not None else '-'} -> " \
+                   f"{step['rows_out'] if step['rows_out'] is not None else '-'}"
+            line = f"{step['step']:<14} {step['seconds']:>8.3f}s  rows {rows:<20} peak RSS +{step['peak_rss_growth_mb']} MB"
+            if 'peak_allocated_mb' in step:
+                line += f", allocated {step['peak_allocated_mb']} MB"
+            yield line
+        yield f"{'run':<14} {time.perf_counter() - self.started:>8.3f}s  peak RSS {peak_rss_mb()} MB"
+
+    def write_report(self, processed_dir, **run_info):
+        if self.trace_memory:
+            tracemalloc.stop()
+        report = {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': round(time.perf_counter() - self.started, 4),
+            **run_info,
+            'peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': peak_rss_mb('children'),
+            'steps': self.steps,
+        }
+        path = os.path.join(processed_dir, RUN_REPORT_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from processed_store import append_table, read_table, table_parts, write_table
+
+# =============================================================================
+# INVOICE LEDGER: invoices keyed by Entity x Invoice_ID, maintained by upserts
+# Each run compares one hash per raw row with the stored Row_Hash and only
+# processes new / changed invoices. Changes are appended as a part (latest
+# part wins, Deleted rows are tombstones) and folded into the running totals;
+# the dashboard reads the small invoice_totals table (one row per entity)
+# instead of scanning
+# =============================================================================
+
+LEDGER_KEY = ['Entity', 'Invoice_ID']
+
+# Upsert parts kept before the ledger is compacted into a single part
+LEDGER_MAX_PARTS = 8
+
+# Running totals: additive, so a change is "minus the old row, plus the new one"
+TOTAL_COLUMNS = ['total_count', 'total_amount', 'paid_count', 'paid_amount',
+                 'pending_count', 'outstanding', 'days_sum', 'days_count']
+
+# Accounts-receivable aging of pending invoices: (label, min days, max days)
+AGING_BUCKETS = [('0-30', 0, 30), ('31-60', 31, 60), ('61-90', 61, 90), ('90+', 91, None)]
+
+AGING_COLUMNS = [f'aging_{label}_{measure}' for label, _, _ in AGING_BUCKETS for measure in ('count', 'amount')]
+
+
+def with_row_hashes(processed_df, hashes):
+    processed_df = processed_df.copy()
+    processed_df['Row_Hash'] = hashes
+    return processed_df
+
+
+def ledger_keys(df):
+    # Categorical (stored) and text (raw) keys compare equal as strings
+    return pd.MultiIndex.from_frame(df[LEDGER_KEY].astype(str))
+
+
+def read_ledger(processed_dir):
+    # Latest version of every invoice; tombstoned invoices are dropped
+    parts = read_table('invoices', processed_dir)
+    if 'Deleted' not in parts.columns:
+        return parts
+    latest = parts.drop_duplicates(LEDGER_KEY, keep='last')
+    # Parts written before the first tombstone have no Deleted column (read back as null)
+    return latest[~latest['Deleted'].eq(True)].drop(columns='Deleted').reset_index(drop=True)
+
+
+def diff_ledger(ledger, raw_df, raw_hashes):
+    # -> (positions of raw rows to upsert, keys of invoices no longer in any workbook)
+    if ledger.empty:
+        return np.arange(len(raw_df)), ledger[LEDGER_KEY].iloc[:0]
+    stored_keys, raw_keys = ledger_keys(ledger), ledger_keys(raw_df)
+    # get_indexer keeps the uint64 hashes exact (reindex would go through float64)
+    stored = stored_keys.get_indexer(raw_keys)
+    stored_hashes = ledger['Row_Hash'].to_numpy()
+    changed = np.flatnonzero((stored < 0) | (stored_hashes[stored] != raw_hashes))
+    deleted = ledger.loc[~stored_keys.isin(raw_keys), LEDGER_KEY].astype(str).reset_index(drop=True)
+    return changed, deleted
+
+
+def contribution(rows):
+    # Additive totals of a set of ledger rows, per Entity
+    paid = rows['Status'] == 'Paid'
+    pending = rows['Status'] == 'Pending'
+    # float64 sums: compact-schema float32 columns would drift
+    amount = rows['Amount'].astype('float64')
+    days = rows['Days_to_Payment'].astype('float64')
+    paid_days = paid & days.notna()
+    columns = pd.DataFrame({
+        'total_count': 1.0,
+        'total_amount': amount,
+        'paid_count': paid.astype('float64'),
+        'paid_amount': amount.where(paid, 0.0),
+        'pending_count': pending.astype('float64'),
+        'outstanding': amount.where(pending, 0.0),
+        'days_sum': days.where(paid_days, 0.0),
+        'days_count': paid_days.astype('float64'),
+    }, index=rows.index)
+    return columns.groupby(rows['Entity'].astype(str).rename('Entity')).sum()
+
+
+def aging(ledger, as_of):
+    # Days outstanding depend on the as-of date, so buckets are recounted (pending rows only)
+    pending = ledger[ledger['Status'] == 'Pending']
+    days = (pd.Timestamp(as_of) - pending['Date']).dt.days
+    amount = pending['Amount'].astype('float64')
+    buckets = {}
+    for label, low, high in AGING_BUCKETS:
+        mask = (days >= low) if high is None else days.between(low, high)
+        buckets[f'aging_{label}_count'] = mask.astype('int64')
+        buckets[f'aging_{label}_amount'] = amount.where(mask, 0.0)
+    return pd.DataFrame(buckets, index=pending.index).groupby(pending['Entity'].astype(str).rename('Entity')).sum()
+
+
+def ledger_totals(totals, ledger, as_of):
+    # One row per Entity: running totals, derived average and the aging buckets
+    table = totals.copy()
+    table.insert(0, 'as_of', pd.Timestamp(as_of))
+    table['avg_payment_days'] = (table['days_sum'] / table['days_count'].where(table['days_count'] > 0)).fillna(0.0)
+    table = table.join(aging(ledger, as_of)).fillna({col: 0 for col in AGING_COLUMNS})
+    for col in AGING_COLUMNS:
+        if col.endswith('_count'):
+            table[col] = table[col].astype('int64')
+    return table.reset_index()
+
+
+def overall_totals(invoice_totals):
+    # Entity rows summed into one (the average is recomputed from its parts)
+    row = invoice_totals[TOTAL_COLUMNS + AGING_COLUMNS].sum()
+    row['as_of'] = invoice_totals['as_of'].max()
+    row['avg_payment_days'] = row['days_sum'] / row['days_count'] if row['days_count'] else 0.0
+    return row
+
+
+def build_ledger(processed_df):
+    # Full build; a repeated key keeps its last row, as an upsert would
+    ledger = processed_df.drop_duplicates(LEDGER_KEY, keep='last').reset_index(drop=True)
+    return ledger, contribution(ledger)
+
+
+def apply_upserts(ledger, stored_totals, upserts, deleted):
+    # stored_totals: the stored invoice_totals table.
+    # -> (new ledger, new running totals, change rows to append)
+    upserts = upserts.drop_duplicates(LEDGER_KEY, keep='last')
+    # Stored dtypes for the new rows too (an all-pending batch has all-NaN payment columns)
+    upserts = upserts.astype({col: dtype for col, dtype in ledger.dtypes.items()
+                              if col in upserts.columns and dtype != object
+                              and not isinstance(dtype, pd.CategoricalDtype)})
+    keys = ledger_keys(ledger)
+    replaced = keys.isin(ledger_keys(upserts)) | keys.isin(ledger_keys(deleted))
+    totals = stored_totals.assign(Entity=stored_totals['Entity'].astype(str)).set_index('Entity')[TOTAL_COLUMNS]
+    totals = totals.astype('float64').sub(contribution(ledger[replaced]), fill_value=0) \
+        .add(contribution(upserts), fill_value=0)
+    # Entities whose invoices were all removed drop out
+    totals = totals[totals['total_count'] > 0]
+    new_ledger = pd.concat([ledger[~replaced], upserts], ignore_index=True) if len(upserts) \
+        else ledger[~replaced].reset_index(drop=True)
+
+    # Tombstones keep Row_Hash as uint64 so the parts still concatenate
+    tombstones = deleted.assign(Row_Hash=np.zeros(len(deleted), dtype='uint64'), Deleted=True)
+    changes = pd.concat([upserts.assign(Deleted=False), tombstones], ignore_index=True) if len(deleted) \
+        else upserts.assign(Deleted=False)
+    return new_ledger, totals, changes
+
+
+def save_ledger(processed_dir, ledger, changes=None):
+    # Full write, or append the change rows (compacting once there are many parts)
+    if changes is None or table_parts('invoices', processed_dir) >= LEDGER_MAX_PARTS:
+        write_table(ledger, 'invoices', processed_dir)
+        return 'compacted' if changes is not None else 'saved'
+    if len(changes):
+        append_table(changes, 'invoices', processed_dir)
+    return 'appended'
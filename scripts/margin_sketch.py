@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# MARGIN SKETCH: mergeable margin distributions per Entity x Department x Category x
+# Client_Type x Month
+# Every row margin is counted in a fixed-width bin, so a sketch is a sparse
+# (cell, bin) -> count table and merging sketches is a grouped sum: partial
+# sketches from month partitions, batches or incremental runs combine exactly,
+# and any filter is answered by summing the selected cells' bins.
+#
+# Error bound: a percentile is reported at the centre of the bin holding the
+# exact value (inverted-CDF definition, numpy method='inverted_cdf'), so it is
+# within MARGIN_BIN_WIDTH / 2 (0.25 pp) of the exact percentile of the selected
+# rows. Margins outside MARGIN_RANGE are counted in the end bins; a percentile
+# that falls there is only known to be beyond the range edge
+# =============================================================================
+
+SKETCH_KEYS = ['Entity', 'Department', 'Category', 'Client_Type', 'Month']
+
+# Margin_% range covered by the bins and the bin width, in percentage points
+MARGIN_RANGE = (-100.0, 100.0)
+MARGIN_BIN_WIDTH = 0.5
+MARGIN_BINS = int((MARGIN_RANGE[1] - MARGIN_RANGE[0]) / MARGIN_BIN_WIDTH)
+
+# Percentiles the dashboard shows
+MARGIN_PERCENTILES = [10, 50, 90]
+
+
+def margin_bins(margins):
+    # Margin_% -> bin number; out-of-range margins land in the end bins
+    bins = np.floor((np.asarray(margins, dtype='float64') - MARGIN_RANGE[0]) / MARGIN_BIN_WIDTH)
+    return np.clip(bins, 0, MARGIN_BINS - 1).astype('int16')
+
+
+def bin_centres(bins):
+    return MARGIN_RANGE[0] + (np.asarray(bins, dtype='float64') + 0.5) * MARGIN_BIN_WIDTH
+
+
+def build_sketch(transactions_df):
+    # Enriched rows -> one row per cell and occupied bin (rows without a margin are skipped)
+    rows = transactions_df[transactions_df['Margin_%'].notna()]
+    month = rows['Date'].dt.to_period('M').dt.to_timestamp().rename('Month')
+    bins = pd.Series(margin_bins(rows['Margin_%']), index=rows.index, name='Bin')
+    sketch = rows.groupby(
+        [rows[key] for key in SKETCH_KEYS[:-1]] + [month, bins], observed=True, sort=True
+    ).size().rename('Count').reset_index()
+    return sketch
+
+
+def merge_sketches(*sketches):
+    # Counts are additive, so merging is a grouped sum over (cell, bin)
+    combined = pd.concat([s for s in sketches if not s.empty], ignore_index=True)
+    if combined.empty:
+        return sketches[0].iloc[:0]
+    for col in SKETCH_KEYS[:-1]:
+        combined[col] = combined[col].astype(str)
+    return combined.groupby(SKETCH_KEYS + ['Bin'], sort=True)['Count'].sum().reset_index()
+
+
+def select_sketch(sketch, start=None, end=None, department=None, category=None, client_type=None):
+    # Months overlapping [start, end]: a range that cuts a month includes that whole month.
+    # Every member filter (sidebar or drill-down) is a sketch key, so the cells selected are exact
+    rows = sketch
+    if department is not None:
+        rows = rows[rows['Department'] == department]
+    if category is not None:
+        rows = rows[rows['Category'] == category]
+    if client_type is not None:
+        rows = rows[rows['Client_Type'] == client_type]
+    if start is not None:
+        rows = rows[rows['Month'] >= pd.Timestamp(start).to_period('M').to_timestamp()]
+    if end is not None:
+        rows = rows[rows['Month'] <= pd.Timestamp(end)]
+    return rows
+
+
+def sketch_percentiles(sketch, percentiles=MARGIN_PERCENTILES):
+    # Sketch rows (any selection, any number of cells) -> {'count', 'P10', 'P50', ...}
+    counts = np.bincount(sketch['Bin'].to_numpy(dtype='int64'), weights=sketch['Count'].to_numpy(dtype='float64'),
+                         minlength=MARGIN_BINS)
+    total = counts.sum()
+    result = {'count': int(total)}
+    cumulative = np.cumsum(counts)
+    for p in percentiles:
+        # Inverted CDF: the smallest value with at least p% of the rows at or below it
+        rank = max(np.ceil(p / 100 * total), 1)
+        result[f'P{p}'] = bin_centres(np.searchsorted(cumulative, rank)) if total else float('nan')
+    return result
+
+
+def margin_distribution(sketch, dimension, percentiles=MARGIN_PERCENTILES):
+    # One row of percentiles per member of the dimension
+    rows = [{dimension: member, **sketch_percentiles(group, percentiles)}
+            for member, group in sketch.groupby(dimension, observed=True, sort=True)]
+    return pd.DataFrame(rows, columns=[dimension, 'count'] + [f'P{p}' for p in percentiles])
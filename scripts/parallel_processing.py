@@ -0,0 +1,42 @@
+import pandas as pd
+
+from aggregate_cube import build_cube, merge_cubes
+from margin_sketch import build_sketch, merge_sketches
+from transforms import ACTUAL_KEYS, enrich_transactions, summarize_actuals
+
+# =============================================================================
+# PARALLEL PROCESSING: transactions split into year/month partitions
+# Each worker enriches one partition and returns its partial Entity x Department x
+# Month sums, cube cells and margin sketch; partitions never share a month, so
+# merging the partials reproduces the serial result exactly
+# =============================================================================
+
+
+def split_by_month(transactions_df):
+    # Raw row order is kept inside each partition (ties in the stable sort)
+    month = transactions_df['Date'].dt.to_period('M')
+    return [part for _, part in transactions_df.groupby(month, sort=True)]
+
+
+def process_partition(transactions_part):
+    enriched = enrich_transactions(transactions_part)
+    return enriched, summarize_actuals(enriched), build_cube(enriched), build_sketch(enriched)
+
+
+def process_transactions(transactions_df):
+    # Serial path with the same outputs as the parallel one
+    return process_partition(transactions_df)
+
+
+def process_transactions_parallel(transactions_df, executor):
+    partitions = split_by_month(transactions_df)
+    if len(partitions) < 2:
+        return process_partition(transactions_df)
+
+    results = list(executor.map(process_partition, partitions))
+    enriched = pd.concat([r[0] for r in results])
+    summary = pd.concat([r[1] for r in results], ignore_index=True)
+    summary = summary.sort_values(ACTUAL_KEYS, kind='stable', ignore_index=True)
+    cube = merge_cubes(*[r[2] for r in results])
+    sketch = merge_sketches(*[r[3] for r in results])
+    return enriched, summary, cube, sketch
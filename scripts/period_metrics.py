@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# PERIOD METRICS: rolling, year-over-year, YTD and run-rate per Department x Month
+# Actuals and budget are laid out as one dense (series x month) array per
+# measure, so every window is a cumulative-sum difference or a column shift.
+# Stored measures are additive sums: any selection of rows can be summed and
+# its ratios recomputed with period_ratios()
+# =============================================================================
+
+SERIES_KEYS = ['Entity', 'Department']
+
+PERIOD_MEASURES = ['Revenue', 'Profit']
+
+ROLLING_WINDOWS = [3, 12]
+
+# Additive columns of the period_metrics table
+SUM_COLUMNS = [column for m in PERIOD_MEASURES for column in
+               [m] + [f'{m}_{window}M' for window in ROLLING_WINDOWS]
+               + [f'{m}_LY', f'YTD_{m}', f'YTD_Budget_{m}', f'FY_Budget_{m}', f'Run_Rate_{m}']]
+
+# Derived percentages: (column, numerator, denominator, offset) -> (num / den - offset) * 100
+RATIO_COLUMNS = [ratio for m in PERIOD_MEASURES for ratio in
+                 [(f'{m}_YoY_%', m, f'{m}_LY', 1),
+                  (f'{m}_YTD_Achievement_%', f'YTD_{m}', f'YTD_Budget_{m}', 0),
+                  (f'{m}_Run_Rate_vs_Budget_%', f'Run_Rate_{m}', f'FY_Budget_{m}', 0)]]
+
+
+def _dense(df, column, series, months):
+    # Long rows -> (series x month) array; months without rows are 0
+    values = np.zeros((len(series), len(months)))
+    rows = series.get_indexer(pd.MultiIndex.from_frame(df[SERIES_KEYS].astype(str)))
+    cols = months.get_indexer(df['Month'])
+    np.add.at(values, (rows, cols), df[column].to_numpy(dtype='float64'))
+    return values
+
+
+def _history_months(present):
+    # Months since each series' first month with actuals (1 in that month, 0 before);
+    # the grid is padded from January, so padding must not count as history
+    return np.cumsum(np.cumsum(present, axis=1) > 0, axis=1)
+
+
+def _trailing(values, window, history):
+    # Sum of the last `window` months; NaN until the series has that much history
+    cumulative = np.cumsum(values, axis=1)
+    sums = cumulative.copy()
+    sums[:, window:] -= cumulative[:, :-window]
+    sums[history < window] = np.nan
+    return sums
+
+
+def _lag(values, months, history):
+    # Value `months` earlier; NaN where that month is before the series' first actuals
+    lagged = np.full_like(values, np.nan)
+    lagged[:, months:] = values[:, :-months]
+    lagged[history <= months] = np.nan
+    return lagged
+
+
+def _year_to_date(values):
+    # The month grid starts in January, so each year is 12 consecutive columns
+    return np.cumsum(values.reshape(len(values), -1, 12), axis=2).reshape(values.shape)
+
+
+def _elapsed_months(present):
+    # Months since each series' first month with actuals in its year (1 in that
+    # month); NaN before it, where there is no pace to project
+    started = np.cumsum(present.reshape(len(present), -1, 12), axis=2) > 0
+    elapsed = np.cumsum(started, axis=2).astype('float64')
+    elapsed[~started] = np.nan
+    return elapsed.reshape(present.shape)
+
+
+def _full_year(values):
+    yearly = values.reshape(len(values), -1, 12).sum(axis=2)
+    return np.repeat(yearly, 12, axis=1)
+
+
+def period_ratios(metrics):
+    # Percentages from the additive columns (undefined when the base is 0 or missing)
+    metrics = metrics.copy()
+    for column, numerator, denominator, offset in RATIO_COLUMNS:
+        base = metrics[denominator].where(metrics[denominator] != 0)
+        metrics[column] = ((metrics[numerator] / base - offset) * 100).round(2)
+    return metrics
+
+
+def build_period_metrics(actual_summary, budget_df):
+    # actual_summary: Entity x Department x Month actuals; budget_df: prepared budget
+    # (Month as monthly periods). One row per series and month up to the last actual month
+    if actual_summary.empty:
+        empty = pd.DataFrame(columns=SERIES_KEYS + ['Month']).assign(**{col: pd.Series(dtype='float64') for col in SUM_COLUMNS})
+        return period_ratios(empty)
+
+    actual = actual_summary.assign(Month=actual_summary['Month'].astype('period[M]'))
+    budget = budget_df.assign(
+        Month=budget_df['Month'].astype('period[M]'),
+        Budget_Profit=budget_df['Budget_Revenue'] - budget_df['Budget_Cost'],
+    )
+    series = pd.MultiIndex.from_frame(
+        pd.concat([actual[SERIES_KEYS], budget[SERIES_KEYS]]).astype(str).drop_duplicates()
+    ).sort_values()
+    # Whole calendar years, so that year-to-date and full-year sums are reshapes
+    span = pd.concat([actual['Month'], budget['Month']])
+    months = pd.period_range(pd.Period(year=span.min().year, month=1, freq='M'),
+                             pd.Period(year=span.max().year, month=12, freq='M'), freq='M')
+    present = _dense(actual.assign(Rows=1), 'Rows', series, months) > 0
+    history = _history_months(present)
+    elapsed = _elapsed_months(present)
+
+    columns = {}
+    for measure in PERIOD_MEASURES:
+        values = _dense(actual, f'Actual_{measure}', series, months)
+        target = _dense(budget, f'Budget_{measure}', series, months)
+        columns[measure] = values
+        for window in ROLLING_WINDOWS:
+            columns[f'{measure}_{window}M'] = _trailing(values, window, history)
+        columns[f'{measure}_LY'] = _lag(values, 12, history)
+        columns[f'YTD_{measure}'] = _year_to_date(values)
+        columns[f'YTD_Budget_{measure}'] = _year_to_date(target)
+        columns[f'FY_Budget_{measure}'] = _full_year(target)
+        # Full-year projection at the year-to-date monthly pace (a series that starts
+        # mid-year is paced over the months it has actuals for, not since January)
+        columns[f'Run_Rate_{measure}'] = columns[f'YTD_{measure}'] / elapsed * 12
+
+    # Months before the first actual or after the last one are grid padding, not periods
+    keep = (months >= actual['Month'].min()) & (months <= actual['Month'].max())
+    metrics = pd.DataFrame({
+        'Entity': np.repeat(series.get_level_values(0), keep.sum()),
+        'Department': np.repeat(series.get_level_values(1), keep.sum()),
+        'Month': np.tile(months[keep], len(series)),
+    })
+    for column in SUM_COLUMNS:
+        metrics[column] = columns[column][:, keep].ravel()
+    return period_ratios(metrics)
+
+
+def select_period_metrics(metrics, start=None, end=None, department=None):
+    # Stored table (Month as dates) -> selected departments summed per month, ratios recomputed
+    rows = metrics
+    if department is not None:
+        rows = rows[rows['Department'] == department]
+    if start is not None:
+        rows = rows[rows['Month'] >= pd.Timestamp(start).to_period('M').to_timestamp()]
+    if end is not None:
+        rows = rows[rows['Month'] <= pd.Timestamp(end)]
+    monthly = rows.groupby('Month', sort=True)[SUM_COLUMNS].sum(min_count=1).reset_index()
+    return period_ratios(monthly)
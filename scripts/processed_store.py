@@ -0,0 +1,305 @@
+import glob
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schema import CATEGORY_COLUMNS
+
+# =============================================================================
+# PROCESSED STORE: typed columnar tables shared by the pipeline and dashboard
+# =============================================================================
+
+# Columns stored as calendar dates (no time component)
+DATE_COLUMNS = ['Date', 'Month', 'Payment_Date']
+
+# Table name -> file name inside the processed directory
+TABLE_FILES = {
+    'transactions': 'transactions',
+    'budget_analysis': 'budget_analysis.parquet',
+    'invoices': 'invoices',
+    'actual_summary': 'actual_summary.parquet',
+    'cube': 'cube.parquet',
+    'margin_sketch': 'margin_sketch.parquet',
+    'invoice_totals': 'invoice_totals.parquet',
+    'period_metrics': 'period_metrics.parquet',
+    'receivables': 'receivables.parquet',
+    'scenario_summary': 'scenario_summary.parquet',
+}
+
+# Tables stored as a directory of append-only part files
+APPEND_TABLES = {'invoices'}
+
+# Tables stored as one file per Entity x Month: <table>/Entity=<entity>/<YYYYMM>.parquet.
+# Reprocessing one entity's month rewrites just that file
+PARTITIONED_TABLES = {'transactions'}
+PARTITION_KEYS = ['Entity', 'Month_Key']
+
+# Published snapshots (refresh daemon): releases/<name>, CURRENT names the live one
+RELEASES_DIR = 'releases'
+CURRENT_FILE = 'CURRENT'
+
+# Table name -> legacy CSV export name (Excel / PowerBI consumers)
+CSV_EXPORTS = {
+    'transactions': 'transactions_processed.csv',
+    'budget_analysis': 'budget_analysis.csv',
+    'invoices': 'invoices_summary.csv',
+    'period_metrics': 'period_metrics.csv',
+}
+
+
+def table_path(processed_dir, name):
+    return os.path.join(processed_dir, TABLE_FILES[name])
+
+
+def _to_arrow(df):
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        # Periods (e.g. Month) are stored as the first day of the period
+        if isinstance(df[col].dtype, pd.PeriodDtype):
+            df[col] = df[col].dt.to_timestamp()
+        else:
+            df[col] = pd.to_datetime(df[col])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in DATE_COLUMNS:
+        if col in table.column_names:
+            idx = table.column_names.index(col)
+            table = table.set_column(idx, col, table.column(col).cast(pa.date32()))
+    return table
+
+
+def _write_file(df, path):
+    tmp_path = path + '.tmp'
+    # Write next to the target and swap in, so readers never see a partial file
+    pq.write_table(_to_arrow(df), tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def _part_files(path):
+    return sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+
+
+def partition_path(path, key):
+    entity, month = key
+    return os.path.join(path, f'Entity={entity}', f'{int(month)}.parquet')
+
+
+def _partitions(path, entities=None):
+    # (Entity, Month_Key) -> file; entities prunes whole directories before any read
+    found = {}
+    for entity_dir in glob.glob(os.path.join(path, 'Entity=*')):
+        entity = os.path.basename(entity_dir)[len('Entity='):]
+        if entities is not None and entity not in entities:
+            continue
+        for f in glob.glob(os.path.join(entity_dir, '*.parquet')):
+            found[(entity, int(os.path.basename(f)[:-len('.parquet')]))] = f
+    return found
+
+
+def _table_files(name, processed_dir, entities=None):
+    path = table_path(processed_dir, name)
+    if name in PARTITIONED_TABLES:
+        # Month-major order, so rows come back nearly sorted by date
+        partitions = _partitions(path, entities)
+        return [partitions[key] for key in sorted(partitions, key=lambda k: (k[1], k[0]))]
+    if name in APPEND_TABLES:
+        return _part_files(path)
+    return [path] if os.path.exists(path) else []
+
+
+def _write_partitions(df, path, keys=None):
+    # One file per (Entity, Month_Key) in df; listed keys without rows are removed
+    written = set()
+    for (entity, month), part in df.groupby(PARTITION_KEYS, observed=True, sort=True):
+        target = partition_path(path, (entity, month))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write_file(part, target)
+        written.add((str(entity), int(month)))
+    for key in set(keys or ()) - written:
+        target = partition_path(path, key)
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def _swap_directory(path, fill):
+    # Rebuild the directory beside the live one, then swap it in
+    new_path, old_path = path + '.new', path + '.old'
+    shutil.rmtree(new_path, ignore_errors=True)
+    os.makedirs(new_path)
+    fill(new_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(new_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+
+def write_table(df, name, processed_dir):
+    path = table_path(processed_dir, name)
+    if name in PARTITIONED_TABLES:
+        return _swap_directory(path, lambda new_path: _write_partitions(df, new_path))
+    if name in APPEND_TABLES:
+        return _swap_directory(path, lambda new_path: _write_file(df, os.path.join(new_path, 'part-00000.parquet')))
+    _write_file(df, path)
+    return path
+
+
+def write_partitions(df, name, processed_dir, keys):
+    # Rewrite only the (Entity, Month_Key) partitions in keys; the rest stay untouched
+    if name not in PARTITIONED_TABLES:
+        raise ValueError(f"Table '{name}' is not partitioned")
+    path = table_path(processed_dir, name)
+    if not os.path.isdir(path):
+        return write_table(df, name, processed_dir)
+    _write_partitions(df, path, keys)
+    return path
+
+
+def remove_partitions(name, processed_dir, keys):
+    path = table_path(processed_dir, name)
+    for key in keys:
+        target = partition_path(path, key)
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def iter_partitions(name, processed_dir, keys=None):
+    # Stored partitions one at a time, month-major (streaming readers never hold the whole table)
+    partitions = _partitions(table_path(processed_dir, name))
+    wanted = partitions if keys is None else set(keys) & set(partitions)
+    for key in sorted(wanted, key=lambda k: (k[1], k[0])):
+        yield pq.read_table(partitions[key], memory_map=True).to_pandas(date_as_object=False)
+
+
+def table_partitions(name, processed_dir):
+    return sorted(_partitions(table_path(processed_dir, name)))
+
+
+def table_entities(processed_dir, name='transactions'):
+    return sorted({entity for entity, _ in table_partitions(name, processed_dir)})
+
+
+def append_table(df, name, processed_dir):
+    path = table_path(processed_dir, name)
+    if name not in APPEND_TABLES:
+        raise ValueError(f"Table '{name}' does not support appends")
+    if not os.path.isdir(path):
+        return write_table(df, name, processed_dir)
+
+    # Parts are read back in name order, so the next part sorts last
+    part_path = os.path.join(path, f'part-{len(_part_files(path)):05d}.parquet')
+    _write_file(df, part_path)
+    return part_path
+
+
+def table_parts(name, processed_dir):
+    return len(_part_files(table_path(processed_dir, name)))
+
+
+def table_exists(name, processed_dir):
+    return bool(_table_files(name, processed_dir))
+
+
+def table_rows(name, processed_dir):
+    # Row count from the parquet footers, without reading any data
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in _table_files(name, processed_dir))
+
+
+def table_columns(name, processed_dir):
+    # Column names from the parquet schema, without reading any data
+    return pq.read_schema(_table_files(name, processed_dir)[0]).names
+
+
+def read_table(name, processed_dir, columns=None, entities=None):
+    # entities: only these entities' rows (partitioned tables skip the other files)
+    files = _table_files(name, processed_dir)
+    if not files:
+        raise FileNotFoundError(table_path(processed_dir, name))
+    filters = None
+    if entities is not None and name in PARTITIONED_TABLES:
+        pruned = _table_files(name, processed_dir, entities)
+        if not pruned:
+            # No partition of these entities: an empty frame with the stored schema
+            empty = pq.read_schema(files[0]).empty_table()
+            return (empty if columns is None else empty.select(columns)).to_pandas(date_as_object=False)
+        files = pruned
+    elif entities is not None:
+        filters = [('Entity', 'in', list(entities))]
+    # Memory-map the files and only decode the requested columns
+    table = pa.concat_tables(
+        [pq.read_table(f, columns=columns, memory_map=True, filters=filters) for f in files],
+        promote_options='permissive'
+    )
+    return table.to_pandas(date_as_object=False)
+
+
+def published_dir(processed_dir):
+    # Where readers should look: the current release, else processed_dir itself
+    try:
+        with open(os.path.join(processed_dir, CURRENT_FILE)) as f:
+            release = f.read().strip()
+    except FileNotFoundError:
+        return processed_dir
+    path = os.path.join(processed_dir, RELEASES_DIR, release)
+    return path if release and os.path.isdir(path) else processed_dir
+
+
+def table_version(name, processed_dir, entities=None):
+    # Fingerprint of one table's files (of some entities' partitions); a hard-linked
+    # copy in another release keeps the same name, size and mtime, hence the same version
+    sha = hashlib.sha1()
+    path = table_path(processed_dir, name)
+    for f in _table_files(name, processed_dir, entities):
+        stat = os.stat(f)
+        sha.update(f'{os.path.relpath(f, path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return sha.hexdigest()[:12]
+
+
+def dataset_version(processed_dir):
+    # Fingerprint of every stored file; changes on any rewrite or append
+    sha = hashlib.sha1()
+    for name in sorted(TABLE_FILES):
+        for f in _table_files(name, processed_dir):
+            stat = os.stat(f)
+            sha.update(f'{f}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return sha.hexdigest()[:12]
+
+
+def dataset_modified(processed_dir):
+    # Latest mtime (epoch seconds) of any stored file, for HTTP Last-Modified
+    mtimes = [os.stat(f).st_mtime for name in TABLE_FILES for f in _table_files(name, processed_dir)]
+    return max(mtimes, default=0.0)
+
+
+def _csv_frame(df):
+    # Legacy CSV layout: Month as 'YYYY-MM' text where the store has Month_Key,
+    # original column order with Entity appended last
+    if 'Month_Key' in df.columns:
+        keys = df['Month_Key'].astype('int64')
+        month = (keys // 100).astype(str) + '-' + (keys % 100).astype(str).str.zfill(2)
+        df = df.copy()
+        df.insert(df.columns.get_loc('Month_Key'), 'Month', month)
+        df = df.drop(columns='Month_Key')
+    if 'Entity' in df.columns:
+        df = df[[col for col in df.columns if col != 'Entity'] + ['Entity']]
+    return df
+
+
+def export_csv(df, name, processed_dir):
+    # df: a frame, or frames written one after another (streaming runs)
+    path = os.path.join(processed_dir, CSV_EXPORTS[name])
+    frames = [df] if isinstance(df, pd.DataFrame) else df
+    with open(path, 'w', newline='') as f:
+        for i, frame in enumerate(frames):
+            _csv_frame(frame).to_csv(f, index=False, header=i == 0)
+    return path
@@ -0,0 +1,164 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from excel_ingest import RAW_CACHE_NAME, discover_workbooks
+from incremental import MANIFEST_FILE
+from processed_store import CURRENT_FILE, RELEASES_DIR, TABLE_FILES, published_dir
+from sql_store import SQL_FILE
+
+# =============================================================================
+# REFRESH DAEMON: watch the workbooks, rerun the pipeline, publish atomically
+# Each run works on a staging copy of the live release (hard links, so it is
+# cheap), then the staging directory is renamed into releases/ and CURRENT is
+# swapped with os.replace. Readers see either the old release or the new one,
+# never a half-written mix. Old releases are kept a while for open sessions
+# =============================================================================
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
+RAW_DATA_PATH = os.path.join(BASE_DIR, 'data', 'raw_data.xlsx')
+PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed_data')
+PIPELINE_SCRIPT = os.path.join(SCRIPTS_DIR, 'data_processing.py')
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def source_signature(source):
+    # (name, size, mtime) of every workbook matched; a new, changed or removed file changes it
+    signature = []
+    try:
+        for path in discover_workbooks(source):
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+    except FileNotFoundError:
+        return None
+    return tuple(signature)
+
+
+def wait_for_change(source, last_signature, poll_seconds, debounce_seconds):
+    # Returns the new signature once the workbooks differ and have been still for the debounce window
+    while True:
+        signature = source_signature(source)
+        if signature is not None and signature != last_signature:
+            stable_since = time.monotonic()
+            while time.monotonic() - stable_since < debounce_seconds:
+                time.sleep(poll_seconds)
+                current = source_signature(source)
+                if current != signature:
+                    signature, stable_since = current, time.monotonic()
+            if signature is not None:
+                return signature
+        time.sleep(poll_seconds)
+
+
+def _link_or_copy(src, dst):
+    # Parquet files are only ever replaced, never modified in place, so sharing inodes is safe
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def stage_release(processed_dir):
+    # Staging copy of the live tables, SQL store and manifest (the incremental base)
+    source = published_dir(processed_dir)
+    releases = os.path.join(processed_dir, RELEASES_DIR)
+    staging = os.path.join(releases, f'.staging-{os.getpid()}')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in list(TABLE_FILES.values()) + [SQL_FILE, MANIFEST_FILE]:
+        src = os.path.join(source, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(staging, name), copy_function=_link_or_copy)
+        elif name == SQL_FILE and os.path.exists(src):
+            # Incremental runs update the SQLite store in place: a link would edit the live release
+            shutil.copy2(src, os.path.join(staging, name))
+        elif os.path.exists(src):
+            _link_or_copy(src, os.path.join(staging, name))
+    return staging
+
+
+def publish_release(processed_dir, staging, keep):
+    releases = os.path.join(processed_dir, RELEASES_DIR)
+    release = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    os.rename(staging, os.path.join(releases, release))
+
+    # The pointer swap is the publish: a single atomic rename
+    current_path = os.path.join(processed_dir, CURRENT_FILE)
+    with open(current_path + '.tmp', 'w') as f:
+        f.write(release)
+    os.replace(current_path + '.tmp', current_path)
+
+    # Oldest releases go once `keep` newer ones exist (sessions may still read the previous one)
+    names = sorted(n for n in os.listdir(releases) if not n.startswith('.'))
+    for name in names[:-keep]:
+        shutil.rmtree(os.path.join(releases, name), ignore_errors=True)
+    return release
+
+
+def refresh(processed_dir, raw=RAW_DATA_PATH, incremental=True, workers=1, keep=3, sql=False):
+    staging = stage_release(processed_dir)
+    # The decoded-sheet cache stays in processed_dir, shared by every staging run
+    command = [sys.executable, PIPELINE_SCRIPT, '--raw', raw, '--output-dir', staging, '--workers', str(workers),
+               '--cache-dir', os.path.join(processed_dir, RAW_CACHE_NAME)]
+    if incremental:
+        command.append('--incremental')
+    if sql:
+        command.append('--sql')
+    started = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        shutil.rmtree(staging, ignore_errors=True)
+        log(f"Pipeline failed (exit {result.returncode}); keeping the current release")
+        print(result.stdout[-2000:] + result.stderr[-2000:], flush=True)
+        return None
+    release = publish_release(processed_dir, staging, keep)
+    log(f"Published release {release} in {time.perf_counter() - started:.1f}s")
+    return release
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerun the pipeline whenever the raw workbooks change")
+    parser.add_argument('--raw', default=RAW_DATA_PATH, help="workbook, directory of workbooks or glob to watch")
+    parser.add_argument('--processed-dir', default=PROCESSED_DIR)
+    parser.add_argument('--poll', type=float, default=2.0, help="seconds between checks")
+    parser.add_argument('--debounce', type=float, default=5.0,
+                        help="seconds the workbooks must stay unchanged before a run")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--keep', type=int, default=3, help="releases kept on disk (>= 2)")
+    parser.add_argument('--full', action='store_true', help="always rebuild instead of --incremental")
+    parser.add_argument('--sql', action='store_true', help="also update the SQLite store (DASHBOARD_BACKEND=sqlite)")
+    parser.add_argument('--once', action='store_true', help="publish one release now and exit")
+    args = parser.parse_args()
+    keep = max(args.keep, 2)
+
+    os.makedirs(os.path.join(args.processed_dir, RELEASES_DIR), exist_ok=True)
+    run = lambda: refresh(args.processed_dir, args.raw, not args.full, args.workers, keep, args.sql)  # noqa: E731
+
+    if args.once:
+        return 0 if run() else 1
+
+    # Publish once at start unless a release is already live
+    signature = source_signature(args.raw)
+    if published_dir(args.processed_dir) == args.processed_dir:
+        run()
+    log(f"Watching {args.raw} (poll {args.poll}s, debounce {args.debounce}s)")
+    try:
+        while True:
+            signature = wait_for_change(args.raw, signature, args.poll, args.debounce)
+            log("Workbook changed, refreshing...")
+            run()
+    except KeyboardInterrupt:
+        log("Stopped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# SCENARIO ENGINE: Monte Carlo / what-if runs on the budget merge and receivables
+# Every scenario is a row of the draw arrays (scenarios x departments), so all
+# scenarios are evaluated together with array arithmetic: revenue shocks per
+# department (a shared factor plus a department one), cost inflation, and a
+# payment-delay shift applied to the expected dates of pending invoices
+# =============================================================================
+
+SCENARIO_COUNT = 10_000
+
+SCENARIO_SEED = 42
+
+# Collections are counted up to this many days after the as-of date
+CASH_HORIZON_DAYS = 30
+
+# Fractions for revenue / cost, days for the payment delay
+DEFAULT_ASSUMPTIONS = {
+    'revenue_shock': 0.0,     # mean change of revenue
+    'revenue_vol': 0.10,      # standard deviation of the revenue change
+    'correlation': 0.5,       # share of the revenue variance common to all departments
+    'cost_inflation': 0.03,   # mean change of cost
+    'cost_vol': 0.02,
+    'delay_days': 0.0,        # mean shift of expected payment dates
+    'delay_vol': 15.0,
+}
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Per-department sums the scenarios are applied to
+INPUT_COLUMNS = ['Budget_Revenue', 'Budget_Cost', 'Actual_Revenue', 'Actual_Cost']
+
+
+def scenario_inputs(budget_analysis):
+    # Budget merge rows (any selection of entities / months) -> one row per Department
+    return budget_analysis.groupby('Department', observed=True, sort=True)[INPUT_COLUMNS].sum().astype('float64')
+
+
+def build_receivables(ledger, invoice_totals, as_of):
+    # Pending invoices by Entity and expected payment date: invoice date plus the
+    # entity's average payment time, and no earlier than the as-of date (overdue
+    # invoices are expected now)
+    pending = ledger[ledger['Status'] == 'Pending']
+    average = invoice_totals.assign(Entity=invoice_totals['Entity'].astype(str)) \
+        .set_index('Entity')['avg_payment_days']
+    entity = pending['Entity'].astype(str)
+    days = entity.map(average).fillna(0.0).round()
+    expected = (pending['Date'] + pd.to_timedelta(days, unit='D')).clip(lower=pd.Timestamp(as_of))
+    receivables = pd.DataFrame({'Entity': entity, 'Expected_Date': expected,
+                                'Amount': pending['Amount'].astype('float64')})
+    return receivables.groupby(['Entity', 'Expected_Date'], sort=True).agg(
+        Amount=('Amount', 'sum'), Invoices=('Amount', 'size')
+    ).reset_index()
+
+
+def draw_scenarios(count, departments, assumptions=None, seed=SCENARIO_SEED):
+    # -> arrays: revenue factor (count x departments), cost factor (count x 1), delay days (count)
+    a = {**DEFAULT_ASSUMPTIONS, **(assumptions or {})}
+    rng = np.random.default_rng(seed)
+    common = rng.standard_normal((count, 1))
+    own = rng.standard_normal((count, departments))
+    shock = np.sqrt(a['correlation']) * common + np.sqrt(1 - a['correlation']) * own
+    return {
+        'revenue': np.maximum(1 + a['revenue_shock'] + a['revenue_vol'] * shock, 0.0),
+        'cost': np.maximum(1 + a['cost_inflation'] + a['cost_vol'] * rng.standard_normal((count, 1)), 0.0),
+        'delay': a['delay_days'] + a['delay_vol'] * rng.standard_normal(count),
+    }
+
+
+def _collections(receivables, delay, horizon_end):
+    # Amount expected by the horizon for every delay at once: sorted dates + cumulative sums
+    days = ((receivables['Expected_Date'] - horizon_end).dt.days).to_numpy(dtype='float64')
+    order = np.argsort(days, kind='stable')
+    cumulative = np.concatenate([[0.0], np.cumsum(receivables['Amount'].to_numpy(dtype='float64')[order])])
+    # Collected when expected_date + delay <= horizon_end, i.e. days <= -delay
+    return cumulative[np.searchsorted(days[order], -delay, side='right')]
+
+
+def evaluate_scenarios(inputs, receivables, draws, as_of, horizon_days=CASH_HORIZON_DAYS):
+    # -> dict of arrays, one value per scenario (per department where 2-D)
+    revenue = inputs['Actual_Revenue'].to_numpy() * draws['revenue']
+    cost = inputs['Actual_Cost'].to_numpy() * draws['cost']
+    budget_revenue = inputs['Budget_Revenue'].to_numpy()
+    budget_profit = (inputs['Budget_Revenue'] - inputs['Budget_Cost']).sum()
+    total_budget = budget_revenue.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        achievement = np.where(budget_revenue > 0, revenue / budget_revenue * 100, np.nan)
+    profit = (revenue - cost).sum(axis=1)
+
+    horizon_end = pd.Timestamp(as_of) + pd.Timedelta(days=horizon_days)
+    collected = _collections(receivables, draws['delay'], horizon_end)
+    return {
+        'achievement': achievement,
+        'total_achievement': revenue.sum(axis=1) / total_budget * 100 if total_budget > 0
+        else np.full(len(profit), np.nan),
+        'profit': profit,
+        'profit_vs_budget': profit - budget_profit,
+        'collected': collected,
+        'outstanding': receivables['Amount'].sum() - collected,
+    }
+
+
+def run_scenarios(budget_analysis, receivables, as_of, assumptions=None, count=SCENARIO_COUNT,
+                  seed=SCENARIO_SEED, horizon_days=CASH_HORIZON_DAYS):
+    inputs = scenario_inputs(budget_analysis)
+    draws = draw_scenarios(count, len(inputs), assumptions, seed)
+    return inputs.index.tolist(), evaluate_scenarios(inputs, receivables, draws, as_of, horizon_days)
+
+
+def summarize_scenarios(departments, results):
+    # Distribution of every outcome: mean and percentiles, one row per metric
+    metrics = {f'Achievement_% ({dept})': results['achievement'][:, i] for i, dept in enumerate(departments)}
+    metrics.update({
+        'Achievement_% (Total)': results['total_achievement'],
+        'Profit': results['profit'],
+        'Profit_vs_Budget': results['profit_vs_budget'],
+        'Collected': results['collected'],
+        'Outstanding': results['outstanding'],
+    })
+    values = np.vstack(list(metrics.values()))
+    summary = pd.DataFrame(np.nanpercentile(values, PERCENTILES, axis=1).T,
+                           columns=[f'P{p}' for p in PERCENTILES])
+    summary.insert(0, 'Mean', np.nanmean(values, axis=1))
+    summary.insert(0, 'Metric', list(metrics))
+    return summary
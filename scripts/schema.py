@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# COMPACT SCHEMA: dtypes applied once after processing and kept in the store
+# Text dimensions are categoricals, measures float32 where every value survives
+# the round trip to the cent, months are integer YYYYMM keys
+# =============================================================================
+
+# Low-cardinality text columns (stored as Arrow dictionaries)
+CATEGORY_COLUMNS = ['Entity', 'Department', 'Category', 'Client_Type', 'Status']
+
+# Measures downcast to float32 when exact at MONEY_DECIMALS
+FLOAT32_COLUMNS = ['Revenue', 'Cost', 'Profit', 'Margin_%', 'Margin_Sum', 'Amount', 'Days_to_Payment']
+
+# Counters and calendar parts downcast to the smallest integer type
+INTEGER_COLUMNS = ['Transactions', 'Margin_Count', 'Year']
+
+MONEY_DECIMALS = 2
+
+# Raw sheet -> date columns, parsed once at load with an explicit format
+RAW_DATE_COLUMNS = {
+    'Transactions': ['Date'],
+    'Budget': ['Month'],
+    'Invoices': ['Date', 'Payment_Date'],
+}
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Optional dates: values that cannot be parsed become NaT instead of failing the load
+OPTIONAL_DATE_COLUMNS = {'Payment_Date'}
+
+
+def parse_dates(df, columns):
+    # Excel date cells already arrive as datetime64; only text cells are parsed
+    df = df.copy()
+    for col in columns:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = _parse_date_column(df[col])
+    return df
+
+
+def _parse_date_column(values):
+    # Fast path with the explicit format; cells in any other layout
+    # (2024/01/05, with a time part, ...) are re-parsed one by one
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry].astype(str), format='mixed', errors='coerce')
+        invalid = values[parsed.isna() & values.notna()]
+        if len(invalid) and values.name not in OPTIONAL_DATE_COLUMNS:
+            raise ValueError(f"Unparseable {values.name} values: {invalid.unique()[:5].tolist()}")
+    return parsed
+
+
+def month_key(months):
+    # Period or datetime column -> int32 YYYYMM (e.g. 202401)
+    if isinstance(months.dtype, pd.PeriodDtype):
+        months = months.dt.to_timestamp()
+    return (months.dt.year * 100 + months.dt.month).astype('int32')
+
+
+def fits_float32(values, decimals=MONEY_DECIMALS):
+    values = values.to_numpy(dtype='float64')
+    narrowed = values.astype('float32').astype('float64')
+    return np.array_equal(np.round(narrowed, decimals), np.round(values, decimals), equal_nan=True)
+
+
+def compact_frame(df, downcast_floats=True):
+    # downcast_floats=False for frames that are summed later (float32 sums drift)
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in FLOAT32_COLUMNS:
+        if downcast_floats and col in df.columns and pd.api.types.is_float_dtype(df[col]) and fits_float32(df[col]):
+            df[col] = df[col].astype('float32')
+    for col in INTEGER_COLUMNS + FLOAT32_COLUMNS:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    if 'Month' in df.columns and isinstance(df['Month'].dtype, pd.PeriodDtype):
+        # Month periods become integer keys; Date still holds the day
+        df.insert(df.columns.get_loc('Month'), 'Month_Key', month_key(df['Month']))
+        df = df.drop(columns='Month')
+    return df
+
+
+def frame_memory_mb(df):
+    return round(df.memory_usage(deep=True).sum() / 2**20, 3)
+
+
+def memory_report(before, after):
+    # {frame: (before MB, after MB)} for frames present in both dicts
+    return {name: (frame_memory_mb(before[name]), frame_memory_mb(after[name])) for name in before if name in after}
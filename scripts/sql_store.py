@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from schema import MONEY_DECIMALS
+
+# =============================================================================
+# SQL STORE: optional SQLite copy of transactions + cube for the dashboard
+# Indexed on Date and Entity/Department/Category x Date, so filtered aggregations
+# and grid pages are answered on disk instead of from frames held in memory
+# =============================================================================
+
+SQL_FILE = 'dashboard.sqlite'
+
+# (columns) per index; member filters always come with a date range
+SQL_INDEXES = [('Date',), ('Entity', 'Date'), ('Department', 'Date'), ('Category', 'Date')]
+
+# Transactions are replaced per Entity x Month partition, like the parquet store
+PARTITION_INDEX = ('Entity', 'Month_Key')
+
+# Rows converted and inserted per executemany call
+INSERT_CHUNK_ROWS = 100_000
+
+
+def sql_path(processed_dir):
+    return os.path.join(processed_dir, SQL_FILE)
+
+
+def connect_read_only(path):
+    # URI mode=ro: readers can never create or modify the database
+    return sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode=ro', uri=True,
+                           check_same_thread=False)
+
+
+def sql_row_count(processed_dir, table='transactions'):
+    path = sql_path(processed_dir)
+    if not os.path.exists(path):
+        return None
+    conn = connect_read_only(path)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def quote(column):
+    # Identifiers come from our own schema, but 'Margin_%' still needs quoting
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _create_table(conn, table, df, row_id=False):
+    columns = [f'{quote(col)} {_sql_type(dtype)}' for col, dtype in df.dtypes.items()]
+    if row_id:
+        # Insertion order: after Date and Entity, the grid's tie-breaker
+        columns.insert(0, 'row_id INTEGER PRIMARY KEY')
+    conn.execute(f'CREATE TABLE {table} ({", ".join(columns)})')
+
+
+def _insert(conn, table, df, first_row_id=None):
+    columns = list(df.columns)
+    names = ([] if first_row_id is None else ['row_id']) + [quote(col) for col in columns]
+    statement = f'INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join("?" * len(names))})'
+    for offset in range(0, len(df), INSERT_CHUNK_ROWS):
+        chunk = df.iloc[offset:offset + INSERT_CHUNK_ROWS].copy()
+        for col in columns:
+            if pd.api.types.is_datetime64_any_dtype(chunk[col]):
+                # ISO dates sort and compare correctly as text
+                chunk[col] = chunk[col].dt.strftime('%Y-%m-%d')
+            elif chunk[col].dtype == 'float32':
+                # Compact-schema floats are exact to the cent; store the decimal value, not float32 noise
+                chunk[col] = chunk[col].astype('float64').round(MONEY_DECIMALS)
+        values = chunk.astype(object).where(chunk.notna(), None)
+        if first_row_id is not None:
+            values.insert(0, 'row_id', range(first_row_id + offset, first_row_id + offset + len(chunk)))
+        conn.executemany(statement, values.itertuples(index=False, name=None))
+
+
+def _create_index(conn, table, columns):
+    name = f'{table}_{"_".join(c.lower() for c in columns)}'
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(map(quote, columns))})')
+
+
+def _fill(conn, frames, cube, created):
+    for frame in frames:
+        if not created:
+            _create_table(conn, 'transactions', frame, row_id=True)
+            created = True
+        first_row_id = conn.execute('SELECT COALESCE(MAX(row_id) + 1, 0) FROM transactions').fetchone()[0]
+        _insert(conn, 'transactions', frame, first_row_id)
+    if not created:
+        raise ValueError("No transaction frames to create the SQL store from")
+    # The cube is small: always rewritten in full
+    _create_table(conn, 'cube', cube)
+    _insert(conn, 'cube', cube)
+    for table in ('transactions', 'cube'):
+        for columns in SQL_INDEXES:
+            _create_index(conn, table, columns)
+    _create_index(conn, 'transactions', PARTITION_INDEX)
+    conn.execute('ANALYZE')
+
+
+def write_sql_store(processed_dir, transactions, cube, partitions=None):
+    # transactions: the full store, or only the rows of the (Entity, Month_Key)
+    # partitions listed, which replace their stored rows. Either may be given as
+    # an iterable of frames (streaming runs insert one partition at a time).
+    # A full build is written beside the live file and swapped in; a partition
+    # update edits the live file in one write transaction (no copy of the history),
+    # so readers see the old or the new rows, never a mix
+    path = sql_path(processed_dir)
+    frames = [transactions] if isinstance(transactions, pd.DataFrame) else transactions
+
+    if partitions is not None and os.path.exists(path):
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('DELETE FROM transactions WHERE Entity = ? AND Month_Key = ?',
+                                 [(entity, int(month)) for entity, month in partitions])
+                conn.execute('DROP TABLE cube')
+                _fill(conn, frames, cube, created=True)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        return path
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            _fill(conn, frames, cube, created=False)
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,90 @@
+# =============================================================================
+# TRANSFORMS: per-sheet processing shared by full and incremental runs
+# Date columns are parsed once at load (schema.parse_dates), not per step
+# =============================================================================
+
+ACTUAL_COLUMNS = ['Actual_Revenue', 'Actual_Cost', 'Actual_Profit']
+
+# Budget and actuals are compared per source entity, department and month
+ACTUAL_KEYS = ['Entity', 'Department', 'Month']
+
+
+def enrich_transactions(transactions_df):
+    transactions_df = transactions_df.copy()
+
+    # Calculate Profit: Revenue minus Cost
+    transactions_df['Profit'] = transactions_df['Revenue'] - transactions_df['Cost']
+
+    # Calculate Margin as percentage: (Profit / Revenue) * 100
+    transactions_df['Margin_%'] = (
+            transactions_df['Profit'] / transactions_df['Revenue'] * 100
+    ).round(2)
+
+    # Extract Month in format "2024-01" for grouping
+    transactions_df['Month'] = transactions_df['Date'].dt.to_period('M')
+
+    # Extract Year (e.g., 2024)
+    transactions_df['Year'] = transactions_df['Date'].dt.year.astype('int16')
+
+    # Sort all transactions by date (earliest first); stable so ties keep raw order
+    return transactions_df.sort_values('Date', kind='stable')
+
+
+def summarize_actuals(transactions_df):
+    # Aggregate actual results by Entity, Department and Month
+    actual_summary = transactions_df.groupby(ACTUAL_KEYS, observed=True).agg({
+        'Revenue': 'sum',      # Total revenue per department per month
+        'Cost': 'sum',         # Total cost per department per month
+        'Profit': 'sum'        # Total profit per department per month
+    }).reset_index()
+
+    # Rename columns to distinguish from budget values
+    actual_summary.columns = ACTUAL_KEYS + ACTUAL_COLUMNS
+    return actual_summary
+
+
+def prepare_budget(budget_df):
+    budget_df = budget_df.copy()
+    # Convert Budget Month column to Period format for matching
+    budget_df['Month'] = budget_df['Month'].dt.to_period('M')
+    return budget_df
+
+
+def build_budget_analysis(budget_df, actual_summary):
+    # Merge budget targets with actual results
+    # 'left' join keeps all budget records even if no actual data exists
+    budget_analysis = budget_df.merge(
+        actual_summary,
+        on=ACTUAL_KEYS,
+        how='left'
+    )
+
+    # Replace missing values with 0 (months with no transactions)
+    budget_analysis[ACTUAL_COLUMNS] = budget_analysis[ACTUAL_COLUMNS].fillna(0)
+
+    # Calculate variance: Actual - Budget (positive = over budget)
+    budget_analysis['Revenue_Variance'] = (
+            budget_analysis['Actual_Revenue'] - budget_analysis['Budget_Revenue']
+    )
+
+    budget_analysis['Cost_Variance'] = (
+            budget_analysis['Actual_Cost'] - budget_analysis['Budget_Cost']
+    )
+
+    # Calculate achievement percentage: (Actual / Budget) * 100
+    budget_analysis['Revenue_Achievement_%'] = (
+            budget_analysis['Actual_Revenue'] / budget_analysis['Budget_Revenue'] * 100
+    ).round(2)
+
+    return budget_analysis
+
+
+def process_invoices(invoices_df):
+    invoices_df = invoices_df.copy()
+
+    # Calculate number of days between invoice and payment
+    invoices_df['Days_to_Payment'] = (
+            invoices_df['Payment_Date'] - invoices_df['Date']
+    ).dt.days
+
+    return invoices_df
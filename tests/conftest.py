@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Modules import their siblings by name, as when run from scripts/ and dashboard/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'dashboard'))
+
+
+@pytest.fixture(scope='session')
+def processed_dir(tmp_path_factory):
+    # One pipeline run over the bundled workbook (Parquet + SQLite stores), shared read-only
+    from data_processing import RAW_DATA_PATH, run_pipeline
+    path = str(tmp_path_factory.mktemp('processed'))
+    run_pipeline(raw=RAW_DATA_PATH, processed_dir=path, sql=True)
+    return path
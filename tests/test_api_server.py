@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from api_server import AggregateApi, make_handler
+from data_processing import RAW_DATA_PATH
+from processed_store import read_table, write_table
+from shared_dataset import SharedDataset
+
+
+def serve(processed_dir, backend_name='memory'):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(AggregateApi(processed_dir, backend_name)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+@pytest.fixture(scope='module')
+def api_url(processed_dir):
+    server, url = serve(processed_dir)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def empty_cube_dir(processed_dir, tmp_path):
+    # The shared store with a cube of zero rows (same schema)
+    path = str(tmp_path / 'processed')
+    shutil.copytree(processed_dir, path)
+    write_table(read_table('cube', path).iloc[:0], 'cube', path)
+    return path
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_known_entity_is_served(api_url):
+    entity = os.path.splitext(os.path.basename(RAW_DATA_PATH))[0]
+    status, body = get(f'{api_url}/api/kpis?entity={entity}')
+    assert status == 200
+    assert body['data']['totals']['transactions'] > 0
+
+
+def test_unknown_entity_is_a_json_404(api_url):
+    status, body = get(f'{api_url}/api/kpis?entity=no-such-entity')
+    assert status == 404
+    assert body == {'error': 'Unknown entity: no-such-entity'}
+
+
+def test_empty_cube_loads_and_is_a_json_404(empty_cube_dir):
+    dataset = SharedDataset(empty_cube_dir, 'v')
+    assert not dataset.prefix_sums.covers('2024-01-01', '2024-01-31')
+
+    server, url = serve(empty_cube_dir)
+    try:
+        status, body = get(f'{url}/api/kpis')
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert status == 404
+    assert body == {'error': 'No transactions for this selection'}
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import downsample_trend, lttb
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (1000, 3), (37, 10), (5000, 1400)])
+def test_lttb_keeps_the_ends_and_the_budget(n, threshold):
+    rng = np.random.default_rng(3)
+    x, y = np.arange(n), rng.normal(size=n).cumsum()
+    picked = lttb(x, y, threshold)
+    assert len(picked) == threshold
+    assert picked[0] == 0 and picked[-1] == n - 1
+    assert np.all(np.diff(picked) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[517] = 50.0
+    assert 517 in lttb(np.arange(1000), y, 50)
+
+
+@pytest.mark.parametrize('threshold', [100, 1000, 2])
+def test_lttb_passes_short_input_through(threshold):
+    assert lttb(np.arange(100), np.ones(100), threshold).tolist() == list(range(100))
+
+
+def test_downsample_trend_passes_short_trends_through():
+    trend = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=30), 'Revenue': np.arange(30.0)})
+    assert downsample_trend(trend, ['Revenue'], budget=100) is trend
@@ -0,0 +1,52 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+from export import export_selection, read_export
+from filter_engine import FilterIndex
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = np.random.default_rng(11)
+    n = 1000
+    return FilterIndex(pd.DataFrame({
+        'Date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 90, n), unit='D'),
+        'Department': rng.choice(['Sales', 'Research', 'Trading'], n),
+        'Category': rng.choice(['Fees', 'Other'], n),
+        'Client_Type': rng.choice(['Corporate', 'Private'], n),
+        'Description': rng.choice(['plain', 'with, comma', 'with "quotes"'], n),
+        'Revenue': rng.normal(500, 200, n).round(2),
+    }))
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(export, 'CHUNK_ROWS', 64)
+
+
+@pytest.mark.parametrize('filters', [
+    # A date range selects a slice, a member filter a position array
+    (pd.Timestamp('2024-01-10'), pd.Timestamp('2024-03-10'), {}),
+    (None, None, {'Department': 'Sales'}),
+])
+def test_multi_chunk_csv_matches_to_csv(index, tmp_path, filters):
+    start, end, members = filters
+    selection = index.select(start, end, **members)
+    assert index.count(selection) > 3 * export.CHUNK_ROWS
+    expected = index.take(selection).to_csv(index=False)
+
+    path = export_selection(index, selection, 'CSV', str(tmp_path), 'csv')
+    assert read_export(path).decode('utf-8') == expected
+    path = export_selection(index, selection, 'CSV (gzip)', str(tmp_path), 'gzip')
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+        assert f.read() == expected
+
+
+def test_empty_selection_writes_the_header(index, tmp_path):
+    selection = index.select(None, None, Department='Unknown')
+    path = export_selection(index, selection, 'CSV', str(tmp_path), 'empty')
+    assert read_export(path).decode('utf-8') == index.take(selection).to_csv(index=False)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_engine import FilterIndex
+
+
+@pytest.fixture(scope='module')
+def frame():
+    # Unsorted dates with repeats, so ranges start and end inside runs of equal dates
+    rng = np.random.default_rng(7)
+    n = 2000
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 120, n), unit='D'),
+        'Department': rng.choice(['Sales', 'Research', 'Trading'], n),
+        'Category': rng.choice(['Fees', 'Other'], n),
+        'Client_Type': rng.choice(['Corporate', 'Private'], n),
+        'Revenue': rng.integers(1, 1000, n),
+    })
+
+
+def mask_filter(df, start, end, members):
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['Date'] >= start
+    if end is not None:
+        mask &= df['Date'] <= end
+    for dim, member in members.items():
+        if member is not None:
+            mask &= df[dim] == member
+    return df[mask]
+
+
+DATES = [
+    (None, None),
+    # Inclusive edges on days that have rows
+    ('2024-01-15', '2024-02-20'),
+    ('2024-02-01', '2024-02-01'),
+    # Before the first / after the last row
+    ('2023-06-01', '2024-01-10'),
+    ('2024-04-20', '2025-01-01'),
+    # Empty ranges: end before start, and outside the data
+    ('2024-03-10', '2024-03-01'),
+    ('2025-01-01', '2025-02-01'),
+]
+
+MEMBERS = [
+    {},
+    {'Department': 'Sales'},
+    {'Department': 'Research', 'Category': 'Fees'},
+    {'Department': 'Trading', 'Category': 'Other', 'Client_Type': 'Private'},
+    {'Department': None, 'Category': 'Fees'},
+    {'Department': 'Unknown'},
+]
+
+
+@pytest.mark.parametrize('start, end', DATES)
+@pytest.mark.parametrize('members', MEMBERS)
+def test_select_matches_boolean_mask(frame, start, end, members):
+    index = FilterIndex(frame)
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+    selection = index.select(start, end, **members)
+
+    expected = mask_filter(index.df, start, end, members)
+    selected = index.take(selection)
+    assert index.count(selection) == len(expected)
+    pd.testing.assert_frame_equal(selected, expected)
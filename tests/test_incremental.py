@@ -0,0 +1,79 @@
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from data_processing import RAW_DATA_PATH, load_raw, plan_processing, run_pipeline
+from processed_store import read_table, write_table
+
+
+def partition_mtimes(processed_dir):
+    files = glob.glob(os.path.join(processed_dir, 'transactions', 'Entity=*', '*.parquet'))
+    return {os.path.relpath(f, processed_dir): os.stat(f).st_mtime_ns for f in files}
+
+
+def edit_workbook(path, month, delta):
+    # Change one transaction of the given month, keep the other sheets as they are
+    sheets = pd.read_excel(path, sheet_name=None)
+    transactions = sheets['Transactions']
+    row = transactions.index[pd.to_datetime(transactions['Date']).dt.strftime('%Y-%m') == month][0]
+    transactions.loc[row, 'Revenue'] += delta
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'acme.xlsx')
+    shutil.copy(RAW_DATA_PATH, path)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path, workbook):
+    path = str(tmp_path / 'processed')
+    run_pipeline(raw=workbook, processed_dir=path, incremental=True)
+    return path
+
+
+def test_unchanged_workbook_is_skipped(workbook, store):
+    sheets, _, _ = load_raw(workbook, None)
+    run = plan_processing(sheets, store, incremental=True)
+    assert not run['full']
+    assert run['plan']['changed'] == [] and run['plan']['removed'] == []
+    assert run['transactions'].empty and run['invoice_upserts'].empty
+
+    before = partition_mtimes(store)
+    run_pipeline(raw=workbook, processed_dir=store, incremental=True)
+    assert partition_mtimes(store) == before
+
+
+def test_changed_month_rewrites_only_its_partition(tmp_path, workbook, store):
+    before = partition_mtimes(store)
+    edit_workbook(workbook, '2024-03', 5000)
+
+    sheets, _, _ = load_raw(workbook, None)
+    assert plan_processing(sheets, store, incremental=True)['plan']['changed'] == ['acme/202403']
+
+    run_pipeline(raw=workbook, processed_dir=store, incremental=True)
+    after = partition_mtimes(store)
+    assert after.keys() == before.keys()
+    assert [f for f in after if after[f] != before[f]] == [os.path.join('transactions', 'Entity=acme', '202403.parquet')]
+
+    # The upserted store equals a full rebuild from the edited workbook
+    full = str(tmp_path / 'full')
+    run_pipeline(raw=workbook, processed_dir=full)
+    for name in ['transactions', 'cube', 'actual_summary', 'budget_analysis', 'margin_sketch']:
+        pd.testing.assert_frame_equal(read_table(name, store), read_table(name, full))
+
+
+def test_sketch_without_client_type_forces_full_rebuild(workbook, store):
+    # Stores written before Client_Type became a sketch key cannot take partition upserts
+    old = read_table('margin_sketch', store).groupby(['Entity', 'Department', 'Category', 'Month', 'Bin'],
+                                                     observed=True)['Count'].sum().reset_index()
+    write_table(old, 'margin_sketch', store)
+    sheets, _, _ = load_raw(workbook, None)
+    assert plan_processing(sheets, store, incremental=True)['full']
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from instrumentation import RunRecorder, peak_rss_mb
+
+pytestmark = pytest.mark.skipif(peak_rss_mb() is None, reason="no resource module")
+
+
+def test_peak_rss_is_per_run_and_steps_record_growth():
+    recorder = RunRecorder()
+    heavy = recorder.start('heavy')
+    # Touch enough pages to lift the process high-water mark
+    block = np.ones(int((peak_rss_mb() + 64) * 2**20 / 8))
+    recorder.finish(heavy)
+    del block
+    light = recorder.start('light')
+    recorder.finish(light)
+
+    assert heavy['peak_rss_growth_mb'] > 32
+    assert light['peak_rss_growth_mb'] == 0
+    assert all('peak_rss_mb' not in step for step in recorder.steps)
+    assert list(recorder.summary_lines())[-1].endswith(f"peak RSS {peak_rss_mb()} MB")
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from incremental import row_hashes
+from invoice_ledger import (
+    LEDGER_MAX_PARTS, TOTAL_COLUMNS, apply_upserts, build_ledger, contribution, diff_ledger, ledger_totals,
+    read_ledger, save_ledger, with_row_hashes
+)
+from processed_store import table_parts
+
+AS_OF = pd.Timestamp('2024-12-31')
+
+
+def invoices(rows):
+    # (Invoice_ID, Amount, Status, Payment_Date) -> processed invoice rows of entity 'acme'
+    df = pd.DataFrame(rows, columns=['Invoice_ID', 'Amount', 'Status', 'Payment_Date'])
+    df.insert(0, 'Entity', 'acme')
+    df.insert(2, 'Date', pd.Timestamp('2024-10-01'))
+    df['Payment_Date'] = pd.to_datetime(df['Payment_Date'])
+    df['Days_to_Payment'] = (df['Payment_Date'] - df['Date']).dt.days
+    return with_row_hashes(df, row_hashes(df))
+
+
+def upsert(processed_dir, raw):
+    # One incremental run: diff against the stored ledger, apply, save
+    ledger = read_ledger(processed_dir)
+    stored_totals = ledger_totals(contribution(ledger), ledger, AS_OF)
+    changed, deleted = diff_ledger(ledger, raw, raw['Row_Hash'].to_numpy())
+    new_ledger, totals, changes = apply_upserts(ledger, stored_totals, raw.iloc[changed], deleted)
+    return changed, save_ledger(processed_dir, new_ledger, changes), new_ledger, totals
+
+
+def test_reingested_invoice_replaces_the_stored_row(tmp_path):
+    first = invoices([('INV-1', 100.0, 'Pending', None), ('INV-2', 200.0, 'Pending', None)])
+    save_ledger(tmp_path, build_ledger(first)[0])
+
+    second = invoices([('INV-1', 150.0, 'Paid', '2024-10-11'), ('INV-2', 200.0, 'Pending', None)])
+    changed, mode, _, totals = upsert(tmp_path, second)
+    assert changed.tolist() == [0]
+    assert mode == 'appended'
+
+    ledger = read_ledger(tmp_path).set_index('Invoice_ID')
+    assert len(ledger) == 2
+    assert ledger.loc['INV-1', 'Status'] == 'Paid' and ledger.loc['INV-1', 'Amount'] == 150.0
+    # Running totals moved the invoice from pending to paid at its new amount
+    expected = contribution(second)[TOTAL_COLUMNS]
+    pd.testing.assert_frame_equal(totals[TOTAL_COLUMNS], expected, check_dtype=False, check_names=False)
+
+
+def test_appended_parts_are_compacted(tmp_path):
+    save_ledger(tmp_path, build_ledger(invoices([('INV-1', 100.0, 'Pending', None)]))[0])
+    for amount in np.arange(1, LEDGER_MAX_PARTS + 1) * 10.0:
+        _, mode, _, _ = upsert(tmp_path, invoices([('INV-1', amount, 'Pending', None)]))
+    assert mode == 'compacted'
+    assert table_parts('invoices', tmp_path) == 1
+
+    ledger = read_ledger(tmp_path)
+    assert ledger['Invoice_ID'].tolist() == ['INV-1']
+    assert ledger['Amount'].tolist() == [LEDGER_MAX_PARTS * 10.0]
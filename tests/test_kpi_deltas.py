@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpi_deltas import PREFIX_MEASURES, PrefixSums
+
+
+@pytest.fixture(scope='module')
+def cube():
+    # Day-grain cube cells starting mid-month (history then starts on the 1st)
+    rng = np.random.default_rng(11)
+    n = 1500
+    cube = pd.DataFrame({
+        'Date': pd.Timestamp('2024-01-10') + pd.to_timedelta(rng.integers(0, 200, n), unit='D'),
+        'Department': rng.choice(['Sales', 'Research', 'Trading'], n),
+        'Category': rng.choice(['Fees', 'Other'], n),
+        'Revenue': rng.integers(1, 1000, n).astype(float),
+        'Cost': rng.integers(1, 500, n).astype(float),
+        'Margin_Sum': rng.uniform(0, 100, n),
+        'Margin_Count': rng.integers(1, 5, n),
+    })
+    cube['Profit'] = cube['Revenue'] - cube['Cost']
+    return cube
+
+
+RANGES = [
+    ('2024-01-10', '2024-07-27'),
+    # Start before the first day with rows (and before the history)
+    ('2023-11-01', '2024-03-31'),
+    # Start in the middle of a month, end in the middle of another
+    ('2024-02-17', '2024-05-09'),
+    ('2024-03-05', '2024-03-05'),
+]
+
+
+@pytest.mark.parametrize('start, end', RANGES)
+@pytest.mark.parametrize('department, category', [(None, None), ('Sales', None), ('Research', 'Other'),
+                                                  ('Unknown', None)])
+def test_range_sums_match_groupby(cube, start, end, department, category):
+    prefix_sums = PrefixSums(cube)
+    rows = cube[(cube['Date'] >= start) & (cube['Date'] <= end)]
+    if department is not None:
+        rows = rows[rows['Department'] == department]
+    if category is not None:
+        rows = rows[rows['Category'] == category]
+    expected = rows[PREFIX_MEASURES].sum()
+    assert prefix_sums.range_sums(start, end, department, category) == pytest.approx(expected.to_dict())
+
+
+def test_covers_starts_on_the_first_of_the_first_month(cube):
+    prefix_sums = PrefixSums(cube)
+    last_day = cube['Date'].max()
+    assert prefix_sums.covers('2024-01-01', last_day)
+    assert not prefix_sums.covers('2023-12-31', '2024-02-01')
+    assert not prefix_sums.covers('2024-02-01', last_day + pd.Timedelta(days=1))
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from margin_sketch import MARGIN_BIN_WIDTH, MARGIN_PERCENTILES, build_sketch, select_sketch, sketch_percentiles
+from processed_store import read_table
+
+
+@pytest.fixture(scope='module')
+def transactions(processed_dir):
+    return read_table('transactions', processed_dir)
+
+
+@pytest.fixture(scope='module')
+def sketch(transactions):
+    return build_sketch(transactions)
+
+
+def client_types(transactions):
+    return sorted(transactions['Client_Type'].astype(str).unique())
+
+
+@pytest.mark.parametrize('department', [None, 'first'])
+def test_client_type_selection_matches_exact_percentiles(transactions, sketch, department):
+    if department == 'first':
+        department = sorted(transactions['Department'].astype(str).unique())[0]
+    for client_type in client_types(transactions):
+        rows = transactions[transactions['Client_Type'] == client_type]
+        if department is not None:
+            rows = rows[rows['Department'] == department]
+        margins = rows['Margin_%'].dropna().to_numpy()
+
+        result = sketch_percentiles(select_sketch(sketch, department=department, client_type=client_type))
+        assert result['count'] == len(margins)
+        for p in MARGIN_PERCENTILES:
+            exact = np.percentile(margins, p, method='inverted_cdf')
+            assert abs(result[f'P{p}'] - exact) <= MARGIN_BIN_WIDTH / 2
+
+
+def test_client_types_partition_the_sketch(transactions, sketch):
+    counts = [select_sketch(sketch, client_type=c)['Count'].sum() for c in client_types(transactions)]
+    assert sum(counts) == sketch['Count'].sum() == transactions['Margin_%'].count()
+    assert select_sketch(sketch, client_type='No such type').empty
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from period_metrics import build_period_metrics
+
+
+def _actuals(department, months, revenue):
+    return pd.DataFrame({
+        'Entity': 'acme',
+        'Department': department,
+        'Month': pd.PeriodIndex(months, freq='M'),
+        'Actual_Revenue': revenue,
+        'Actual_Cost': 0.0,
+        'Actual_Profit': revenue,
+    })
+
+
+def test_run_rate_for_series_starting_mid_year():
+    actual = pd.concat([
+        _actuals('Sales', ['2024-01', '2024-07', '2024-08'], 100.0),
+        _actuals('Research', ['2024-07', '2024-08'], 100.0),
+    ], ignore_index=True)
+    budget = pd.DataFrame(columns=['Entity', 'Department', 'Month', 'Budget_Revenue', 'Budget_Cost'])
+    metrics = build_period_metrics(actual, budget).set_index(['Department', 'Month'])
+
+    research = metrics.loc['Research', 'Run_Rate_Revenue']
+    # Paced from July, its first month with actuals: 100 a month -> 1,200 a year
+    assert research[pd.Period('2024-07', 'M')] == 1200.0
+    assert research[pd.Period('2024-08', 'M')] == 1200.0
+    # No actuals yet: no run rate
+    assert np.isnan(research[pd.Period('2024-03', 'M')])
+
+    # A series with actuals from January keeps the calendar pace
+    assert metrics.loc[('Sales', pd.Period('2024-08', 'M')), 'Run_Rate_Revenue'] == 300.0 / 8 * 12
+
+
+def test_rolling_and_last_year_for_series_starting_mid_year():
+    months = pd.period_range('2024-06', '2025-12', freq='M').astype(str)
+    budget = pd.DataFrame(columns=['Entity', 'Department', 'Month', 'Budget_Revenue', 'Budget_Cost'])
+    metrics = build_period_metrics(_actuals('Research', months, 100.0), budget).set_index('Month')
+
+    rolling_3m, rolling_12m = metrics['Revenue_3M'], metrics['Revenue_12M']
+    # Windows only count months since June 2024, not the January padding of the grid
+    assert np.isnan(rolling_3m[pd.Period('2024-07', 'M')])
+    assert rolling_3m[pd.Period('2024-08', 'M')] == 300.0
+    assert np.isnan(rolling_12m[pd.Period('2024-12', 'M')])
+    assert rolling_12m[pd.Period('2025-05', 'M')] == 1200.0
+
+    # Year-over-year needs the month a year earlier to be inside the history
+    last_year = metrics['Revenue_LY']
+    assert np.isnan(last_year[pd.Period('2025-05', 'M')])
+    assert last_year[pd.Period('2025-06', 'M')] == 100.0
+    assert np.isnan(metrics.loc[pd.Period('2025-05', 'M'), 'Revenue_YoY_%'])
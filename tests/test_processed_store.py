@@ -0,0 +1,18 @@
+import pandas as pd
+
+from processed_store import CSV_EXPORTS, export_csv
+
+
+def test_export_csv_keeps_legacy_layout(tmp_path):
+    df = pd.DataFrame({
+        'Entity': ['acme', 'acme'],
+        'Date': pd.to_datetime(['2024-01-02', '2024-11-03']),
+        'Revenue': [100, 200],
+        'Month_Key': pd.array([202401, 202411], dtype='int32'),
+        'Year': [2024, 2024],
+    })
+    # Streaming runs pass one frame per batch; the header is written once
+    export_csv([df.iloc[:1], df.iloc[1:]], 'transactions', tmp_path)
+    exported = pd.read_csv(tmp_path / CSV_EXPORTS['transactions'])
+    assert list(exported.columns) == ['Date', 'Revenue', 'Month', 'Year', 'Entity']
+    assert exported['Month'].tolist() == ['2024-01', '2024-11']
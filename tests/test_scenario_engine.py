@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processed_store import read_table
+from scenario_engine import PERCENTILES, draw_scenarios, run_scenarios, summarize_scenarios
+
+
+@pytest.fixture(scope='module')
+def inputs(processed_dir):
+    as_of = read_table('invoice_totals', processed_dir)['as_of'].max()
+    return read_table('budget_analysis', processed_dir), read_table('receivables', processed_dir), as_of
+
+
+def test_same_seed_same_scenarios(inputs):
+    first = run_scenarios(*inputs, count=2000, seed=5)
+    second = run_scenarios(*inputs, count=2000, seed=5)
+    assert first[0] == second[0]
+    for name in first[1]:
+        np.testing.assert_array_equal(first[1][name], second[1][name])
+
+    other = run_scenarios(*inputs, count=2000, seed=6)
+    assert not np.array_equal(first[1]['profit'], other[1]['profit'])
+
+
+def test_draws_are_seeded():
+    a, b = draw_scenarios(500, 3, seed=1), draw_scenarios(500, 3, seed=1)
+    for name in a:
+        np.testing.assert_array_equal(a[name], b[name])
+
+
+def test_percentiles_are_ordered(inputs):
+    summary = summarize_scenarios(*run_scenarios(*inputs, count=2000))
+    percentiles = summary[[f'P{p}' for p in PERCENTILES]].to_numpy()
+    assert not np.isnan(percentiles).all(axis=1).any()
+    assert (np.diff(percentiles, axis=1) >= 0).all()
+    assert (summary['P5'] <= summary['P50']).all() and (summary['P50'] <= summary['P95']).all()
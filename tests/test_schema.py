@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from schema import parse_dates
+
+
+def test_parse_dates_mixed_formats_keeps_every_row():
+    df = pd.DataFrame({'Date': ['2024-01-05', '2024/01/06', '2024-01-07 13:30:00', 'Jan 8, 2024', None]})
+    parsed = parse_dates(df, ['Date'])['Date']
+    assert pd.api.types.is_datetime64_any_dtype(parsed)
+    assert parsed.iloc[:4].tolist() == [
+        pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-06'),
+        pd.Timestamp('2024-01-07 13:30:00'), pd.Timestamp('2024-01-08'),
+    ]
+    assert pd.isna(parsed.iloc[4])
+
+
+def test_parse_dates_rejects_unparseable_values():
+    with pytest.raises(ValueError, match='not a date'):
+        parse_dates(pd.DataFrame({'Date': ['2024-01-05', 'not a date']}), ['Date'])
+
+
+def test_parse_dates_optional_column_coerces():
+    parsed = parse_dates(pd.DataFrame({'Payment_Date': ['2024-02-01', 'n/a']}), ['Payment_Date'])['Payment_Date']
+    assert parsed.iloc[0] == pd.Timestamp('2024-02-01')
+    assert pd.isna(parsed.iloc[1])
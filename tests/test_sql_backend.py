@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from aggregate_cube import TREND_GRAINS
+from detail_grid import GRID_COLUMNS
+from query_backend import MemoryBackend
+from shared_dataset import SharedDataset
+from sql_backend import SqliteBackend
+from sql_store import sql_path
+
+# (start, end, members): everything, a date range cutting weeks and months, member filters
+SELECTIONS = [
+    (None, None, {}),
+    (pd.Timestamp('2024-02-14'), pd.Timestamp('2024-07-03'), {}),
+    (pd.Timestamp('2024-01-10'), pd.Timestamp('2024-11-20'), {'Department': 'Sales', 'Category': 'Commission'}),
+    (None, None, {'Client_Type': 'Corporate'}),
+]
+
+
+@pytest.fixture(scope='module')
+def backends(processed_dir):
+    memory = MemoryBackend(SharedDataset(processed_dir, 'v'))
+    return memory, SqliteBackend(sql_path(processed_dir), 'v')
+
+
+@pytest.mark.parametrize('start, end, members', SELECTIONS)
+def test_totals_match(backends, start, end, members):
+    memory, sqlite = (b.filter(start, end, members) for b in backends)
+    assert sqlite.totals() == pytest.approx(memory.totals(), nan_ok=True)
+    assert sqlite.count() == memory.count()
+
+
+@pytest.mark.parametrize('grain', list(TREND_GRAINS.values()))
+@pytest.mark.parametrize('start, end, members', SELECTIONS)
+def test_trend_matches(backends, grain, start, end, members):
+    memory, sqlite = (b.filter(start, end, members) for b in backends)
+    pd.testing.assert_frame_equal(sqlite.trend(grain), memory.trend(grain), check_dtype=False)
+
+
+@pytest.mark.parametrize('dim', ['Department', 'Category', 'Client_Type'])
+@pytest.mark.parametrize('start, end, members', SELECTIONS)
+def test_by_dimension_matches(backends, dim, start, end, members):
+    memory, sqlite = (b.filter(start, end, members) for b in backends)
+    expected = memory.by_dimension(dim).astype({dim: str}).reset_index(drop=True)
+    pd.testing.assert_frame_equal(sqlite.by_dimension(dim)[expected.columns], expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('column', GRID_COLUMNS)
+@pytest.mark.parametrize('ascending', [True, False])
+def test_page_order_matches(backends, column, ascending):
+    memory, sqlite = (b.filter(*SELECTIONS[1]) for b in backends)
+    for page in (1, 3):
+        expected = memory.page(column, ascending, page, 50).reset_index(drop=True)
+        for col in ['Department', 'Category', 'Client_Type']:
+            expected[col] = expected[col].astype(str)
+        pd.testing.assert_frame_equal(sqlite.page(column, ascending, page, 50), expected, check_dtype=False)